@@ -0,0 +1,31 @@
+"""Add composite index for message keyset pagination
+
+Revision ID: d75152ff3bb4
+Revises: 5fb242aa5433
+Create Date: 2026-10-18 18:39:58.635183
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd75152ff3bb4'
+down_revision: Union[str, Sequence[str], None] = '5fb242aa5433'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 复合索引的前缀已覆盖 conversation_id 单列查询，旧索引随之移除
+    op.create_index('ix_messages_conversation_id_created_at_id', 'messages', ['conversation_id', 'created_at', 'id'], unique=False)
+    op.drop_index(op.f('ix_messages_conversation_id'), table_name='messages')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_messages_conversation_id'), 'messages', ['conversation_id'], unique=False)
+    op.drop_index('ix_messages_conversation_id_created_at_id', table_name='messages')
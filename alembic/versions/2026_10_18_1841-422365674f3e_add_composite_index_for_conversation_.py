@@ -0,0 +1,31 @@
+"""Add composite index for conversation keyset pagination
+
+Revision ID: 422365674f3e
+Revises: d75152ff3bb4
+Create Date: 2026-10-18 18:41:18.692400
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '422365674f3e'
+down_revision: Union[str, Sequence[str], None] = 'd75152ff3bb4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 复合索引的前缀已覆盖 user_id 单列查询，旧索引随之移除
+    op.create_index('ix_conversations_user_id_updated_at_id', 'conversations', ['user_id', sa.text('updated_at DESC'), sa.text('id DESC')], unique=False)
+    op.drop_index(op.f('ix_conversations_user_id'), table_name='conversations')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_conversations_user_id'), 'conversations', ['user_id'], unique=False)
+    op.drop_index('ix_conversations_user_id_updated_at_id', table_name='conversations')
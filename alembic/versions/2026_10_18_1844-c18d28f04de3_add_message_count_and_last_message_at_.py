@@ -0,0 +1,38 @@
+"""Add message_count and last_message_at to conversations
+
+Revision ID: c18d28f04de3
+Revises: 422365674f3e
+Create Date: 2026-10-18 18:44:01.912066
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c18d28f04de3'
+down_revision: Union[str, Sequence[str], None] = '422365674f3e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('conversations', sa.Column('message_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('conversations', sa.Column('last_message_at', sa.DateTime(), nullable=True))
+    # 回填已有会话的统计值
+    op.execute(
+        """
+        UPDATE conversations SET
+            message_count = (SELECT count(*) FROM messages WHERE messages.conversation_id = conversations.id),
+            last_message_at = (SELECT max(messages.created_at) FROM messages WHERE messages.conversation_id = conversations.id)
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('conversations', 'last_message_at')
+    op.drop_column('conversations', 'message_count')
@@ -0,0 +1,28 @@
+"""Add version to conversations
+
+Revision ID: 012e90f1cd6c
+Revises: c18d28f04de3
+Create Date: 2026-10-18 18:51:25.627779
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '012e90f1cd6c'
+down_revision: Union[str, Sequence[str], None] = 'c18d28f04de3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('conversations', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('conversations', 'version')
@@ -1,11 +1,22 @@
 import uuid
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Header
+from fastapi.responses import StreamingResponse
 
-from app.core.database import DB
-from app.schemas.conversation import ConversationCreate, ConversationOut, ConversationUpdate
+from app.core.database import DB, ReadDB
+from app.core.etag import build_etag, etag_matches, not_modified
+from app.core.pagination import TotalMode
+from app.schemas.conversation import (
+	ConversationBatchCreate,
+	ConversationBatchUpdate,
+	ConversationBulkDelete,
+	ConversationCreate,
+	ConversationOut,
+	ConversationUpdate,
+	ExportFormat,
+)
 from app.schemas.response import ApiResponse, PageData
-from app.services import conversation_service
+from app.services import conversation_service, message_service
 
 router = APIRouter(prefix="/conversations", tags=["Conversations"])
 
@@ -17,15 +28,72 @@ async def create_conversation(conversation_in: ConversationCreate, db: DB):
 
 
 @router.get("/", response_model=ApiResponse[PageData[ConversationOut]])
-async def get_conversations(user_id: str | None = None, page: int = 1, page_size: int = 20, db: DB = None):
-	result = await conversation_service.get_conversations(db, user_id, page, page_size)
-	return ApiResponse.page(**result)
+async def get_conversations(
+	user_id: str | None = None,
+	page: int = 1,
+	page_size: int = 20,
+	before: str | None = None,
+	after: str | None = None,
+	total: TotalMode = TotalMode.exact,
+	fields: str | None = None,
+	db: ReadDB = None,
+):
+	result = await conversation_service.get_conversations(db, user_id, page, page_size, before, after, total, fields)
+	return ApiResponse.page_json(ConversationOut, **result)
+
+
+@router.post("/batch", response_model=ApiResponse[list[ConversationOut]])
+async def create_conversations(conversations_in: ConversationBatchCreate, db: DB):
+	conversations = await conversation_service.create_conversations(db, conversations_in)
+	return ApiResponse.ok(data=conversations)
+
+
+@router.put("/batch", response_model=ApiResponse[list[ConversationOut]])
+async def update_conversations(conversations_in: ConversationBatchUpdate, db: DB):
+	conversations = await conversation_service.update_conversations(db, conversations_in)
+	return ApiResponse.ok(data=conversations)
+
+
+@router.post("/batch/delete", response_model=ApiResponse[list[uuid.UUID]])
+async def delete_conversations(delete_in: ConversationBulkDelete, db: DB):
+	ids = await conversation_service.delete_conversations(db, delete_in.ids, delete_in.user_id)
+	return ApiResponse.ok(data=ids)
 
 
 @router.get("/{conversation_id}", response_model=ApiResponse[ConversationOut])
-async def get_conversation(conversation_id: uuid.UUID, db: DB):
-	conversation = await conversation_service.get_conversation(db, conversation_id)
-	return ApiResponse.ok(data=conversation)
+async def get_conversation(conversation_id: uuid.UUID, db: ReadDB, if_none_match: str | None = Header(None)):
+	# ETag 始终取自数据库中的版本号；条件请求未变化时直接返回 304，不加载和序列化整行
+	version = await conversation_service.get_conversation_version(db, conversation_id)
+	etag = build_etag(conversation_id, version) if version is not None else None
+	if etag is not None and if_none_match is not None and etag_matches(if_none_match, etag):
+		return not_modified(etag)
+	conversation = await conversation_service.get_conversation(db, conversation_id, version)
+	response = ApiResponse.ok_json(conversation, ConversationOut)
+	response.headers["ETag"] = build_etag(conversation.id, conversation.version)
+	return response
+
+
+@router.get("/{conversation_id}/export", response_class=StreamingResponse)
+async def export_conversation(
+	conversation_id: uuid.UUID, format: ExportFormat = ExportFormat.ndjson, db: ReadDB = None
+):
+	content = await message_service.export_messages(db, conversation_id, format)
+	media_type = "application/x-ndjson" if format == ExportFormat.ndjson else "application/json"
+	return StreamingResponse(
+		content,
+		media_type=media_type,
+		headers={"Content-Disposition": f'attachment; filename="conversation-{conversation_id}.{format}"'},
+	)
+
+
+@router.get("/{conversation_id}/events", response_class=StreamingResponse)
+async def stream_conversation_events(conversation_id: uuid.UUID, db: ReadDB):
+	content = await message_service.stream_events(db, conversation_id)
+	return StreamingResponse(
+		content,
+		media_type="text/event-stream",
+		headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+	)
 
 
 @router.put("/{conversation_id}", response_model=ApiResponse[ConversationOut])
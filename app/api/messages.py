@@ -1,11 +1,20 @@
 import uuid
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Header, Request, Response
 
-from app.core.database import DB
-from app.schemas.message import MessageCreate, MessageOut, MessageUpdate
+from app.core.database import DB, ReadDB
+from app.core.etag import build_etag, etag_matches, not_modified
+from app.core.pagination import TotalMode
+from app.schemas.message import (
+	MessageAppendOut,
+	MessageBatchCreate,
+	MessageContentAppend,
+	MessageCreate,
+	MessageOut,
+	MessageUpdate,
+)
 from app.schemas.response import ApiResponse, PageData
-from app.services import message_service
+from app.services import conversation_service, message_service
 
 router = APIRouter(prefix="/messages", tags=["Messages"])
 
@@ -16,16 +25,41 @@ async def create_message(message_in: MessageCreate, db: DB):
 	return ApiResponse.ok(data=message)
 
 
+@router.post("/batch", response_model=ApiResponse[list[MessageOut]])
+async def create_messages(messages_in: MessageBatchCreate, db: DB):
+	messages = await message_service.create_messages(db, messages_in)
+	return ApiResponse.ok(data=messages)
+
+
 @router.get("/conversation/{conversation_id}", response_model=ApiResponse[PageData[MessageOut]])
-async def get_messages(conversation_id: uuid.UUID, page: int = 1, page_size: int = 20, db: DB = None):
-	result = await message_service.get_messages(db, conversation_id, page, page_size)
-	return ApiResponse.page(**result)
+async def get_messages(
+	conversation_id: uuid.UUID,
+	page: int = 1,
+	page_size: int = 20,
+	before: str | None = None,
+	after: str | None = None,
+	total: TotalMode = TotalMode.exact,
+	fields: str | None = None,
+	*,
+	request: Request,
+	if_none_match: str | None = Header(None),
+	db: ReadDB = None,
+):
+	# 消息的写入都会推进会话版本号，先读版本再读列表，保证 ETag 只会比内容旧而不会比内容新
+	version = await conversation_service.get_conversation_version(db, conversation_id)
+	etag = build_etag(conversation_id, version, *sorted(request.query_params.multi_items()))
+	if version is not None and etag_matches(if_none_match, etag):
+		return not_modified(etag)
+	result = await message_service.get_messages(db, conversation_id, page, page_size, before, after, total, fields)
+	response = ApiResponse.page_json(MessageOut, **result)
+	response.headers["ETag"] = etag
+	return response
 
 
 @router.get("/{message_id}", response_model=ApiResponse[MessageOut])
-async def get_message(message_id: uuid.UUID, db: DB):
+async def get_message(message_id: uuid.UUID, db: ReadDB):
 	message = await message_service.get_message(db, message_id)
-	return ApiResponse.ok(data=message)
+	return ApiResponse.ok_json(message, MessageOut)
 
 
 @router.put("/{message_id}", response_model=ApiResponse[MessageOut])
@@ -34,6 +68,15 @@ async def update_message(message_id: uuid.UUID, message_in: MessageUpdate, db: D
 	return ApiResponse.ok(data=message)
 
 
+@router.patch("/{message_id}/content", response_model=ApiResponse[MessageAppendOut | None])
+async def append_message_content(message_id: uuid.UUID, append_in: MessageContentAppend, response: Response, db: DB):
+	result = await message_service.append_message_content(db, message_id, append_in)
+	# 开启合并写入时增量只是入队，返回 202 且不带数据
+	if result is None:
+		response.status_code = 202
+	return ApiResponse.ok(data=result)
+
+
 @router.delete("/{message_id}", response_model=ApiResponse[None])
 async def delete_message(message_id: uuid.UUID, db: DB):
 	await message_service.delete_message(db, message_id)
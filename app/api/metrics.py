@@ -0,0 +1,28 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.cache import cache
+from app.core.database import all_pool_stats
+from app.core.metrics import metrics
+from app.schemas.metrics import CacheStatsOut, PoolStatsOut
+from app.schemas.response import ApiResponse
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+# Prometheus 抓取地址固定为 /metrics，不放在 /api 前缀下
+prometheus_router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/cache", response_model=ApiResponse[CacheStatsOut])
+async def get_cache_stats():
+	return ApiResponse.ok(data=cache.stats())
+
+
+@router.get("/pool", response_model=ApiResponse[list[PoolStatsOut]])
+async def get_pool_stats():
+	return ApiResponse.ok(data=all_pool_stats())
+
+
+@prometheus_router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_prometheus_metrics():
+	return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
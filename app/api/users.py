@@ -1,8 +1,9 @@
 from fastapi import APIRouter
 
-from app.core.database import DB
+from app.core.database import DB, ReadDB
+from app.core.pagination import TotalMode
 from app.schemas.response import ApiResponse, PageData
-from app.schemas.user import UserCreate, UserOut, UserUpdate
+from app.schemas.user import UserBatchCreate, UserBatchUpdate, UserBulkDelete, UserCreate, UserOut, UserUpdate
 from app.services import user_service
 
 router = APIRouter(prefix="/users", tags=["Users"])
@@ -15,15 +16,33 @@ async def create_user(user_in: UserCreate, db: DB):
 
 
 @router.get("/", response_model=ApiResponse[PageData[UserOut]])
-async def get_users(page: int = 1, page_size: int = 20, db: DB = None):
-	result = await user_service.get_users(db, page, page_size)
-	return ApiResponse.page(**result)
+async def get_users(page: int = 1, page_size: int = 20, total: TotalMode = TotalMode.exact, db: ReadDB = None):
+	result = await user_service.get_users(db, page, page_size, total)
+	return ApiResponse.page_json(UserOut, **result)
+
+
+@router.post("/batch", response_model=ApiResponse[list[UserOut]])
+async def create_users(users_in: UserBatchCreate, db: DB):
+	users = await user_service.create_users(db, users_in)
+	return ApiResponse.ok(data=users)
+
+
+@router.put("/batch", response_model=ApiResponse[list[UserOut]])
+async def update_users(users_in: UserBatchUpdate, db: DB):
+	users = await user_service.update_users(db, users_in)
+	return ApiResponse.ok(data=users)
+
+
+@router.post("/batch/delete", response_model=ApiResponse[list[int]])
+async def delete_users(delete_in: UserBulkDelete, db: DB):
+	ids = await user_service.delete_users(db, delete_in.ids)
+	return ApiResponse.ok(data=ids)
 
 
 @router.get("/{user_id}", response_model=ApiResponse[UserOut])
-async def get_user(user_id: int, db: DB):
+async def get_user(user_id: int, db: ReadDB):
 	user = await user_service.get_user(db, user_id)
-	return ApiResponse.ok(data=user)
+	return ApiResponse.ok_json(user, UserOut)
 
 
 @router.put("/{user_id}", response_model=ApiResponse[UserOut])
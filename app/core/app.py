@@ -5,11 +5,16 @@ from fastapi.openapi.utils import get_openapi
 from fastapi.routing import APIRoute
 from loguru import logger
 
-from app.api import router
+from app.api import prometheus_router, router
 from app.core.config import settings
-from app.core.database import engine
+from app.core.database import engine, read_engine, replicas
+from app.core.events import events
 from app.core.exceptions import register_exception_handlers
-from app.core.logging import setup_logging
+from app.core.lifecycle import run_shutdown_hooks
+from app.core.logging import setup_logging, stop_logging
+from app.core.metrics import MetricsMiddleware
+from app.core.querylog import QueryLogMiddleware
+from app.core.replicas import StickyPrimaryMiddleware
 
 
 @asynccontextmanager
@@ -19,7 +24,13 @@ async def lifespan(app: FastAPI):
 	# 运行 "alembic upgrade head" 来初始化或更新数据库
 	yield
 	logger.info("Shutting down...")
+	await run_shutdown_hooks()
+	await events.stop()
 	await engine.dispose()
+	if read_engine is not engine:
+		await read_engine.dispose()
+	await replicas.dispose()
+	stop_logging()
 
 
 # 用路由函数名作为 OpenAPI operationId，方便客户端代码生成
@@ -38,7 +49,14 @@ def init_app() -> FastAPI:
 		generate_unique_id_function=custom_generate_unique_id,
 	)
 	register_exception_handlers(app)
+	if settings.DB_REPLICA_URLS:
+		app.add_middleware(StickyPrimaryMiddleware, max_age=settings.DB_REPLICA_STICKY_SECONDS)
 	app.include_router(router)
+	app.add_middleware(QueryLogMiddleware)
+	if settings.METRICS_ENABLED:
+		# 最后添加的中间件在最外层，耗时包含其他中间件
+		app.add_middleware(MetricsMiddleware)
+		app.include_router(prometheus_router)
 
 	# 自定义 OpenAPI schema：移除 FastAPI 默认的 422 响应和校验相关 schema，
 	def custom_openapi():
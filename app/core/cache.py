@@ -0,0 +1,165 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Iterable
+from typing import Any
+
+from app.core.config import settings
+
+
+class CacheBackend(ABC):
+	"""缓存存储接口，进程内实现见 MemoryBackend，共享缓存（如 Redis）实现同一接口即可替换"""
+
+	@abstractmethod
+	async def get(self, key: str) -> Any | None: ...
+
+	@abstractmethod
+	async def set(self, key: str, value: Any, ttl: int, tags: Iterable[str] = ()) -> None: ...
+
+	@abstractmethod
+	async def delete(self, *keys: str) -> None: ...
+
+	@abstractmethod
+	async def invalidate_tags(self, *tags: str) -> None:
+		"""删除带有任一 tag 的全部条目"""
+
+	@abstractmethod
+	async def clear(self) -> None: ...
+
+	@abstractmethod
+	def size(self) -> int: ...
+
+
+class MemoryBackend(CacheBackend):
+	"""进程内 LRU + TTL 缓存"""
+
+	def __init__(self, max_size: int):
+		self.max_size = max_size
+		# {key: (过期时间, 值, tags)}，按访问顺序排列，最久未访问的在最前
+		self._data: OrderedDict[str, tuple[float, Any, tuple[str, ...]]] = OrderedDict()
+		self._tags: dict[str, set[str]] = {}
+
+	def _remove(self, key: str) -> None:
+		entry = self._data.pop(key, None)
+		if entry is None:
+			return
+		for tag in entry[2]:
+			keys = self._tags.get(tag)
+			if keys is not None:
+				keys.discard(key)
+				if not keys:
+					del self._tags[tag]
+
+	async def get(self, key: str) -> Any | None:
+		entry = self._data.get(key)
+		if entry is None:
+			return None
+		if entry[0] <= time.monotonic():
+			self._remove(key)
+			return None
+		self._data.move_to_end(key)
+		return entry[1]
+
+	async def set(self, key: str, value: Any, ttl: int, tags: Iterable[str] = ()) -> None:
+		self._remove(key)
+		tags = tuple(tags)
+		self._data[key] = (time.monotonic() + ttl, value, tags)
+		for tag in tags:
+			self._tags.setdefault(tag, set()).add(key)
+		while len(self._data) > self.max_size:
+			self._remove(next(iter(self._data)))
+
+	async def delete(self, *keys: str) -> None:
+		for key in keys:
+			self._remove(key)
+
+	async def invalidate_tags(self, *tags: str) -> None:
+		for tag in tags:
+			for key in list(self._tags.get(tag, ())):
+				self._remove(key)
+
+	async def clear(self) -> None:
+		self._data.clear()
+		self._tags.clear()
+
+	def size(self) -> int:
+		return len(self._data)
+
+
+class NullBackend(CacheBackend):
+	"""关闭缓存时使用，所有读取均未命中"""
+
+	async def get(self, key: str) -> Any | None:
+		return None
+
+	async def set(self, key: str, value: Any, ttl: int, tags: Iterable[str] = ()) -> None:
+		pass
+
+	async def delete(self, *keys: str) -> None:
+		pass
+
+	async def invalidate_tags(self, *tags: str) -> None:
+		pass
+
+	async def clear(self) -> None:
+		pass
+
+	def size(self) -> int:
+		return 0
+
+
+class Cache:
+	"""缓存入口，统计命中率；backend 可在启动时替换为共享实现"""
+
+	def __init__(self, backend: CacheBackend, ttl: int):
+		self.backend = backend
+		self.ttl = ttl
+		self.hits = 0
+		self.misses = 0
+		# 失效次数，读穿前记下、写入前比对，读取期间发生过失效则不写入
+		self.invalidations = 0
+
+	async def get(self, key: str) -> Any | None:
+		value = await self.backend.get(key)
+		if value is None:
+			self.misses += 1
+		else:
+			self.hits += 1
+		return value
+
+	async def set(self, key: str, value: Any, tags: Iterable[str] = (), since: int | None = None) -> None:
+		"""since 为读取数据前的 invalidations，此后发生过失效时读到的可能是旧值，不写入"""
+		if since is not None and since != self.invalidations:
+			return
+		await self.backend.set(key, value, self.ttl, tags)
+
+	async def delete(self, *keys: str) -> None:
+		if keys:
+			self.invalidations += 1
+			await self.backend.delete(*keys)
+
+	async def invalidate_tags(self, *tags: str) -> None:
+		if tags:
+			self.invalidations += 1
+			await self.backend.invalidate_tags(*tags)
+
+	async def clear(self) -> None:
+		await self.backend.clear()
+		self.hits = 0
+		self.misses = 0
+
+	def stats(self) -> dict:
+		lookups = self.hits + self.misses
+		return {
+			"backend": type(self.backend).__name__,
+			"size": self.backend.size(),
+			"hits": self.hits,
+			"misses": self.misses,
+			"hit_ratio": self.hits / lookups if lookups else 0.0,
+		}
+
+
+cache = Cache(
+	MemoryBackend(settings.CACHE_MAX_SIZE) if settings.CACHE_ENABLED else NullBackend(),
+	ttl=settings.CACHE_TTL,
+)
@@ -1,27 +1,274 @@
-from collections.abc import AsyncGenerator
-from typing import Annotated
+import time
+from collections.abc import AsyncGenerator, AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Annotated, Any
 
-from fastapi import Depends
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from fastapi import Depends, Request
+from sqlalchemy import DateTime, event, exc
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from app.core.config import settings
+from app.core.replicas import PRIMARY_COOKIE, ReplicaSet
 
-engine = create_async_engine(settings.DATABASE_URL, **settings.DATABASE_ENGINE_OPTIONS)
+
+def _sqlite_on_connect(pragmas: dict[str, Any], begin_immediate: bool) -> Callable:
+	def on_connect(dbapi_connection, connection_record) -> None:
+		if begin_immediate:
+			# 由 begin 事件自行发出 BEGIN，驱动不再隐式开启事务
+			dbapi_connection.isolation_level = None
+		cursor = dbapi_connection.cursor()
+		# SQLite 默认不启用外键约束，ON DELETE CASCADE 依赖它
+		cursor.execute("PRAGMA foreign_keys=ON")
+		for name, value in pragmas.items():
+			cursor.execute(f"PRAGMA {name}={value}")
+		cursor.close()
+
+	return on_connect
+
+
+def _begin_immediate(conn) -> None:
+	# 事务开始即取得写锁，避免先读后写时升级写锁失败直接报 "database is locked"
+	conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+	"""记录取连接的等待时间、新建连接的耗时和超时次数，统计跨 dispose 保留
+
+	等待时间不含新建连接的耗时：连接池满时的排队与数据库建连慢是两类问题，分开统计。
+	"""
+
+	_STATS = ("checkouts", "timeouts", "wait_total", "wait_max", "connects", "connect_total", "connect_max")
+
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.checkouts = 0
+		self.timeouts = 0
+		self.wait_total = 0.0
+		self.wait_max = 0.0
+		self.connects = 0
+		self.connect_total = 0.0
+		self.connect_max = 0.0
+
+	def _create_connection(self):
+		start = time.perf_counter()
+		record = super()._create_connection()
+		elapsed = time.perf_counter() - start
+		self.connects += 1
+		self.connect_total += elapsed
+		self.connect_max = max(self.connect_max, elapsed)
+		# 记在连接上，由取出这条连接的 connect() 从等待时间中扣除；并发取连接时各自扣除自己新建的连接
+		record.info["connect_time"] = elapsed
+		return record
+
+	def connect(self):
+		start = time.perf_counter()
+		try:
+			connection = super().connect()
+		except exc.TimeoutError:
+			self.timeouts += 1
+			raise
+		wait = max(time.perf_counter() - start - connection.info.pop("connect_time", 0.0), 0.0)
+		self.checkouts += 1
+		self.wait_total += wait
+		self.wait_max = max(self.wait_max, wait)
+		return connection
+
+	def recreate(self) -> "MeteredQueuePool":
+		pool = super().recreate()
+		for name in self._STATS:
+			setattr(pool, name, getattr(self, name))
+		return pool
+
+
+def _ping_idle_connections(engine: AsyncEngine, idle_after: float) -> None:
+	"""只对空闲超过 idle_after 秒的连接 ping，热点路径上刚归还的连接直接复用"""
+
+	def on_checkin(dbapi_connection, connection_record) -> None:
+		connection_record.info["checked_in_at"] = time.monotonic()
+
+	def on_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+		checked_in_at = connection_record.info.get("checked_in_at")
+		if checked_in_at is None or time.monotonic() - checked_in_at < idle_after:
+			return
+		try:
+			engine.dialect.do_ping(dbapi_connection)
+		except Exception as e:
+			# 连接池收到 DisconnectionError 会丢弃这条连接并换一条重试
+			raise exc.DisconnectionError() from e
+
+	event.listen(engine.sync_engine, "checkin", on_checkin)
+	event.listen(engine.sync_engine, "checkout", on_checkout)
+
+
+def build_engine(
+	url: str,
+	ping_idle_after: float = 0,
+	sqlite_pragmas: dict[str, Any] | None = None,
+	sqlite_writer: bool = False,
+	**options,
+) -> AsyncEngine:
+	"""创建异步引擎并挂载各数据库需要的连接事件，测试引擎也通过它创建
+
+	传入 pool_size 时使用带统计的 MeteredQueuePool；ping_idle_after > 0 时按空闲时长决定是否 ping。
+	SQLite 连接建立时执行 sqlite_pragmas；sqlite_writer=True 时整个引擎只有一条连接，
+	写会话在连接池上排队依次执行，事务以 BEGIN IMMEDIATE 开始。
+	"""
+	if sqlite_writer:
+		options |= {"pool_size": 1, "max_overflow": 0}
+	if "pool_size" in options:
+		options.setdefault("poolclass", MeteredQueuePool)
+	engine = create_async_engine(url, **options)
+	if engine.dialect.name == "sqlite":
+		event.listen(engine.sync_engine, "connect", _sqlite_on_connect(sqlite_pragmas or {}, sqlite_writer))
+		if sqlite_writer:
+			event.listen(engine.sync_engine, "begin", _begin_immediate)
+	# pool_pre_ping 已在每次取连接时 ping，再按空闲时长 ping 会对同一条连接 ping 两次
+	if ping_idle_after > 0 and not options.get("pool_pre_ping"):
+		_ping_idle_connections(engine, ping_idle_after)
+	return engine
+
+
+def pool_stats(engine: AsyncEngine) -> dict:
+	"""连接池当前状态及累计的等待统计，非 QueuePool（如内存 SQLite 的 StaticPool）只返回类型"""
+	pool = engine.sync_engine.pool
+	stats = {"pool": type(pool).__name__}
+	if isinstance(pool, QueuePool):
+		stats |= {
+			"size": pool.size(),
+			"checked_in": pool.checkedin(),
+			"checked_out": pool.checkedout(),
+			"overflow": max(pool.overflow(), 0),
+		}
+	if isinstance(pool, MeteredQueuePool):
+		stats |= {
+			"checkouts": pool.checkouts,
+			"timeouts": pool.timeouts,
+			"wait_avg_ms": pool.wait_total / pool.checkouts * 1000 if pool.checkouts else 0.0,
+			"wait_max_ms": pool.wait_max * 1000,
+			"connects": pool.connects,
+			"connect_avg_ms": pool.connect_total / pool.connects * 1000 if pool.connects else 0.0,
+			"connect_max_ms": pool.connect_max * 1000,
+		}
+	return stats
+
+
+_single_writer = settings.DB_ENGINE == "sqlite" and settings.SQLITE_SINGLE_WRITER
+engine = build_engine(
+	settings.DATABASE_URL,
+	ping_idle_after=settings.DB_POOL_PING_IDLE_AFTER,
+	sqlite_pragmas=settings.SQLITE_PRAGMAS,
+	sqlite_writer=_single_writer,
+	**settings.DATABASE_ENGINE_OPTIONS,
+)
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+# SQLite 单写连接模式下，只读会话使用独立的连接池（WAL 下读写互不阻塞），并禁止写入
+read_engine = (
+	build_engine(
+		settings.DATABASE_URL,
+		sqlite_pragmas=settings.SQLITE_PRAGMAS | {"query_only": "ON"},
+		**settings.DATABASE_ENGINE_OPTIONS,
+	)
+	if _single_writer
+	else engine
+)
+ReadSessionLocal = async_sessionmaker(read_engine, expire_on_commit=False)
+replicas = ReplicaSet(
+	[
+		build_engine(url, ping_idle_after=settings.DB_POOL_PING_IDLE_AFTER, **settings.DATABASE_ENGINE_OPTIONS)
+		for url in settings.DB_REPLICA_URLS
+	],
+	max_lag=settings.DB_REPLICA_MAX_LAG,
+	check_interval=settings.DB_REPLICA_CHECK_INTERVAL,
+	retry_after=settings.DB_REPLICA_RETRY_AFTER,
+)
+
+
+def all_pool_stats() -> list[dict]:
+	"""主库、独立的只读引擎（SQLite 单写连接模式）和各副本的连接池状态，name 区分引擎"""
+	engines = [("primary", engine)]
+	if read_engine is not engine:
+		engines.append(("read", read_engine))
+	engines.extend((f"replica:{i}", replica) for i, replica in enumerate(replicas.engines))
+	return [{"name": name} | pool_stats(pool_engine) for name, pool_engine in engines]
 
 
 class Base(DeclarativeBase):
-	pass
+	# INSERT / UPDATE 时通过 RETURNING 一并取回 server_default、onupdate 生成的列，写入后无需再 refresh
+	__mapper_args__ = {"eager_defaults": True}
 
+	# SQLite 的 CURRENT_TIMESTAMP 只精确到秒，绑定参数按相同格式存储，
+	# 否则游标分页比较 (created_at, id) 时 "12:00:00" 与 "12:00:00.000000" 会被当成不同的值
+	type_annotation_map = {
+		datetime: DateTime().with_variant(sqlite.DATETIME(truncate_microseconds=True), "sqlite"),
+	}
 
-async def get_db() -> AsyncGenerator[AsyncSession]:
-	async with AsyncSessionLocal() as session:
+
+async def commit(db: AsyncSession) -> None:
+	"""仓储层写入后调用：默认立即提交；工作单元模式下只 flush，由请求结束时统一提交"""
+	if db.info.get("unit_of_work"):
+		await db.flush()
+	else:
+		await db.commit()
+
+
+async def rollback(db: AsyncSession) -> None:
+	"""结束没有产生修改或写入失败的事务以归还连接
+
+	工作单元模式下事务属于整个请求，这里不做处理：调用方继续抛出异常，由 session_scope 整体回滚，
+	之前登记的 after_commit 回调一并丢弃；即使调用方吞掉异常，失败的事务也无法再提交。
+	"""
+	if not db.info.get("unit_of_work"):
+		await db.rollback()
+
+
+async def after_commit(db: AsyncSession, callback: Callable[[], Awaitable[Any]]) -> None:
+	"""提交之后的动作（清缓存、推送事件）；工作单元模式下推迟到请求提交之后，回滚则丢弃"""
+	if db.info.get("unit_of_work"):
+		db.info.setdefault("after_commit", []).append(callback)
+	else:
+		await callback()
+
+
+@asynccontextmanager
+async def session_scope(session_factory: async_sessionmaker, unit_of_work: bool = False) -> AsyncIterator[AsyncSession]:
+	"""请求级会话，第一次查询时才从连接池取连接
+
+	unit_of_work=True 时整个请求只有一个事务：仓储层的 commit 只 flush，正常结束时统一提交，
+	出现异常则整体回滚。
+	"""
+	async with session_factory() as session:
+		if not unit_of_work:
+			yield session
+			return
+		session.info["unit_of_work"] = True
 		try:
 			yield session
-		finally:
-			await session.close()
+			await session.commit()
+		except BaseException:
+			await session.rollback()
+			session.info.pop("after_commit", None)
+			raise
+		for callback in session.info.pop("after_commit", ()):
+			await callback()
+
+
+async def get_db() -> AsyncGenerator[AsyncSession]:
+	async with session_scope(AsyncSessionLocal, settings.DB_UNIT_OF_WORK) as session:
+		yield session
+
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession]:
+	"""只读会话：路由到副本；刚写过数据的客户端、没有可用副本时使用主库"""
+	async with replicas.session(ReadSessionLocal, use_primary=PRIMARY_COOKIE in request.cookies) as session:
+		yield session
 
 
 # 依赖注入类型别名，路由中直接用 db: DB 即可获取数据库会话
-DB = Annotated[AsyncSession, Depends(get_db)]
+# scope="function" 使会话在路由函数返回后、响应发出前结束，工作单元模式的提交先于响应完成
+DB = Annotated[AsyncSession, Depends(get_db, scope="function")]
+# 只读接口使用 db: ReadDB，查询可由副本承担
+ReadDB = Annotated[AsyncSession, Depends(get_read_db)]
@@ -0,0 +1,23 @@
+import hashlib
+from typing import Any
+
+from fastapi import Response
+
+
+def build_etag(*parts: Any) -> str:
+	"""由资源标识和版本信息生成强 ETag"""
+	digest = hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+	return f'"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+	"""按 If-None-Match 的弱比较规则判断客户端缓存是否仍然有效"""
+	if not if_none_match:
+		return False
+	if if_none_match.strip() == "*":
+		return True
+	return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def not_modified(etag: str) -> Response:
+	return Response(status_code=304, headers={"ETag": etag})
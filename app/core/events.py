@@ -0,0 +1,225 @@
+import asyncio
+import contextvars
+import json
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from typing import Any
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.core.config import settings
+from app.core.database import engine
+
+# 后端收到消息后的回调：(channel, message)
+Dispatch = Callable[[str, str], None]
+
+
+class PubSubBackend(ABC):
+	"""跨进程分发接口：publish 的消息需要送达每个进程的 dispatch，进程内实现见 MemoryBackend"""
+
+	# 单条消息的字节上限，None 表示不限制
+	payload_limit: int | None = None
+
+	@abstractmethod
+	async def start(self, dispatch: Dispatch) -> None: ...
+
+	@abstractmethod
+	async def publish(self, channel: str, message: str) -> None: ...
+
+	@abstractmethod
+	async def stop(self) -> None: ...
+
+
+class MemoryBackend(PubSubBackend):
+	"""只在当前进程内分发，适用于单进程部署和测试"""
+
+	def __init__(self):
+		self._dispatch: Dispatch | None = None
+
+	async def start(self, dispatch: Dispatch) -> None:
+		self._dispatch = dispatch
+
+	async def publish(self, channel: str, message: str) -> None:
+		self._dispatch(channel, message)
+
+	async def stop(self) -> None:
+		self._dispatch = None
+
+
+class PostgresBackend(PubSubBackend):
+	"""基于 LISTEN/NOTIFY 的跨进程分发
+
+	每个进程只占用一条 LISTEN 连接，所有业务频道复用同一个 PostgreSQL 频道，订阅者数量不影响数据库。
+	连接断开后在后台每隔 reconnect_interval 秒重连一次，断开期间的事件会丢失。
+	"""
+
+	# NOTIFY 的 payload 上限为 8000 字节，预留频道名和事件名
+	payload_limit = 7800
+
+	def __init__(self, engine: AsyncEngine, pg_channel: str = "app_events", reconnect_interval: float = 1):
+		self.engine = engine
+		self.pg_channel = pg_channel
+		self.reconnect_interval = reconnect_interval
+		self._conn: AsyncConnection | None = None
+		self._raw: Any = None
+		self._dispatch: Dispatch | None = None
+		self._reconnect_task: asyncio.Task | None = None
+		self._lock = asyncio.Lock()
+
+	def _on_notify(self, connection, pid, channel, payload) -> None:
+		self._dispatch(*payload.split("\n", 1))
+
+	def _on_terminate(self, connection) -> None:
+		logger.warning("Event LISTEN connection lost, reconnecting")
+		self._schedule_reconnect()
+
+	def _schedule_reconnect(self) -> None:
+		if self._reconnect_task is None or self._reconnect_task.done():
+			# 不继承触发重连的请求的上下文，重连的查询不计入该请求
+			self._reconnect_task = asyncio.create_task(self._reconnect(), context=contextvars.Context())
+
+	async def _connect(self) -> None:
+		self._conn = await self.engine.connect()
+		self._raw = (await self._conn.get_raw_connection()).driver_connection
+		await self._raw.add_listener(self.pg_channel, self._on_notify)
+		self._raw.add_termination_listener(self._on_terminate)
+
+	async def _discard(self) -> None:
+		conn, self._conn, self._raw = self._conn, None, None
+		if conn is not None:
+			try:
+				# 连接已断开，作废而不是归还连接池
+				await conn.invalidate()
+			except Exception:
+				pass
+
+	async def _reconnect(self) -> None:
+		await self._discard()
+		while True:
+			try:
+				await self._connect()
+			except Exception as e:
+				logger.warning("Event LISTEN reconnect failed, retrying in {}s: {}", self.reconnect_interval, e)
+				await asyncio.sleep(self.reconnect_interval)
+			else:
+				logger.info("Event LISTEN connection restored")
+				return
+
+	async def start(self, dispatch: Dispatch) -> None:
+		self._dispatch = dispatch
+		await self._connect()
+
+	async def publish(self, channel: str, message: str) -> None:
+		payload = f"{channel}\n{message}"
+		# 同一条 asyncpg 连接不能并发执行语句
+		async with self._lock:
+			if self._raw is None:
+				raise ConnectionError("Event LISTEN connection is reconnecting")
+			try:
+				await self._raw.execute("SELECT pg_notify($1, $2)", self.pg_channel, payload)
+			except Exception:
+				if self._raw.is_closed():
+					self._schedule_reconnect()
+				raise
+
+	async def stop(self) -> None:
+		if self._reconnect_task is not None:
+			self._reconnect_task.cancel()
+			self._reconnect_task = None
+		if self._conn is not None:
+			self._raw.remove_termination_listener(self._on_terminate)
+			await self._conn.close()
+			self._conn = self._raw = None
+
+
+class EventBroker:
+	"""进程内发布/订阅：订阅者各持有一个有界队列，跨进程分发交给 backend
+
+	空闲订阅者只占用一个队列，不产生任何数据库查询；backend 在首次使用时启动。
+	"""
+
+	def __init__(self, backend: PubSubBackend, queue_size: int):
+		self.backend = backend
+		self.queue_size = queue_size
+		self._subscribers: dict[str, set[asyncio.Queue]] = {}
+		self._started = False
+		self._start_lock = asyncio.Lock()
+
+	async def _ensure_started(self) -> None:
+		if self._started:
+			return
+		async with self._start_lock:
+			if not self._started:
+				await self.backend.start(self._dispatch)
+				self._started = True
+
+	def _dispatch(self, channel: str, message: str) -> None:
+		queues = self._subscribers.get(channel)
+		if not queues:
+			return
+		# 消息格式为 "事件名\n数据 JSON"，每个进程只拆分一次，订阅者直接转发数据部分
+		event, data = message.split("\n", 1)
+		for queue in queues:
+			# 消费过慢的订阅者丢弃最旧的事件，不阻塞发布方
+			if queue.full():
+				queue.get_nowait()
+				logger.warning("Event queue full, dropped oldest event: channel={}", channel)
+			queue.put_nowait((event, data))
+
+	async def publish(self, channel: str, event: str, data: dict) -> None:
+		"""在写入提交后调用，推送失败只记录日志：数据已经写入，不能让请求因此失败"""
+		payload = json.dumps(data)
+		limit = self.backend.payload_limit
+		if limit is not None and len(payload.encode()) > limit:
+			payload = json.dumps(_summarize(data))
+		try:
+			await self._ensure_started()
+			await self.backend.publish(channel, f"{event}\n{payload}")
+		except Exception as e:
+			logger.warning("Failed to publish event {} to {}: {!r}", event, channel, e)
+
+	@asynccontextmanager
+	async def subscribe(self, channel: str) -> AsyncIterator[asyncio.Queue]:
+		"""订阅频道，队列中的元素为 (事件名, 数据 JSON 字符串)"""
+		await self._ensure_started()
+		queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+		self._subscribers.setdefault(channel, set()).add(queue)
+		try:
+			yield queue
+		finally:
+			queues = self._subscribers.get(channel)
+			if queues is not None:
+				queues.discard(queue)
+				if not queues:
+					del self._subscribers[channel]
+
+	def subscriber_count(self) -> int:
+		return sum(len(queues) for queues in self._subscribers.values())
+
+	async def stop(self) -> None:
+		if self._started:
+			await self.backend.stop()
+			self._started = False
+
+
+def _summarize(data: dict, max_value_size: int = 256) -> dict:
+	"""超出 backend 上限时去掉较大的字段，truncated 列出被去掉的字段名，客户端可按 id 重新拉取"""
+	summary, truncated = {}, []
+	for key, value in data.items():
+		if len(json.dumps(value)) > max_value_size:
+			truncated.append(key)
+		else:
+			summary[key] = value
+	summary["truncated"] = truncated
+	return summary
+
+
+def _build_backend() -> PubSubBackend:
+	if settings.EVENTS_BACKEND == "postgres":
+		return PostgresBackend(engine)
+	return MemoryBackend()
+
+
+events = EventBroker(_build_backend(), queue_size=settings.EVENTS_QUEUE_SIZE)
@@ -0,0 +1,19 @@
+from collections.abc import Iterable
+
+from pydantic import BaseModel
+
+from app.core.exceptions import BizException
+
+
+def parse_fields(
+	fields: str | None, schema: type[BaseModel], always: Iterable[str] = ("id",)
+) -> tuple[str, ...] | None:
+	"""解析稀疏字段参数 fields=a,b,c，返回按 schema 声明顺序排列的字段名；未指定时返回 None 表示全部字段"""
+	if fields is None:
+		return None
+	requested = {name.strip() for name in fields.split(",") if name.strip()}
+	unknown = requested - schema.model_fields.keys()
+	if unknown:
+		raise BizException(code=400, msg=f"Unknown fields: {', '.join(sorted(unknown))}")
+	requested.update(always)
+	return tuple(name for name in schema.model_fields if name in requested)
@@ -0,0 +1,23 @@
+from collections.abc import Awaitable, Callable
+
+from loguru import logger
+
+ShutdownHook = Callable[[], Awaitable[None]]
+
+# 应用关闭时执行的清理，由各模块在导入时登记，core 不需要反向依赖业务层
+_shutdown_hooks: list[ShutdownHook] = []
+
+
+def on_shutdown(hook: ShutdownHook) -> ShutdownHook:
+	"""登记关闭时执行的清理，可作为装饰器使用；在释放数据库连接之前执行"""
+	_shutdown_hooks.append(hook)
+	return hook
+
+
+async def run_shutdown_hooks() -> None:
+	"""按登记的逆序执行，单个清理失败不影响其余清理"""
+	for hook in reversed(_shutdown_hooks):
+		try:
+			await hook()
+		except Exception:
+			logger.exception("Shutdown hook failed: {}", getattr(hook, "__qualname__", hook))
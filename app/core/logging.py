@@ -1,48 +1,204 @@
+import atexit
+import copy
+import inspect
+import logging
 import sys
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
 from pathlib import Path
+from typing import TextIO
 
 from loguru import logger
 
 from app.core.config import settings
 
 
+class _RotatingFile:
+	"""写线程使用的文件目标：由独立的 loguru 实例负责写入、轮转、压缩和清理"""
+
+	def __init__(self, path: Path, **options):
+		# 必须在全局 logger 没有 handler 时复制，得到一个互不影响的实例
+		self._logger = copy.deepcopy(logger)
+		self._logger.add(path, format="{message}", level=0, **options)
+
+	def write(self, message: str) -> None:
+		self._logger.opt(raw=True).log(0, message)
+
+	def flush(self) -> None:
+		pass
+
+
+class LogWriter:
+	"""后台写日志线程
+
+	日志在调用方格式化后追加到有界缓冲区，写线程每隔 interval 秒批量写出，写 stdout、写文件、轮转压缩都不在
+	事件循环线程中执行。缓冲区满时 block=False 丢弃新日志并计数，由写线程补记一条警告；block=True 时调用方
+	等待写线程腾出空间（背压）。
+	"""
+
+	def __init__(self, maxsize: int, block: bool = False, interval: float = 0.05):
+		self.maxsize = maxsize
+		self.block = block
+		self.interval = interval
+		self.dropped = 0
+		self.failed = 0
+		self._reported = 0
+		self._closed = False
+		# deque 的 append / popleft 是原子操作，调用方不需要加锁
+		self._buffer: deque[tuple[TextIO, str]] = deque()
+		self._wakeup = threading.Event()
+		self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+		self._thread.start()
+
+	def sink(self, target: TextIO) -> Callable[[str], None]:
+		"""把 target 包装为 loguru sink，关闭后直接同步写入"""
+
+		def enqueue(message: str) -> None:
+			if self._closed:
+				target.write(message)
+				return
+			if len(self._buffer) >= self.maxsize:
+				if not self.block:
+					self.dropped += 1
+					return
+				self._wakeup.set()
+				while len(self._buffer) >= self.maxsize and not self._closed:
+					time.sleep(0.001)
+			self._buffer.append((target, message))
+
+		return enqueue
+
+	def _drain(self) -> None:
+		batches: dict[TextIO, list[str]] = {}
+		while self._buffer:
+			target, message = self._buffer.popleft()
+			batches.setdefault(target, []).append(message)
+		# 每个目标每批只写入、flush 一次；一个目标写入失败（磁盘满、轮转出错）不影响其他目标
+		for target, messages in batches.items():
+			try:
+				target.write("".join(messages))
+				target.flush()
+			except Exception as e:
+				self.failed += len(messages)
+				sys.stderr.write(f"Log writer failed to write {len(messages)} messages: {e!r}\n")
+		if self.dropped > self._reported:
+			dropped, self._reported = self.dropped - self._reported, self.dropped
+			logger.warning("Log buffer full, dropped {} messages", dropped)
+
+	def _run(self) -> None:
+		while not self._closed:
+			self._wakeup.wait(self.interval)
+			self._wakeup.clear()
+			# 写线程退出后日志会一直丢弃（block=False）或让调用方一直等待（block=True），任何异常都不能让它退出
+			try:
+				self._drain()
+			except Exception as e:
+				sys.stderr.write(f"Log writer error: {e!r}\n")
+
+	def close(self, timeout: float = 5) -> None:
+		"""写完缓冲区中的日志后停止写线程"""
+		if self._closed:
+			return
+		self._closed = True
+		self._wakeup.set()
+		self._thread.join(timeout)
+		# 写线程仍在写入时不能并发取缓冲区，超时后剩余的日志交给写线程
+		if not self._thread.is_alive():
+			self._drain()
+
+
+class _InterceptHandler(logging.Handler):
+	"""把标准库 logging（如 SQLAlchemy 的 echo 输出）转交给 loguru"""
+
+	def emit(self, record: logging.LogRecord) -> None:
+		try:
+			level: str | int = logger.level(record.levelname).name
+		except ValueError:
+			level = record.levelno
+		frame, depth = inspect.currentframe(), 0
+		while frame and (depth == 0 or frame.f_code.co_filename == logging.__file__):
+			frame = frame.f_back
+			depth += 1
+		logger.opt(depth=depth, exception=record.exc_info).log(level, record.getMessage())
+
+
+def _intercept_sqlalchemy() -> None:
+	# echo=True 时 SQLAlchemy 会给引擎的 logger 直接挂一个同步写 stdout 的 handler，替换为转交 loguru
+	for name in list(logging.root.manager.loggerDict):
+		if name.startswith("sqlalchemy."):
+			logging.getLogger(name).handlers.clear()
+	sqlalchemy_logger = logging.getLogger("sqlalchemy")
+	sqlalchemy_logger.handlers = [_InterceptHandler()]
+	sqlalchemy_logger.propagate = False
+
+
+_writer: LogWriter | None = None
+
+
 def setup_logging() -> None:
 	"""配置 Loguru 日志系统
 
-	- 控制台输出：彩色格式化，便于开发调试
+	- 控制台输出：text 格式为彩色格式化，便于开发调试；json 格式为每行一条 JSON，不含颜色
 	- 文件输出：按天轮转，保留 7 天，用于生产环境追踪
+	- LOG_QUEUE_SIZE > 0 时两者都由后台线程写入，见 LogWriter
 	"""
+	global _writer
+
 	# 移除默认的 handler
 	logger.remove()
+	if _writer is not None:
+		_writer.close()
+		_writer = None
 
-	# 控制台输出配置
+	json_format = settings.LOG_FORMAT == "json"
 	log_format = (
 		"<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | "
 		"<level>{level: <8}</level> | "
 		"<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
 		"<level>{message}</level>"
 	)
-
-	logger.add(
-		sys.stdout,
-		format=log_format,
-		level=settings.LOG_LEVEL,
-		colorize=True,
-	)
-
-	# 文件输出配置（可选）
+	file_options = {
+		"rotation": settings.LOG_FILE_ROTATION,
+		"retention": settings.LOG_FILE_RETENTION,
+		"compression": "zip",  # 压缩旧日志节省空间
+		"encoding": "utf-8",
+	}
+	sinks: list[tuple[object, bool]] = [(sys.stdout, not json_format)]
 	if settings.LOG_FILE_ENABLED:
-		log_dir = Path("logs")
-		log_dir.mkdir(exist_ok=True)
+		log_dir = Path(settings.LOG_DIR)
+		log_dir.mkdir(parents=True, exist_ok=True)
+		log_file = log_dir / ("app.jsonl" if json_format else "app.log")
+		if settings.LOG_QUEUE_SIZE > 0:
+			sinks.append((_RotatingFile(log_file, **file_options), False))
+		else:
+			sinks.append((log_file, False))
 
+	if settings.LOG_QUEUE_SIZE > 0:
+		_writer = LogWriter(settings.LOG_QUEUE_SIZE, block=settings.LOG_QUEUE_BLOCK)
+	for sink, colorize in sinks:
+		options = file_options if isinstance(sink, Path) else {}
+		if _writer is not None:
+			sink = _writer.sink(sink)
 		logger.add(
-			log_dir / "app.log",
+			sink,
 			format=log_format,
 			level=settings.LOG_LEVEL,
-			rotation=settings.LOG_FILE_ROTATION,
-			retention=settings.LOG_FILE_RETENTION,
-			compression="zip",  # 压缩旧日志节省空间
-			encoding="utf-8",
+			colorize=colorize,
+			serialize=json_format,
+			**options,
 		)
 
-	logger.info(f"Logging configured: level={settings.LOG_LEVEL}, file_enabled={settings.LOG_FILE_ENABLED}")
+	_intercept_sqlalchemy()
+	logger.info(
+		f"Logging configured: level={settings.LOG_LEVEL}, format={settings.LOG_FORMAT}, "
+		f"queue_size={settings.LOG_QUEUE_SIZE}, file_enabled={settings.LOG_FILE_ENABLED}"
+	)
+
+
+@atexit.register
+def stop_logging() -> None:
+	"""写完缓冲区中剩余的日志，应用关闭时调用"""
+	if _writer is not None:
+		_writer.close()
@@ -0,0 +1,134 @@
+import time
+from bisect import bisect_left
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.querylog import QueryStats
+
+# 请求耗时、数据库耗时的分桶（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# 单个请求执行的 SQL 条数的分桶
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value) -> str:
+	return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+	return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+class Counter:
+	def __init__(self, name: str, help: str, labels: tuple[str, ...]):
+		self.name = name
+		self.help = help
+		self.labels = labels
+		self._values: dict[tuple, float] = {}
+
+	def inc(self, labels: tuple, value: float = 1) -> None:
+		self._values[labels] = self._values.get(labels, 0) + value
+
+	def render(self) -> list[str]:
+		lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+		for labels, value in self._values.items():
+			lines.append(f"{self.name}{{{_labels(self.labels, labels)}}} {value}")
+		return lines
+
+
+class Histogram:
+	"""每组标签各自记录分桶计数、总和与次数；分桶计数在输出时才累加，记录时只加一个桶"""
+
+	def __init__(self, name: str, help: str, labels: tuple[str, ...], buckets: tuple[float, ...]):
+		self.name = name
+		self.help = help
+		self.labels = labels
+		self.buckets = buckets
+		# {标签值: [各分桶计数..., +Inf 桶计数, 总和]}
+		self._series: dict[tuple, list[float]] = {}
+
+	def observe(self, labels: tuple, value: float) -> None:
+		series = self._series.get(labels)
+		if series is None:
+			series = self._series[labels] = [0] * (len(self.buckets) + 2)
+		series[bisect_left(self.buckets, value)] += 1
+		series[-1] += value
+
+	def render(self) -> list[str]:
+		lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+		for labels, series in self._series.items():
+			prefix = _labels(self.labels, labels)
+			count = 0
+			for bound, n in zip((*self.buckets, "+Inf"), series):
+				count += n
+				lines.append(f'{self.name}_bucket{{{prefix},le="{bound}"}} {count}')
+			lines.append(f"{self.name}_sum{{{prefix}}} {series[-1]}")
+			lines.append(f"{self.name}_count{{{prefix}}} {count}")
+		return lines
+
+
+class RequestMetrics:
+	"""按路由（即 OpenAPI operationId）统计的请求指标，以 Prometheus 文本格式输出"""
+
+	def __init__(self):
+		self.in_flight = 0
+		self.requests = Counter("http_requests_total", "HTTP 请求数", ("route", "method", "status"))
+		self.latency = Histogram("http_request_duration_seconds", "HTTP 请求耗时", ("route", "method"), LATENCY_BUCKETS)
+		self.queries = Histogram(
+			"http_request_db_queries", "单个请求执行的 SQL 条数", ("route", "method"), QUERY_COUNT_BUCKETS
+		)
+		self.query_duration = Histogram(
+			"http_request_db_duration_seconds", "单个请求执行 SQL 的总耗时", ("route", "method"), LATENCY_BUCKETS
+		)
+
+	def record(self, route: str, method: str, status: int, duration: float, stats: QueryStats) -> None:
+		self.requests.inc((route, method, status))
+		self.latency.observe((route, method), duration)
+		self.queries.observe((route, method), stats.count)
+		self.query_duration.observe((route, method), stats.duration)
+
+	def render(self) -> str:
+		lines = [
+			"# HELP http_requests_in_flight 正在处理的 HTTP 请求数",
+			"# TYPE http_requests_in_flight gauge",
+			f"http_requests_in_flight {self.in_flight}",
+		]
+		for metric in (self.requests, self.latency, self.queries, self.query_duration):
+			lines.extend(metric.render())
+		return "\n".join(lines) + "\n"
+
+
+metrics = RequestMetrics()
+
+
+class MetricsMiddleware:
+	"""记录每个请求的路由、状态码、耗时，以及内层 QueryLogMiddleware 统计的 SQL 条数/耗时；未匹配到路由的请求记为 unmatched"""
+
+	def __init__(self, app: ASGIApp, registry: RequestMetrics = metrics):
+		self.app = app
+		self.registry = registry
+
+	async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+		if scope["type"] != "http":
+			await self.app(scope, receive, send)
+			return
+
+		status = 500
+
+		async def send_with_status(message: Message) -> None:
+			nonlocal status
+			if message["type"] == "http.response.start":
+				status = message["status"]
+			await send(message)
+
+		self.registry.in_flight += 1
+		start = time.perf_counter()
+		try:
+			await self.app(scope, receive, send_with_status)
+		finally:
+			duration = time.perf_counter() - start
+			self.registry.in_flight -= 1
+			# 路由匹配后 Starlette 会把 route 写入 scope
+			route = scope.get("route")
+			name = getattr(route, "name", None) or "unmatched"
+			self.registry.record(name, scope["method"], status, duration, scope.get("query_stats") or QueryStats())
@@ -0,0 +1,87 @@
+import base64
+import json
+from collections.abc import Callable
+from datetime import datetime
+from enum import StrEnum
+from typing import Any
+
+from app.core.exceptions import BizException
+
+
+class TotalMode(StrEnum):
+	"""列表接口 total 的计算方式"""
+
+	exact = "exact"  # 精确 COUNT(*)
+	estimate = "estimate"  # PostgreSQL 取查询计划估算行数，其他数据库取短时缓存的计数
+	none = "none"  # 不统计总数，客户端依靠 has_more 翻页
+
+
+def _to_json(value: Any) -> Any:
+	if isinstance(value, datetime):
+		return value.isoformat()
+	return str(value)
+
+
+def encode_cursor(*values: Any) -> str:
+	"""把排序键编码为不透明游标，客户端只需原样回传"""
+	raw = json.dumps([_to_json(v) for v in values], separators=(",", ":"))
+	return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *parsers: Callable[[str], Any]) -> tuple:
+	"""按 parsers 依次还原排序键，格式不合法时抛出 400"""
+	try:
+		raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+		values = json.loads(raw)
+		if not isinstance(values, list) or len(values) != len(parsers) or not all(isinstance(v, str) for v in values):
+			raise ValueError
+		return tuple(parse(v) for parse, v in zip(parsers, values, strict=True))
+	except ValueError:
+		raise BizException(code=400, msg="Invalid cursor") from None
+
+
+def decode_cursors(
+	before: str | None, after: str | None, *parsers: Callable[[str], Any]
+) -> tuple[tuple | None, tuple | None]:
+	"""解析 before / after 游标，二者只能传一个"""
+	if before is not None and after is not None:
+		raise BizException(code=400, msg="Only one of before and after can be set")
+	return (
+		decode_cursor(before, *parsers) if before is not None else None,
+		decode_cursor(after, *parsers) if after is not None else None,
+	)
+
+
+def cursor_page(items: list, page_size: int, backward: bool, key: Callable[[Any], tuple]) -> dict:
+	"""裁剪多取一条的键集分页结果，返回当前页数据及前后游标
+
+	items 需按展示顺序排列且最多 page_size + 1 条；多出的一条说明翻页方向上还有数据。
+	"""
+	has_more = len(items) > page_size
+	if backward:
+		items = items[1:] if has_more else items
+		has_next, has_prev = True, has_more
+	else:
+		items = items[:page_size]
+		has_next, has_prev = has_more, True
+	return {
+		"list": items,
+		"has_more": has_next,
+		"next_cursor": encode_cursor(*key(items[-1])) if items and has_next else None,
+		"prev_cursor": encode_cursor(*key(items[0])) if items and has_prev else None,
+	}
+
+
+def offset_page(items: list, offset: int, page_size: int, key: Callable[[Any], tuple] | None = None) -> dict:
+	"""裁剪多取一条的偏移分页结果，无需 COUNT 即可得到 has_more
+
+	传入 key 时同样返回游标，客户端可从任意一页切换到游标分页。
+	"""
+	has_more = len(items) > page_size
+	items = items[:page_size]
+	return {
+		"list": items,
+		"has_more": has_more,
+		"next_cursor": encode_cursor(*key(items[-1])) if key and items and has_more else None,
+		"prev_cursor": encode_cursor(*key(items[0])) if key and items and offset > 0 else None,
+	}
@@ -0,0 +1,133 @@
+import re
+import time
+from collections.abc import Iterable
+from contextvars import ContextVar
+from typing import Any
+
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.interfaces import ExecuteStyle
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+
+# 形如 (?, ?, ?) / ($1, $2) 的占位符列表折叠为 (?)，IN 列表长度不同的语句视为同一形状
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|\$\d+|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|\$\d+|%s|%\(\w+\)s|:\w+))*\s*\)")
+# 多行 VALUES (?), (?), ... 折叠为一组
+_REPEATED_GROUPS = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+# 批量操作按块、按会话逐条执行的语句带上该执行选项，同一形状重复执行是预期行为，不计入 N+1
+BULK_CHUNK: dict[str, Any] = {"bulk_chunk": True}
+
+
+class NPlusOneError(RuntimeError):
+	"""严格模式下单个请求重复执行同一形状的语句次数过多"""
+
+
+class QueryStats:
+	"""单个请求执行的 SQL 统计：条数、总耗时、各形状语句的执行次数"""
+
+	__slots__ = ("count", "duration", "scope", "shapes")
+
+	def __init__(self, scope: Scope | None = None):
+		self.count = 0
+		self.duration = 0.0
+		self.scope = scope
+		self.shapes: dict[str, int] = {}
+
+	@property
+	def route(self) -> str:
+		route = self.scope.get("route") if self.scope is not None else None
+		return getattr(route, "name", None) or "-"
+
+
+# 当前请求的 SQL 统计，由 QueryLogMiddleware 设置，引擎事件累加
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def statement_shape(statement: str) -> str:
+	shape = _PLACEHOLDER_LIST.sub("(?)", _WHITESPACE.sub(" ", statement).strip())
+	return _REPEATED_GROUPS.sub("(?)", shape)
+
+
+def _redact(value: Any) -> Any:
+	if value is None or isinstance(value, (bool, int, float)):
+		return value
+	if isinstance(value, (str, bytes)):
+		return f"<{type(value).__name__}:{len(value)}>"
+	return f"<{type(value).__name__}>"
+
+
+def redact_parameters(parameters: Any) -> Any:
+	"""保留数字、布尔和 NULL，字符串只保留长度，其余只保留类型名"""
+	if isinstance(parameters, dict):
+		return {key: _redact(value) for key, value in parameters.items()}
+	if isinstance(parameters, Iterable) and not isinstance(parameters, (str, bytes)):
+		return [_redact(value) for value in parameters]
+	return _redact(parameters)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+	# 记在本次执行的上下文上，执行失败时随上下文一起丢弃
+	if context is not None:
+		context._query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+	start = getattr(context, "_query_start", None)
+	if start is None:
+		return
+	elapsed = time.perf_counter() - start
+	stats = _current.get()
+
+	if settings.DB_SLOW_QUERY_MS and elapsed * 1000 >= settings.DB_SLOW_QUERY_MS:
+		logger.warning(
+			"Slow query: {:.1f} ms, route={}, statement={}, parameters={}",
+			elapsed * 1000,
+			stats.route if stats is not None else "-",
+			statement_shape(statement),
+			"<executemany>" if executemany else redact_parameters(parameters),
+		)
+
+	if stats is None:
+		return
+	stats.count += 1
+	stats.duration += elapsed
+	threshold = settings.DB_N_PLUS_ONE_THRESHOLD
+	# 一次多行插入被拆成的多个批次、批量操作分块执行的语句不算重复执行
+	if (
+		not threshold
+		or context.execute_style is ExecuteStyle.INSERTMANYVALUES
+		or context.execution_options.get("bulk_chunk")
+	):
+		return
+	shape = statement_shape(statement)
+	times = stats.shapes[shape] = stats.shapes.get(shape, 0) + 1
+	# 每个形状每个请求只报告一次
+	if times == threshold + 1:
+		msg = f"Possible N+1: statement executed more than {threshold} times, route={stats.route}, statement={shape}"
+		if settings.DB_QUERY_STRICT:
+			raise NPlusOneError(msg)
+		logger.warning(msg)
+
+
+class QueryLogMiddleware:
+	"""为每个请求建立 QueryStats，结束后放在 scope["query_stats"] 供外层中间件读取"""
+
+	def __init__(self, app: ASGIApp):
+		self.app = app
+
+	async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+		if scope["type"] != "http":
+			await self.app(scope, receive, send)
+			return
+		stats = scope["query_stats"] = QueryStats(scope)
+		token = _current.set(stats)
+		try:
+			await self.app(scope, receive, send)
+		finally:
+			_current.reset(token)
@@ -0,0 +1,111 @@
+import itertools
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# 写请求成功后下发的 cookie，有效期内该客户端的读请求走主库
+PRIMARY_COOKIE = "db_primary"
+
+# 副本不可用时可能抛出的异常：驱动错误或网络错误
+_UNAVAILABLE = (DBAPIError, OSError)
+
+# 副本已回放完收到的 WAL 时延迟为 0，否则取最后一次回放的事务距今的秒数
+_PG_LAG_SQL = text(
+	"SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+	" ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaSet:
+	"""只读副本：轮询选择健康的副本，连接失败或延迟过大时暂时摘除，全部不可用时回退主库"""
+
+	def __init__(self, engines: list[AsyncEngine], max_lag: float, check_interval: float, retry_after: float):
+		self.engines = engines
+		self.max_lag = max_lag
+		self.check_interval = check_interval
+		self.retry_after = retry_after
+		self._next = itertools.count()
+		self._checked_at: dict[AsyncEngine, float] = {}
+		self._down_until: dict[AsyncEngine, float] = {}
+
+	async def _healthy(self, engine: AsyncEngine) -> bool:
+		"""PostgreSQL 副本检查回放延迟，其他数据库只确认可以连接"""
+		try:
+			async with engine.connect() as conn:
+				if engine.dialect.name == "postgresql":
+					return await conn.scalar(_PG_LAG_SQL) <= self.max_lag
+		except _UNAVAILABLE:
+			return False
+		return True
+
+	def mark_down(self, engine: AsyncEngine) -> None:
+		self._down_until[engine] = time.monotonic() + self.retry_after
+		logger.warning("Replica unavailable, falling back to primary: url={}", engine.url)
+
+	async def choose(self) -> AsyncEngine | None:
+		"""返回一个可用副本，没有时返回 None；健康检查每个副本每 check_interval 秒最多一次"""
+		for _ in range(len(self.engines)):
+			engine = self.engines[next(self._next) % len(self.engines)]
+			now = time.monotonic()
+			if self._down_until.get(engine, 0) > now:
+				continue
+			if now - self._checked_at.get(engine, float("-inf")) >= self.check_interval:
+				self._checked_at[engine] = now
+				if not await self._healthy(engine):
+					self.mark_down(engine)
+					continue
+			return engine
+		return None
+
+	@asynccontextmanager
+	async def session(
+		self, session_factory: async_sessionmaker, use_primary: bool = False
+	) -> AsyncIterator[AsyncSession]:
+		"""打开只读会话，副本会话的 info["replica"] 为 True；副本连接失败时换用主库"""
+		engine = None if use_primary else await self.choose()
+		session = None
+		if engine is not None:
+			session = session_factory(bind=engine, info={"replica": True})
+			try:
+				await session.connection()
+			except _UNAVAILABLE:
+				await session.close()
+				self.mark_down(engine)
+				session = None
+		if session is None:
+			session = session_factory()
+		try:
+			yield session
+		finally:
+			await session.close()
+
+	async def dispose(self) -> None:
+		for engine in self.engines:
+			await engine.dispose()
+
+
+class StickyPrimaryMiddleware:
+	"""写请求成功后下发短期 cookie，有效期内该客户端读到的是自己刚写入的数据"""
+
+	def __init__(self, app: ASGIApp, max_age: float):
+		self.app = app
+		self.cookie = f"{PRIMARY_COOKIE}=1; Max-Age={int(max_age)}; Path=/; HttpOnly; SameSite=Lax"
+
+	async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+		if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+			await self.app(scope, receive, send)
+			return
+
+		async def send_with_cookie(message: Message) -> None:
+			if message["type"] == "http.response.start" and message["status"] < 400:
+				MutableHeaders(scope=message).append("set-cookie", self.cookie)
+			await send(message)
+
+		await self.app(scope, receive, send_with_cookie)
@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import JSON, String, func
+from sqlalchemy import JSON, Index, String, func, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.database import Base
@@ -11,11 +11,28 @@ class Conversation(Base):
 	__tablename__ = "conversations"
 
 	id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
-	user_id: Mapped[str] = mapped_column(String(64), nullable=False, index=True)
+	user_id: Mapped[str] = mapped_column(String(64), nullable=False)
 	title: Mapped[str | None] = mapped_column(String(255), nullable=True)
 	model_name: Mapped[str | None] = mapped_column(String(50), nullable=True)
 	extra_data: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+	# 冗余字段，由 MessageRepository 在写消息的同一事务内维护
+	message_count: Mapped[int] = mapped_column(default=0, server_default="0")
+	last_message_at: Mapped[datetime | None] = mapped_column(nullable=True)
+	# 会话或其消息每次变更都自增，用作 ETag；SQLite 的时间戳只精确到秒，不能单独作为版本
+	version: Mapped[int] = mapped_column(default=1, server_default="1", onupdate=text("version + 1"))
 	created_at: Mapped[datetime] = mapped_column(server_default=func.now())
 	updated_at: Mapped[datetime] = mapped_column(server_default=func.now(), onupdate=func.now())
 
-	messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
+	# 删除会话时由数据库 ON DELETE CASCADE 清理消息，不把子消息加载到内存
+	messages = relationship(
+		"Message", back_populates="conversation", cascade="all, delete-orphan", passive_deletes=True
+	)
+
+
+# 按用户列出会话时直接沿索引顺序读取，无需排序，游标分页每页代价恒定
+Index(
+	"ix_conversations_user_id_updated_at_id",
+	Conversation.user_id,
+	Conversation.updated_at.desc(),
+	Conversation.id.desc(),
+)
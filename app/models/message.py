@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import JSON, ForeignKey, String, Text, func
+from sqlalchemy import JSON, ForeignKey, Index, String, Text, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.database import Base
@@ -9,10 +9,14 @@ from app.core.database import Base
 
 class Message(Base):
 	__tablename__ = "messages"
+	# 复合索引覆盖按会话过滤 + (created_at, id) 排序，游标分页每页代价恒定
+	__table_args__ = (Index("ix_messages_conversation_id_created_at_id", "conversation_id", "created_at", "id"),)
 
-	id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
+	# UUIDv7：created_at 只精确到秒，游标按 (created_at, id) 排序，同一秒内的消息靠 id 区分先后
+	# 标准库的 uuid7 在同一毫秒内用计数器递增，只保证同一进程内的生成顺序；多个 worker 同一秒写入的消息之间按 id 排序，不代表写入顺序
+	id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid7)
 	conversation_id: Mapped[uuid.UUID] = mapped_column(
-		ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False, index=True
+		ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False
 	)
 	role: Mapped[str] = mapped_column(String(20), nullable=False)
 	content: Mapped[str] = mapped_column(Text, nullable=False)
@@ -1,35 +1,316 @@
+import copy
+import json
+import time
+from collections.abc import Iterable, Sequence
+from itertools import batched
 from typing import Any
 
 from pydantic import BaseModel
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import ColumnElement, Row, Select, delete, event, exists, func, insert, inspect, select, text, update
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import load_only, make_transient_to_detached
 
-from app.core.database import Base
+from app.core.cache import cache
+from app.core.config import settings
+from app.core.database import Base, after_commit, commit, engine
+from app.core.pagination import TotalMode
+from app.core.querylog import BULK_CHUNK
+
+# 计数缓存：{表名: {(SQL, 参数): (过期时间, 行数)}}，每张表按插入顺序淘汰最旧的条目
+# 条目按 COUNT_CACHE_TTL 过期；估算值不必跟随逐行写入，只有批量写入会提前清除整表
+_COUNT_CACHE_MAX_SIZE = 1024
+_count_cache: dict[str, dict[tuple, tuple[float, int]]] = {}
+
+
+def clear_count_cache() -> None:
+	_count_cache.clear()
+
+
+def _invalidate_counts(conn, cursor, statement, parameters, context, executemany):
+	"""批量 INSERT / UPDATE / DELETE 执行后清除该表的计数缓存；删除时级联删除的子表一并清除"""
+	if context is None or context.compiled is None or not (context.isinsert or context.isupdate or context.isdelete):
+		return
+	if not context.execution_options.get("bulk_chunk"):
+		return
+	table = context.compiled.statement.table
+	_count_cache.pop(table.name, None)
+	if context.isdelete:
+		for other in table.metadata.tables.values():
+			if any(fk.column.table is table for fk in other.foreign_keys):
+				_count_cache.pop(other.name, None)
+
+
+def track_count_cache(engine: AsyncEngine) -> None:
+	"""在应用的写引擎上监听批量写入；种子工具、基准脚本、只读副本的引擎不影响计数缓存"""
+	event.listen(engine.sync_engine, "after_cursor_execute", _invalidate_counts)
+
+
+track_count_cache(engine)
+
+
+async def _estimate_count(db: AsyncSession, stmt: Select) -> int:
+	"""读取 PostgreSQL 查询计划中的估算行数，不扫描数据"""
+	dialect = db.get_bind().dialect
+	# EXPLAIN 不支持绑定参数，由方言负责转义字面量
+	sql = str(stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+	result = await db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+	plan = result.scalar_one()
+	if isinstance(plan, str):
+		plan = json.loads(plan)
+	return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def _cached_count(db: AsyncSession, table: str, count_stmt: Select) -> int:
+	compiled = count_stmt.compile(dialect=db.get_bind().dialect)
+	key = (str(compiled), tuple(sorted(compiled.params.items())))
+	now = time.monotonic()
+	cached = _count_cache.get(table, {}).get(key)
+	if cached is not None and cached[0] > now:
+		return cached[1]
+	total = (await db.execute(count_stmt)).scalar_one()
+	# 计数期间表有写入时，缓存已被清除，这里写入的可能是旧值，等 TTL 过期即可
+	entries = _count_cache.setdefault(table, {})
+	entries.pop(key, None)
+	if len(entries) >= _COUNT_CACHE_MAX_SIZE:
+		entries.pop(next(iter(entries)))
+	entries[key] = (now + settings.COUNT_CACHE_TTL, total)
+	return total
 
 
 class BaseRepository[T: Base]:
 	model: type[T]
+	# 批量操作每条 SQL 处理的最大行数，避免超出数据库的参数数量上限
+	bulk_chunk_size: int = 500
+
+	@classmethod
+	def _pk(cls):
+		return inspect(cls.model).primary_key[0]
+
+	@classmethod
+	def _project(cls, stmt: Select, columns: Sequence[str] | None) -> Select:
+		"""只加载指定的列，访问其余列直接报错而不是隐式查库；columns 为 None 时加载整行"""
+		if columns is None:
+			return stmt
+		return stmt.options(load_only(*(getattr(cls.model, name) for name in columns), raiseload=True))
+
+	@classmethod
+	async def count(cls, db: AsyncSession, stmt: Select, mode: TotalMode = TotalMode.exact) -> int | None:
+		"""统计 stmt 命中的行数，按 mode 返回精确值、估算值或 None"""
+		if mode == TotalMode.none:
+			return None
+		count_stmt = stmt.with_only_columns(func.count(), maintain_column_froms=True).order_by(None)
+		if mode == TotalMode.exact:
+			return (await db.execute(count_stmt)).scalar_one()
+		if db.get_bind().dialect.name == "postgresql":
+			return await _estimate_count(db, stmt)
+		return await _cached_count(db, cls.model.__tablename__, count_stmt)
+
+	@classmethod
+	def _cache_key(cls, obj_id: Any) -> str:
+		return f"{cls.model.__tablename__}:{obj_id}"
+
+	@classmethod
+	def _cache_tags(cls, obj: T) -> tuple[str, ...]:
+		"""缓存条目依附的父记录 key，父记录删除时随之失效"""
+		return ()
+
+	@classmethod
+	async def invalidate(cls, db: AsyncSession, *obj_ids: Any, cascade: bool = False) -> None:
+		"""写入提交后清除缓存；cascade=True 时一并清除依附于这些记录的子记录缓存"""
+		keys = [cls._cache_key(obj_id) for obj_id in obj_ids]
+
+		async def clear() -> None:
+			await cache.delete(*keys)
+			if cascade:
+				await cache.invalidate_tags(*keys)
+
+		await after_commit(db, clear)
 
 	@classmethod
 	async def get_by_id(cls, db: AsyncSession, obj_id: Any) -> T | None:
-		return await db.get(cls.model, obj_id)
+		"""先查会话 identity map，再查缓存，最后才访问数据库"""
+		obj = db.identity_map.get(inspect(cls.model).identity_key_from_primary_key((obj_id,)))
+		if obj is not None:
+			return obj
+		key = cls._cache_key(obj_id)
+		values = await cache.get(key)
+		if values is not None:
+			obj = cls.model(**copy.deepcopy(values))
+			make_transient_to_detached(obj)
+			return await db.merge(obj, load=False)
+		since = cache.invalidations
+		obj = await db.get(cls.model, obj_id)
+		# 副本可能落后于主库，读到的旧值不写入共享缓存
+		if obj is not None and not db.info.get("replica"):
+			values = {attr.key: getattr(obj, attr.key) for attr in inspect(cls.model).column_attrs}
+			await cache.set(key, copy.deepcopy(values), tags=cls._cache_tags(obj), since=since)
+		return obj
 
 	@classmethod
 	async def create(cls, db: AsyncSession, create_in: BaseModel) -> T:
 		obj = cls.model(**create_in.model_dump())
 		db.add(obj)
-		await db.commit()
-		await db.refresh(obj)
+		await commit(db)
 		return obj
 
 	@classmethod
 	async def update(cls, db: AsyncSession, obj: T, update_in: BaseModel) -> T:
 		for key, value in update_in.model_dump(exclude_unset=True).items():
 			setattr(obj, key, value)
-		await db.commit()
-		await db.refresh(obj)
+		await commit(db)
+		await cls.invalidate(db, getattr(obj, cls._pk().key))
 		return obj
 
 	@classmethod
 	async def delete(cls, db: AsyncSession, obj: T) -> None:
 		await db.delete(obj)
-		await db.commit()
+		await commit(db)
+		await cls.invalidate(db, getattr(obj, cls._pk().key), cascade=True)
+
+	@classmethod
+	async def update_by_id(cls, db: AsyncSession, obj_id: Any, update_in: BaseModel) -> T | None:
+		"""单条 UPDATE ... RETURNING 完成更新并取回整行，记录不存在时返回 None"""
+		values = update_in.model_dump(exclude_unset=True)
+		if not values:
+			return await cls.get_by_id(db, obj_id)
+		stmt = update(cls.model).where(cls._pk() == obj_id).values(**values)
+		if db.get_bind().dialect.update_returning:
+			result = await db.execute(stmt.returning(cls.model))
+			obj = result.scalar_one_or_none()
+			await commit(db)
+			await cls.invalidate(db, obj_id)
+			return obj
+		result = await db.execute(stmt)
+		await commit(db)
+		await cls.invalidate(db, obj_id)
+		return await cls.get_by_id(db, obj_id) if result.rowcount else None
+
+	@classmethod
+	async def delete_by_id(cls, db: AsyncSession, obj_id: Any) -> bool:
+		"""单条 DELETE 完成删除，关联数据由数据库级联清理；返回记录是否存在"""
+		result = await db.execute(delete(cls.model).where(cls._pk() == obj_id))
+		await commit(db)
+		await cls.invalidate(db, obj_id, cascade=True)
+		return result.rowcount > 0
+
+	@classmethod
+	async def exists(cls, db: AsyncSession, obj_id: Any) -> bool:
+		result = await db.execute(select(exists().where(cls._pk() == obj_id)))
+		return result.scalar_one()
+
+	@classmethod
+	async def get_existing_ids(cls, db: AsyncSession, ids: Sequence[Any]) -> set[Any]:
+		return await cls._get_existing(db, cls._pk(), ids)
+
+	@classmethod
+	async def _get_existing(cls, db: AsyncSession, column: ColumnElement, values: Iterable[Any]) -> set[Any]:
+		"""返回 values 中在 column 上已存在的值，分块查询避免超出数据库的参数数量上限"""
+		existing = set()
+		for chunk in batched(set(values), cls.bulk_chunk_size):
+			result = await db.execute(select(column).where(column.in_(chunk)), execution_options=BULK_CHUNK)
+			existing.update(result.scalars().all())
+		return existing
+
+	@classmethod
+	async def _bulk_insert(cls, db: AsyncSession, creates_in: Sequence[BaseModel]) -> list[T]:
+		"""分块多行插入，不提交事务；支持的方言通过 RETURNING 一次取回服务端默认值"""
+		rows = [create_in.model_dump() for create_in in creates_in]
+		if not db.get_bind().dialect.insert_executemany_returning:
+			objs = [cls.model(**row) for row in rows]
+			db.add_all(objs)
+			await db.flush()
+			return objs
+		objs = []
+		for chunk in batched(rows, cls.bulk_chunk_size):
+			result = await db.scalars(
+				insert(cls.model).returning(cls.model, sort_by_parameter_order=True),
+				list(chunk),
+				execution_options=BULK_CHUNK,
+			)
+			objs.extend(result.all())
+		return objs
+
+	@classmethod
+	async def bulk_create(cls, db: AsyncSession, creates_in: Sequence[BaseModel]) -> list[T]:
+		"""单事务批量插入，按入参顺序返回"""
+		if not creates_in:
+			return []
+		objs = await cls._bulk_insert(db, creates_in)
+		await commit(db)
+		return objs
+
+	@classmethod
+	async def _bulk_update(cls, db: AsyncSession, updates_in: Sequence[BaseModel]) -> list[Any]:
+		"""分块按主键更新，不提交事务；返回入参中的主键"""
+		pk = cls._pk()
+		rows = [update_in.model_dump(exclude_unset=True) for update_in in updates_in]
+		# 只有主键、没有待更新字段的行无需执行 UPDATE
+		changed = [row for row in rows if len(row) > 1]
+		for chunk in batched(changed, cls.bulk_chunk_size):
+			await db.execute(update(cls.model), list(chunk), execution_options=BULK_CHUNK)
+		return [row[pk.key] for row in rows]
+
+	@classmethod
+	async def _get_by_ids(cls, db: AsyncSession, ids: Sequence[Any]) -> list[T]:
+		"""按主键重新读取整行，按入参顺序返回，不存在的主键跳过"""
+		pk = cls._pk()
+		objs = {}
+		for chunk in batched(set(ids), cls.bulk_chunk_size):
+			result = await db.execute(
+				select(cls.model).where(pk.in_(chunk)).execution_options(populate_existing=True, **BULK_CHUNK)
+			)
+			objs.update((getattr(obj, pk.key), obj) for obj in result.scalars().all())
+		return [objs[obj_id] for obj_id in ids if obj_id in objs]
+
+	@classmethod
+	async def bulk_update(cls, db: AsyncSession, updates_in: Sequence[BaseModel]) -> list[T]:
+		"""按主键批量更新，每个入参需包含主键字段；单事务执行，按入参顺序返回更新后的对象"""
+		ids = await cls._bulk_update(db, updates_in)
+		await commit(db)
+		await cls.invalidate(db, *ids)
+		return await cls._get_by_ids(db, ids)
+
+	@classmethod
+	async def _bulk_delete(
+		cls,
+		db: AsyncSession,
+		ids: Sequence[Any] | None,
+		where: Sequence[ColumnElement[bool]] | None,
+		*columns: ColumnElement,
+	) -> list[Row]:
+		"""分块删除，不提交事务；返回被删除行的主键及 columns 指定的列
+
+		ids 与 where 都为空时抛出 ValueError，避免误删整张表。
+		"""
+		pk = cls._pk()
+		if ids is not None:
+			criteria_chunks = [[pk.in_(chunk)] for chunk in batched(set(ids), cls.bulk_chunk_size)]
+		elif where:
+			criteria_chunks = [list(where)]
+		else:
+			raise ValueError(f"Bulk delete on {cls.model.__tablename__} requires ids or where criteria")
+		returning = (pk, *columns)
+		deleted = []
+		for criteria in criteria_chunks:
+			stmt = delete(cls.model).where(*criteria)
+			if db.get_bind().dialect.delete_returning:
+				result = await db.execute(stmt.returning(*returning), execution_options=BULK_CHUNK)
+				deleted.extend(result.all())
+			else:
+				result = await db.execute(select(*returning).where(*criteria), execution_options=BULK_CHUNK)
+				deleted.extend(result.all())
+				await db.execute(stmt, execution_options=BULK_CHUNK)
+		return deleted
+
+	@classmethod
+	async def bulk_delete(
+		cls, db: AsyncSession, ids: Sequence[Any] | None = None, where: Sequence[ColumnElement[bool]] | None = None
+	) -> list[Any]:
+		"""按主键列表或过滤条件批量删除，单事务执行，返回被删除的主键
+
+		关联数据依赖数据库的 ON DELETE CASCADE 清理，不会加载到内存。
+		"""
+		deleted = [row[0] for row in await cls._bulk_delete(db, ids, where)]
+		await commit(db)
+		await cls.invalidate(db, *deleted, cascade=True)
+		return deleted
@@ -1,6 +1,11 @@
-from sqlalchemy import func, select
+import uuid
+from collections.abc import Sequence
+from datetime import datetime
+
+from sqlalchemy import select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.pagination import TotalMode
 from app.models.conversation import Conversation
 from app.repositories.base import BaseRepository
 
@@ -8,20 +13,68 @@ from app.repositories.base import BaseRepository
 class ConversationRepository(BaseRepository):
 	model = Conversation
 
+	@classmethod
+	async def get_version(cls, db: AsyncSession, conversation_id: uuid.UUID) -> int | None:
+		"""只读取版本号，会话不存在时返回 None
+
+		版本号决定是否返回 304，始终从数据库读取：进程内缓存在其他进程写入后可能仍是旧值。
+		"""
+		result = await db.execute(select(Conversation.version).where(Conversation.id == conversation_id))
+		return result.scalar_one_or_none()
+
 	@classmethod
 	async def get_list(
-		cls, db: AsyncSession, user_id: str | None = None, offset: int = 0, limit: int = 100
+		cls,
+		db: AsyncSession,
+		user_id: str | None = None,
+		offset: int = 0,
+		limit: int = 100,
+		columns: Sequence[str] | None = None,
 	) -> list[Conversation]:
-		stmt = select(Conversation)
+		stmt = cls._project(select(Conversation), columns)
 		if user_id is not None:
 			stmt = stmt.where(Conversation.user_id == user_id)
-		result = await db.execute(stmt.order_by(Conversation.updated_at.desc()).offset(offset).limit(limit))
+		result = await db.execute(
+			stmt.order_by(Conversation.updated_at.desc(), Conversation.id.desc()).offset(offset).limit(limit)
+		)
 		return list(result.scalars().all())
 
 	@classmethod
-	async def get_count(cls, db: AsyncSession, user_id: str | None = None) -> int:
-		stmt = select(func.count()).select_from(Conversation)
+	async def get_list_by_cursor(
+		cls,
+		db: AsyncSession,
+		user_id: str | None = None,
+		after: tuple[datetime, uuid.UUID] | None = None,
+		before: tuple[datetime, uuid.UUID] | None = None,
+		limit: int = 100,
+		columns: Sequence[str] | None = None,
+	) -> list[Conversation]:
+		"""键集分页：按 (updated_at, id) 定位，结果始终按更新时间倒序返回"""
+		stmt = cls._project(select(Conversation), columns)
 		if user_id is not None:
 			stmt = stmt.where(Conversation.user_id == user_id)
-		result = await db.execute(stmt)
-		return result.scalar_one()
+		key = tuple_(Conversation.updated_at, Conversation.id)
+		if before is not None:
+			stmt = stmt.where(key > before).order_by(Conversation.updated_at.asc(), Conversation.id.asc())
+		else:
+			if after is not None:
+				stmt = stmt.where(key < after)
+			stmt = stmt.order_by(Conversation.updated_at.desc(), Conversation.id.desc())
+		result = await db.execute(stmt.limit(limit))
+		conversations = list(result.scalars().all())
+		if before is not None:
+			conversations.reverse()
+		return conversations
+
+	@classmethod
+	async def get_count(
+		cls, db: AsyncSession, user_id: str | None = None, mode: TotalMode = TotalMode.exact
+	) -> int | None:
+		stmt = select(Conversation.id)
+		if user_id is not None:
+			stmt = stmt.where(Conversation.user_id == user_id)
+		return await cls.count(db, stmt, mode)
+
+	@classmethod
+	async def bulk_delete_by_user_id(cls, db: AsyncSession, user_id: str) -> list[uuid.UUID]:
+		return await cls.bulk_delete(db, where=[Conversation.user_id == user_id])
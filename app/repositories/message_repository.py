@@ -1,31 +1,248 @@
 import uuid
+from collections import Counter
+from collections.abc import AsyncIterator, Mapping, Sequence
+from datetime import datetime
+from itertools import batched
 
-from sqlalchemy import func, select
+from pydantic import BaseModel
+from sqlalchemy import ColumnElement, Row, case, delete, func, select, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.database import commit, rollback
+from app.core.pagination import TotalMode
+from app.core.querylog import BULK_CHUNK
+from app.models.conversation import Conversation
 from app.models.message import Message
 from app.repositories.base import BaseRepository
+from app.repositories.conversation_repository import ConversationRepository
 
 
 class MessageRepository(BaseRepository):
 	model = Message
 
+	@classmethod
+	def _cache_tags(cls, obj: Message) -> tuple[str, ...]:
+		# 会话删除时消息由数据库级联删除，缓存也随会话一起失效
+		return (ConversationRepository._cache_key(obj.conversation_id),)
+
+	@classmethod
+	async def _sync_conversation_stats(cls, db: AsyncSession, deltas: Mapping[uuid.UUID, int]) -> None:
+		"""按 {会话 id: 消息数变化} 调整 message_count，并按复合索引重算 last_message_at，调用方负责提交
+
+		每块会话只执行一条 UPDATE，message_count 的增量由 CASE 按会话取值。
+		"""
+		last_message_at = (
+			select(func.max(Message.created_at)).where(Message.conversation_id == Conversation.id).scalar_subquery()
+		)
+		for chunk in batched(deltas, cls.bulk_chunk_size):
+			delta = case({conversation_id: deltas[conversation_id] for conversation_id in chunk}, value=Conversation.id)
+			await db.execute(
+				update(Conversation)
+				.where(Conversation.id.in_(chunk))
+				.values(message_count=Conversation.message_count + delta, last_message_at=last_message_at)
+			)
+
+	@classmethod
+	async def _touch_conversation(cls, db: AsyncSession, *conversation_ids: uuid.UUID) -> None:
+		"""消息内容变化时刷新会话的 updated_at，version 随之递增"""
+		for chunk in batched(conversation_ids, cls.bulk_chunk_size):
+			await db.execute(update(Conversation).where(Conversation.id.in_(chunk)).values(updated_at=func.now()))
+
+	@classmethod
+	async def create(cls, db: AsyncSession, create_in: BaseModel) -> Message:
+		message = Message(**create_in.model_dump())
+		db.add(message)
+		await db.flush()
+		await cls._sync_conversation_stats(db, {message.conversation_id: 1})
+		await commit(db)
+		await ConversationRepository.invalidate(db, message.conversation_id)
+		return message
+
+	@classmethod
+	async def bulk_create(cls, db: AsyncSession, creates_in: list[BaseModel]) -> list[Message]:
+		"""单事务多行插入，并按会话汇总维护 message_count / last_message_at"""
+		if not creates_in:
+			return []
+		messages = await cls._bulk_insert(db, creates_in)
+		deltas = Counter(m.conversation_id for m in messages)
+		await cls._sync_conversation_stats(db, deltas)
+		await commit(db)
+		await ConversationRepository.invalidate(db, *deltas)
+		return messages
+
+	@classmethod
+	async def bulk_update(cls, db: AsyncSession, updates_in: Sequence[BaseModel]) -> list[Message]:
+		"""按主键批量更新消息，涉及的会话刷新 updated_at；不支持把消息移到其他会话"""
+		if any("conversation_id" in update_in.model_fields_set for update_in in updates_in):
+			raise ValueError("Bulk update cannot move messages between conversations")
+		ids = await cls._bulk_update(db, updates_in)
+		conversation_ids = set()
+		for chunk in batched(set(ids), cls.bulk_chunk_size):
+			result = await db.execute(
+				select(Message.conversation_id).where(Message.id.in_(chunk)).distinct(), execution_options=BULK_CHUNK
+			)
+			conversation_ids.update(result.scalars().all())
+		await cls._touch_conversation(db, *conversation_ids)
+		await commit(db)
+		await cls.invalidate(db, *ids)
+		await ConversationRepository.invalidate(db, *conversation_ids)
+		return await cls._get_by_ids(db, ids)
+
+	@classmethod
+	async def bulk_delete(
+		cls,
+		db: AsyncSession,
+		ids: Sequence[uuid.UUID] | None = None,
+		where: Sequence[ColumnElement[bool]] | None = None,
+	) -> list[uuid.UUID]:
+		"""批量删除消息，并按会话汇总维护 message_count / last_message_at"""
+		deleted = await cls._bulk_delete(db, ids, where, Message.conversation_id)
+		deltas = Counter(row.conversation_id for row in deleted)
+		await cls._sync_conversation_stats(db, {conversation_id: -delta for conversation_id, delta in deltas.items()})
+		await commit(db)
+		await cls.invalidate(db, *(row.id for row in deleted))
+		await ConversationRepository.invalidate(db, *deltas)
+		return [row.id for row in deleted]
+
+	@classmethod
+	async def delete(cls, db: AsyncSession, obj: Message) -> None:
+		await db.delete(obj)
+		await db.flush()
+		await cls._sync_conversation_stats(db, {obj.conversation_id: -1})
+		await commit(db)
+		await cls.invalidate(db, obj.id)
+		await ConversationRepository.invalidate(db, obj.conversation_id)
+
+	@classmethod
+	async def update_by_id(cls, db: AsyncSession, obj_id: uuid.UUID, update_in: BaseModel) -> Message | None:
+		values = update_in.model_dump(exclude_unset=True)
+		if not values:
+			return await cls.get_by_id(db, obj_id)
+		result = await db.execute(update(Message).where(Message.id == obj_id).values(**values).returning(Message))
+		message = result.scalar_one_or_none()
+		if message is None:
+			await rollback(db)
+			return None
+		await cls._touch_conversation(db, message.conversation_id)
+		await commit(db)
+		await cls.invalidate(db, obj_id)
+		await ConversationRepository.invalidate(db, message.conversation_id)
+		return message
+
+	@classmethod
+	async def append_content(
+		cls,
+		db: AsyncSession,
+		obj_id: uuid.UUID,
+		delta: str,
+		status: str | None = None,
+		expect_status: str | None = None,
+	) -> Row | None:
+		"""单条 UPDATE 执行 content = content || :delta，不读取也不回传已有内容
+
+		指定 expect_status 时只在消息仍处于该状态时追加；消息不存在或状态不符时返回 None。
+		"""
+		values = {"content": Message.content + delta}
+		if status is not None:
+			values["status"] = status
+		stmt = update(Message).where(Message.id == obj_id)
+		if expect_status is not None:
+			stmt = stmt.where(Message.status == expect_status)
+		result = await db.execute(
+			stmt.values(**values)
+			.returning(
+				Message.id,
+				Message.conversation_id,
+				Message.status,
+				func.length(Message.content).label("content_length"),
+			)
+			.execution_options(synchronize_session=False)
+		)
+		row = result.one_or_none()
+		if row is None:
+			await rollback(db)
+			return None
+		await cls._touch_conversation(db, row.conversation_id)
+		await commit(db)
+		await cls.invalidate(db, obj_id)
+		await ConversationRepository.invalidate(db, row.conversation_id)
+		return row
+
+	@classmethod
+	async def delete_by_id(cls, db: AsyncSession, obj_id: uuid.UUID) -> bool:
+		result = await db.execute(delete(Message).where(Message.id == obj_id).returning(Message.conversation_id))
+		conversation_id = result.scalar_one_or_none()
+		if conversation_id is None:
+			await rollback(db)
+			return False
+		await cls._sync_conversation_stats(db, {conversation_id: -1})
+		await commit(db)
+		await cls.invalidate(db, obj_id)
+		await ConversationRepository.invalidate(db, conversation_id)
+		return True
+
 	@classmethod
 	async def get_list_by_conversation_id(
-		cls, db: AsyncSession, conversation_id: uuid.UUID, offset: int = 0, limit: int = 100
+		cls,
+		db: AsyncSession,
+		conversation_id: uuid.UUID,
+		offset: int = 0,
+		limit: int = 100,
+		columns: Sequence[str] | None = None,
 	) -> list[Message]:
 		result = await db.execute(
-			select(Message)
+			cls._project(select(Message), columns)
 			.where(Message.conversation_id == conversation_id)
-			.order_by(Message.created_at.asc())
+			.order_by(Message.created_at.asc(), Message.id.asc())
 			.offset(offset)
 			.limit(limit)
 		)
 		return list(result.scalars().all())
 
 	@classmethod
-	async def get_count_by_conversation_id(cls, db: AsyncSession, conversation_id: uuid.UUID) -> int:
-		result = await db.execute(
-			select(func.count()).select_from(Message).where(Message.conversation_id == conversation_id)
+	async def get_list_by_cursor(
+		cls,
+		db: AsyncSession,
+		conversation_id: uuid.UUID,
+		after: tuple[datetime, uuid.UUID] | None = None,
+		before: tuple[datetime, uuid.UUID] | None = None,
+		limit: int = 100,
+		columns: Sequence[str] | None = None,
+	) -> list[Message]:
+		"""键集分页：按 (created_at, id) 定位，结果始终按时间正序返回"""
+		stmt = cls._project(select(Message), columns).where(Message.conversation_id == conversation_id)
+		key = tuple_(Message.created_at, Message.id)
+		if before is not None:
+			stmt = stmt.where(key < before).order_by(Message.created_at.desc(), Message.id.desc())
+		else:
+			if after is not None:
+				stmt = stmt.where(key > after)
+			stmt = stmt.order_by(Message.created_at.asc(), Message.id.asc())
+		result = await db.execute(stmt.limit(limit))
+		messages = list(result.scalars().all())
+		if before is not None:
+			messages.reverse()
+		return messages
+
+	@classmethod
+	async def stream_by_conversation_id(
+		cls, db: AsyncSession, conversation_id: uuid.UUID, chunk_size: int = 500
+	) -> AsyncIterator[Message]:
+		"""服务端游标逐批读取会话的全部消息，内存占用与消息总数无关"""
+		stmt = (
+			select(Message)
+			.where(Message.conversation_id == conversation_id)
+			.order_by(Message.created_at.asc(), Message.id.asc())
+			.execution_options(yield_per=chunk_size)
 		)
-		return result.scalar_one()
+		async for message in await db.stream_scalars(stmt):
+			yield message
+			# 已输出的对象不再需要，移出 identity map 避免随导出增长
+			db.expunge(message)
+
+	@classmethod
+	async def get_count_by_conversation_id(
+		cls, db: AsyncSession, conversation_id: uuid.UUID, mode: TotalMode = TotalMode.exact
+	) -> int | None:
+		stmt = select(Message.id).where(Message.conversation_id == conversation_id)
+		return await cls.count(db, stmt, mode)
@@ -1,6 +1,7 @@
-from sqlalchemy import func, select
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.pagination import TotalMode
 from app.models.user import User
 from app.repositories.base import BaseRepository
 
@@ -13,12 +14,19 @@ class UserRepository(BaseRepository):
 		result = await db.execute(select(User).where(User.username == username))
 		return result.scalars().first()
 
+	@classmethod
+	async def get_existing_usernames(cls, db: AsyncSession, usernames: set[str]) -> set[str]:
+		return await cls._get_existing(db, User.username, usernames)
+
+	@classmethod
+	async def get_existing_emails(cls, db: AsyncSession, emails: set[str]) -> set[str]:
+		return await cls._get_existing(db, User.email, emails)
+
 	@classmethod
 	async def get_list(cls, db: AsyncSession, offset: int = 0, limit: int = 100) -> list[User]:
-		result = await db.execute(select(User).offset(offset).limit(limit))
+		result = await db.execute(select(User).order_by(User.id).offset(offset).limit(limit))
 		return list(result.scalars().all())
 
 	@classmethod
-	async def get_count(cls, db: AsyncSession) -> int:
-		result = await db.execute(select(func.count()).select_from(User))
-		return result.scalar_one()
+	async def get_count(cls, db: AsyncSession, mode: TotalMode = TotalMode.exact) -> int | None:
+		return await cls.count(db, select(User.id), mode)
@@ -1,9 +1,16 @@
 import uuid
 from datetime import datetime
+from enum import StrEnum
+from typing import Annotated
 
 from pydantic import BaseModel, Field
 
 
+class ExportFormat(StrEnum):
+	ndjson = "ndjson"
+	json = "json"
+
+
 class ConversationBase(BaseModel):
 	title: str | None = Field(None, description="会话标题")
 	model_name: str | None = Field(None, description="模型名称")
@@ -20,9 +27,27 @@ class ConversationUpdate(BaseModel):
 	extra_data: dict | None = Field(None, description="扩展数据，如模型配置 temperature、top_p 等")
 
 
+class ConversationBulkUpdate(ConversationUpdate):
+	id: uuid.UUID = Field(description="会话 ID")
+
+
+# 批量接口单次请求的条数上限，整批在一个事务内写入
+CONVERSATION_BATCH_MAX_SIZE = 1000
+ConversationBatchCreate = Annotated[list[ConversationCreate], Field(max_length=CONVERSATION_BATCH_MAX_SIZE)]
+ConversationBatchUpdate = Annotated[list[ConversationBulkUpdate], Field(max_length=CONVERSATION_BATCH_MAX_SIZE)]
+
+
+class ConversationBulkDelete(BaseModel):
+	ids: list[uuid.UUID] | None = Field(None, description="待删除的会话 ID 列表")
+	user_id: str | None = Field(None, description="删除该用户的全部会话，与 ids 二选一")
+
+
 class ConversationOut(ConversationBase):
 	id: uuid.UUID = Field(description="会话 ID")
 	user_id: str = Field(description="用户标识")
+	message_count: int = Field(description="消息数量")
+	last_message_at: datetime | None = Field(description="最后一条消息的时间")
+	version: int = Field(description="版本号，会话或其消息每次变更都会递增")
 	created_at: datetime = Field(description="创建时间")
 	updated_at: datetime = Field(description="更新时间")
 
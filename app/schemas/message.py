@@ -1,6 +1,7 @@
 import uuid
 from datetime import datetime
 from enum import StrEnum
+from typing import Annotated
 
 from pydantic import BaseModel, Field
 
@@ -28,12 +29,22 @@ class MessageCreate(MessageBase):
 	status: MessageStatus = Field(MessageStatus.success, description="消息状态：processing / success / error")
 
 
+# 批量写入单次请求的消息条数上限，整批在一个事务内插入
+MESSAGE_BATCH_MAX_SIZE = 1000
+MessageBatchCreate = Annotated[list[MessageCreate], Field(max_length=MESSAGE_BATCH_MAX_SIZE)]
+
+
 class MessageUpdate(BaseModel):
 	content: str | None = Field(None, description="消息内容")
 	status: MessageStatus | None = Field(None, description="消息状态：processing / success / error")
 	extra_data: dict | None = Field(None, description="扩展数据，如思考过程、token 用量等")
 
 
+class MessageContentAppend(BaseModel):
+	delta: str = Field(description="追加到 content 末尾的文本")
+	status: MessageStatus | None = Field(None, description="同时更新消息状态，如输出结束时置为 success")
+
+
 class MessageOut(MessageBase):
 	id: uuid.UUID = Field(description="消息 ID")
 	conversation_id: uuid.UUID = Field(description="所属会话 ID")
@@ -41,3 +52,12 @@ class MessageOut(MessageBase):
 	created_at: datetime = Field(description="创建时间")
 
 	model_config = {"from_attributes": True}
+
+
+class MessageAppendOut(BaseModel):
+	id: uuid.UUID = Field(description="消息 ID")
+	conversation_id: uuid.UUID = Field(description="所属会话 ID")
+	status: MessageStatus = Field(description="消息状态：processing / success / error")
+	content_length: int = Field(description="追加后的内容长度")
+
+	model_config = {"from_attributes": True}
@@ -0,0 +1,25 @@
+from pydantic import BaseModel, Field
+
+
+class CacheStatsOut(BaseModel):
+	backend: str = Field(description="缓存实现")
+	size: int = Field(description="当前条目数")
+	hits: int = Field(description="命中次数")
+	misses: int = Field(description="未命中次数")
+	hit_ratio: float = Field(description="命中率")
+
+
+class PoolStatsOut(BaseModel):
+	name: str = Field(description="引擎：primary / read / replica:<序号，与 DB_REPLICA_URLS 的顺序一致>")
+	pool: str = Field(description="连接池实现")
+	size: int | None = Field(None, description="常驻连接数上限")
+	checked_in: int | None = Field(None, description="池中空闲的连接数")
+	checked_out: int | None = Field(None, description="正在使用的连接数")
+	overflow: int | None = Field(None, description="超出常驻数额外创建的连接数")
+	checkouts: int | None = Field(None, description="累计取出连接次数")
+	timeouts: int | None = Field(None, description="累计等待连接超时次数")
+	wait_avg_ms: float | None = Field(None, description="取连接的平均等待毫秒数，不含新建连接的耗时")
+	wait_max_ms: float | None = Field(None, description="取连接的最长等待毫秒数，不含新建连接的耗时")
+	connects: int | None = Field(None, description="累计新建连接次数")
+	connect_avg_ms: float | None = Field(None, description="新建连接的平均毫秒数")
+	connect_max_ms: float | None = Field(None, description="新建连接的最长毫秒数")
@@ -1,16 +1,40 @@
 import builtins
+from functools import cache
 from typing import Any, Generic, TypeVar
 
-from pydantic import BaseModel, Field
+from fastapi import Response
+from pydantic import BaseModel, Field, TypeAdapter
 
 T = TypeVar("T")
 
+# 按值的实际类型序列化（UUID、datetime、枚举等），不做任何校验
+_json = TypeAdapter(Any)
+
+
+@cache
+def _schema_fields(schema: type[BaseModel]) -> tuple[str, ...]:
+	return tuple(schema.model_fields)
+
+
+def _dump_row(obj: Any, fields: tuple[str, ...]) -> dict:
+	# 已加载的列直接从 __dict__ 读取，跳过 ORM 属性描述符；未加载的属性回退到 getattr
+	values = obj.__dict__
+	return {name: values[name] if name in values else getattr(obj, name) for name in fields}
+
+
+def _json_response(content: dict) -> Response:
+	return Response(_json.dump_json(content), media_type="application/json")
+
 
 class PageData(BaseModel, Generic[T]):
 	list: builtins.list[T] = Field(description="数据列表")
-	total: int = Field(description="总记录数")
-	page: int = Field(description="当前页码")
+	total: int | None = Field(description="总记录数，total=none 时为 null")
+	total_estimated: bool = Field(False, description="total 是否为估算值")
+	has_more: bool = Field(False, description="当前页之后是否还有数据")
+	page: int | None = Field(description="当前页码，游标分页时为 null")
 	page_size: int = Field(description="每页条数")
+	next_cursor: str | None = Field(None, description="下一页游标，没有更多数据时为 null")
+	prev_cursor: str | None = Field(None, description="上一页游标，没有更早数据时为 null")
 
 
 class ApiResponse(BaseModel, Generic[T]):
@@ -22,14 +46,50 @@ class ApiResponse(BaseModel, Generic[T]):
 	def ok(data: Any = None, msg: str = "success") -> dict:
 		return {"code": 200, "msg": msg, "data": data}
 
+	@staticmethod
+	def ok_json(data: Any, schema: type[BaseModel], msg: str = "success") -> Response:
+		"""快速路径：按 schema 的字段直接把 ORM 对象（或列表）序列化成 JSON 字节，跳过 response_model 的校验"""
+		fields = _schema_fields(schema)
+		if isinstance(data, builtins.list):
+			data = [_dump_row(item, fields) for item in data]
+		elif data is not None:
+			data = _dump_row(data, fields)
+		return _json_response(ApiResponse.ok(data=data, msg=msg))
+
 	@staticmethod
 	def fail(code: int = 400, msg: str = "error") -> dict:
 		return {"code": code, "msg": msg, "data": None}
 
 	@staticmethod
-	def page(list: list, total: int, page: int, page_size: int) -> dict:
+	def page(
+		list: list,
+		total: int | None,
+		page: int | None,
+		page_size: int,
+		total_estimated: bool = False,
+		has_more: bool = False,
+		next_cursor: str | None = None,
+		prev_cursor: str | None = None,
+	) -> dict:
 		return {
 			"code": 200,
 			"msg": "success",
-			"data": {"list": list, "total": total, "page": page, "page_size": page_size},
+			"data": {
+				"list": list,
+				"total": total,
+				"total_estimated": total_estimated,
+				"has_more": has_more,
+				"page": page,
+				"page_size": page_size,
+				"next_cursor": next_cursor,
+				"prev_cursor": prev_cursor,
+			},
 		}
+
+	@staticmethod
+	def page_json(
+		schema: type[BaseModel], list: builtins.list, fields: tuple[str, ...] | None = None, **page: Any
+	) -> Response:
+		"""快速路径：分页版的 ok_json，参数与 page 相同；fields 为稀疏字段集，只输出这些字段"""
+		fields = fields or _schema_fields(schema)
+		return _json_response(ApiResponse.page(list=[_dump_row(item, fields) for item in list], **page))
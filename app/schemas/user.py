@@ -1,3 +1,5 @@
+from typing import Annotated
+
 from pydantic import BaseModel, Field
 
 
@@ -15,6 +17,20 @@ class UserUpdate(BaseModel):
 	email: str | None = Field(None, description="邮箱，唯一")
 
 
+class UserBulkUpdate(UserUpdate):
+	id: int = Field(description="用户 ID")
+
+
+# 批量接口单次请求的条数上限，整批在一个事务内写入
+USER_BATCH_MAX_SIZE = 1000
+UserBatchCreate = Annotated[list[UserCreate], Field(max_length=USER_BATCH_MAX_SIZE)]
+UserBatchUpdate = Annotated[list[UserBulkUpdate], Field(max_length=USER_BATCH_MAX_SIZE)]
+
+
+class UserBulkDelete(BaseModel):
+	ids: list[int] = Field(description="待删除的用户 ID 列表")
+
+
 class UserOut(UserBase):
 	id: int = Field(description="用户 ID")
 
@@ -1,35 +1,103 @@
 import uuid
+from datetime import datetime
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.exceptions import BizException
+from app.core.fieldsets import parse_fields
+from app.core.pagination import TotalMode, cursor_page, decode_cursors, offset_page
 from app.repositories.conversation_repository import ConversationRepository
-from app.schemas.conversation import ConversationCreate, ConversationUpdate
+from app.schemas.conversation import ConversationBulkUpdate, ConversationCreate, ConversationOut, ConversationUpdate
 
 
 async def create_conversation(db: AsyncSession, conversation_in: ConversationCreate):
 	return await ConversationRepository.create(db, conversation_in)
 
 
-async def get_conversation(db: AsyncSession, conversation_id: uuid.UUID):
+async def get_conversation(db: AsyncSession, conversation_id: uuid.UUID, version: int | None = None):
+	"""version 为刚从数据库读到的版本号时，缓存中的旧值改从数据库重新读取，响应体与 ETag 保持一致"""
 	conversation = await ConversationRepository.get_by_id(db, conversation_id)
 	if not conversation:
 		raise BizException(code=404, msg="Conversation not found")
+	if version is not None and conversation.version != version:
+		await ConversationRepository.invalidate(db, conversation_id)
+		await db.refresh(conversation)
 	return conversation
 
 
-async def get_conversations(db: AsyncSession, user_id: str | None = None, page: int = 1, page_size: int = 20):
-	offset = (page - 1) * page_size
-	conversations = await ConversationRepository.get_list(db, user_id, offset, page_size)
-	total = await ConversationRepository.get_count(db, user_id)
-	return {"list": conversations, "total": total, "page": page, "page_size": page_size}
+# 分页游标依赖的列，指定 fields 时也要加载
+_CONVERSATION_KEY_COLUMNS = ("updated_at", "id")
+
+
+def _conversation_key(conversation) -> tuple:
+	return conversation.updated_at, conversation.id
+
+
+async def get_conversation_version(db: AsyncSession, conversation_id: uuid.UUID) -> int | None:
+	return await ConversationRepository.get_version(db, conversation_id)
+
+
+async def get_conversations(
+	db: AsyncSession,
+	user_id: str | None = None,
+	page: int = 1,
+	page_size: int = 20,
+	before: str | None = None,
+	after: str | None = None,
+	total_mode: TotalMode = TotalMode.exact,
+	fields: str | None = None,
+):
+	fields = parse_fields(fields, ConversationOut)
+	columns = None if fields is None else (*fields, *_CONVERSATION_KEY_COLUMNS)
+	# 多取一条用于判断是否还有更多数据，has_more 不依赖 COUNT
+	if before is not None or after is not None:
+		key_before, key_after = decode_cursors(before, after, datetime.fromisoformat, uuid.UUID)
+		conversations = await ConversationRepository.get_list_by_cursor(
+			db, user_id, after=key_after, before=key_before, limit=page_size + 1, columns=columns
+		)
+		result = cursor_page(conversations, page_size, key_before is not None, _conversation_key)
+		page = None
+	else:
+		offset = (page - 1) * page_size
+		conversations = await ConversationRepository.get_list(db, user_id, offset, page_size + 1, columns)
+		result = offset_page(conversations, offset, page_size, _conversation_key)
+	total = await ConversationRepository.get_count(db, user_id, total_mode)
+	return {
+		**result,
+		"total": total,
+		"total_estimated": total_mode == TotalMode.estimate,
+		"page": page,
+		"page_size": page_size,
+		"fields": fields,
+	}
 
 
 async def update_conversation(db: AsyncSession, conversation_id: uuid.UUID, conversation_in: ConversationUpdate):
-	conversation = await get_conversation(db, conversation_id)
-	return await ConversationRepository.update(db, conversation, conversation_in)
+	conversation = await ConversationRepository.update_by_id(db, conversation_id, conversation_in)
+	if not conversation:
+		raise BizException(code=404, msg="Conversation not found")
+	return conversation
 
 
 async def delete_conversation(db: AsyncSession, conversation_id: uuid.UUID):
-	conversation = await get_conversation(db, conversation_id)
-	await ConversationRepository.delete(db, conversation)
+	if not await ConversationRepository.delete_by_id(db, conversation_id):
+		raise BizException(code=404, msg="Conversation not found")
+
+
+async def create_conversations(db: AsyncSession, conversations_in: list[ConversationCreate]):
+	return await ConversationRepository.bulk_create(db, conversations_in)
+
+
+async def update_conversations(db: AsyncSession, conversations_in: list[ConversationBulkUpdate]):
+	ids = {conversation_in.id for conversation_in in conversations_in}
+	if ids - await ConversationRepository.get_existing_ids(db, ids):
+		raise BizException(code=404, msg="Conversation not found")
+	return await ConversationRepository.bulk_update(db, conversations_in)
+
+
+async def delete_conversations(db: AsyncSession, ids: list[uuid.UUID] | None = None, user_id: str | None = None):
+	if (ids is None) == (user_id is None):
+		raise BizException(code=400, msg="Exactly one of ids and user_id is required")
+	if user_id is not None:
+		return await ConversationRepository.bulk_delete_by_user_id(db, user_id)
+	return await ConversationRepository.bulk_delete(db, ids)
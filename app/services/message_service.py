@@ -1,16 +1,68 @@
+import asyncio
+import contextvars
 import uuid
+from collections.abc import AsyncIterator
+from datetime import datetime
+from functools import partial
 
-from sqlalchemy.ext.asyncio import AsyncSession
+from loguru import logger
+from sqlalchemy import Row
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, after_commit, rollback
+from app.core.events import events
 from app.core.exceptions import BizException
+from app.core.fieldsets import parse_fields
+from app.core.lifecycle import on_shutdown
+from app.core.pagination import TotalMode, cursor_page, decode_cursors, offset_page
+from app.repositories.conversation_repository import ConversationRepository
 from app.repositories.message_repository import MessageRepository
-from app.schemas.message import MessageCreate, MessageUpdate
-from app.services.conversation_service import get_conversation
+from app.schemas.conversation import ExportFormat
+from app.schemas.message import MessageContentAppend, MessageCreate, MessageOut, MessageStatus, MessageUpdate
+
+
+def _channel(conversation_id: uuid.UUID) -> str:
+	return f"conversation:{conversation_id}"
+
+
+async def _publish(db: AsyncSession, event: str, message) -> None:
+	"""写入提交后推送给订阅了该会话的 SSE 客户端"""
+	data = MessageOut.model_validate(message).model_dump(mode="json")
+	await after_commit(db, partial(events.publish, _channel(message.conversation_id), event, data))
+
+
+def _is_conversation_missing(e: IntegrityError) -> bool:
+	"""是否为 messages.conversation_id 的外键约束失败，其余完整性错误（如主键冲突）不在此列"""
+	# PostgreSQL 按 SQLSTATE 和约束名判断；SQLite 的错误信息不含约束名，messages 表也只有这一个外键
+	if getattr(e.orig, "sqlstate", None) == "23503":
+		return getattr(e.orig.__cause__, "constraint_name", None) == "messages_conversation_id_fkey"
+	return "FOREIGN KEY constraint failed" in str(e.orig)
 
 
 async def create_message(db: AsyncSession, message_in: MessageCreate):
-	await get_conversation(db, message_in.conversation_id)
-	return await MessageRepository.create(db, message_in)
+	# 不预先加载会话，由 messages.conversation_id 外键保证会话存在
+	try:
+		message = await MessageRepository.create(db, message_in)
+	except IntegrityError as e:
+		await rollback(db)
+		if not _is_conversation_missing(e):
+			raise
+		raise BizException(code=404, msg="Conversation not found") from None
+	await _publish(db, "message.created", message)
+	return message
+
+
+async def create_messages(db: AsyncSession, messages_in: list[MessageCreate]):
+	# 每个会话只校验一次，整批在同一事务内插入
+	conversation_ids = {message_in.conversation_id for message_in in messages_in}
+	if conversation_ids - await ConversationRepository.get_existing_ids(db, conversation_ids):
+		raise BizException(code=404, msg="Conversation not found")
+	messages = await MessageRepository.bulk_create(db, messages_in)
+	for message in messages:
+		await _publish(db, "message.created", message)
+	return messages
 
 
 async def get_message(db: AsyncSession, message_id: uuid.UUID):
@@ -20,19 +72,218 @@ async def get_message(db: AsyncSession, message_id: uuid.UUID):
 	return message
 
 
-async def get_messages(db: AsyncSession, conversation_id: uuid.UUID, page: int = 1, page_size: int = 20):
-	await get_conversation(db, conversation_id)
-	offset = (page - 1) * page_size
-	messages = await MessageRepository.get_list_by_conversation_id(db, conversation_id, offset, page_size)
-	total = await MessageRepository.get_count_by_conversation_id(db, conversation_id)
-	return {"list": messages, "total": total, "page": page, "page_size": page_size}
+# 分页游标依赖的列，指定 fields 时也要加载
+_MESSAGE_KEY_COLUMNS = ("created_at", "id")
+
+
+def _message_key(message) -> tuple:
+	return message.created_at, message.id
+
+
+async def get_messages(
+	db: AsyncSession,
+	conversation_id: uuid.UUID,
+	page: int = 1,
+	page_size: int = 20,
+	before: str | None = None,
+	after: str | None = None,
+	total_mode: TotalMode = TotalMode.exact,
+	fields: str | None = None,
+):
+	fields = parse_fields(fields, MessageOut)
+	columns = None if fields is None else (*fields, *_MESSAGE_KEY_COLUMNS)
+	# 多取一条用于判断是否还有更多数据，has_more 不依赖 COUNT
+	if before is not None or after is not None:
+		key_before, key_after = decode_cursors(before, after, datetime.fromisoformat, uuid.UUID)
+		messages = await MessageRepository.get_list_by_cursor(
+			db, conversation_id, after=key_after, before=key_before, limit=page_size + 1, columns=columns
+		)
+		result = cursor_page(messages, page_size, key_before is not None, _message_key)
+		page = None
+	else:
+		offset = (page - 1) * page_size
+		messages = await MessageRepository.get_list_by_conversation_id(
+			db, conversation_id, offset, page_size + 1, columns
+		)
+		result = offset_page(messages, offset, page_size, _message_key)
+	# 查到消息即说明会话存在，只有空页才需要确认会话是否存在
+	if not result["list"] and not await ConversationRepository.exists(db, conversation_id):
+		raise BizException(code=404, msg="Conversation not found")
+	total = await MessageRepository.get_count_by_conversation_id(db, conversation_id, total_mode)
+	return {
+		**result,
+		"total": total,
+		"total_estimated": total_mode == TotalMode.estimate,
+		"page": page,
+		"page_size": page_size,
+		"fields": fields,
+	}
+
+
+async def export_messages(
+	db: AsyncSession, conversation_id: uuid.UUID, export_format: ExportFormat = ExportFormat.ndjson
+) -> AsyncIterator[bytes]:
+	"""导出会话的全部消息；会话不存在时在开始输出前抛出 404"""
+	if not await ConversationRepository.exists(db, conversation_id):
+		raise BizException(code=404, msg="Conversation not found")
+	return _iter_export(db, conversation_id, export_format)
+
+
+async def _iter_export(
+	db: AsyncSession, conversation_id: uuid.UUID, export_format: ExportFormat
+) -> AsyncIterator[bytes]:
+	messages = MessageRepository.stream_by_conversation_id(db, conversation_id)
+	if export_format == ExportFormat.ndjson:
+		async for message in messages:
+			yield MessageOut.model_validate(message).model_dump_json().encode() + b"\n"
+		return
+	yield b"["
+	separator = b""
+	async for message in messages:
+		yield separator + MessageOut.model_validate(message).model_dump_json().encode()
+		separator = b","
+	yield b"]"
+
+
+async def stream_events(db: AsyncSession, conversation_id: uuid.UUID) -> AsyncIterator[bytes]:
+	"""订阅会话的消息事件（SSE 格式）；会话不存在时在开始输出前抛出 404"""
+	if not await ConversationRepository.exists(db, conversation_id):
+		raise BizException(code=404, msg="Conversation not found")
+	# SSE 连接会保持很久，确认会话存在后立即归还数据库连接，之后不再查库
+	await db.close()
+	return _iter_events(conversation_id)
+
+
+async def _iter_events(conversation_id: uuid.UUID, heartbeat: float | None = None) -> AsyncIterator[bytes]:
+	heartbeat = heartbeat or settings.EVENTS_HEARTBEAT
+	async with events.subscribe(_channel(conversation_id)) as queue:
+		# 先输出一行注释，让客户端立即收到响应头
+		yield b": connected\n\n"
+		while True:
+			try:
+				async with asyncio.timeout(heartbeat):
+					event, data = await queue.get()
+			except TimeoutError:
+				# 心跳注释防止代理因空闲断开连接
+				yield b": ping\n\n"
+				continue
+			yield f"event: {event}\ndata: {data}\n\n".encode()
 
 
 async def update_message(db: AsyncSession, message_id: uuid.UUID, message_in: MessageUpdate):
-	message = await get_message(db, message_id)
-	return await MessageRepository.update(db, message, message_in)
+	message = await MessageRepository.update_by_id(db, message_id, message_in)
+	if not message:
+		raise BizException(code=404, msg="Message not found")
+	await _publish(db, "message.updated", message)
+	return message
+
+
+async def _append_content(
+	db: AsyncSession,
+	message_id: uuid.UUID,
+	delta: str,
+	status: str | None = None,
+	expect_status: str | None = None,
+) -> Row:
+	row = await MessageRepository.append_content(db, message_id, delta, status, expect_status)
+	if row is None:
+		raise BizException(code=404, msg="Message not found")
+	# 只推送增量，订阅者自行拼接
+	data = {"id": str(row.id), "conversation_id": str(row.conversation_id), "delta": delta, "status": row.status}
+	await after_commit(db, partial(events.publish, _channel(row.conversation_id), "message.delta", data))
+	return row
+
+
+class ContentAppendBuffer:
+	"""合并同一条消息在一个间隔内的多次追加，到期后每条消息只执行一次 UPDATE
+
+	写入失败的增量放回缓冲区，下个间隔重试；应用关闭时通过 on_shutdown 登记的 flush_pending 兜底。
+
+	缓冲区在进程内，同一条消息的增量只在同一个进程内保证顺序：多 worker 部署时需要把一条消息的追加
+	路由到同一个 worker，否则不要开启合并写入。落库时只追加到仍为 processing 的消息，
+	其他 worker 已写入最终状态后才到期的增量会被丢弃并记录警告，不会拼接到已结束的内容之后。
+	"""
+
+	def __init__(self, interval: float, session_factory: async_sessionmaker = AsyncSessionLocal):
+		self.interval = interval
+		self.session_factory = session_factory
+		# 写入期间持有锁，保证同一条消息的增量按到达顺序落库
+		self.lock = asyncio.Lock()
+		self._pending: dict[uuid.UUID, list[str]] = {}
+		self._task: asyncio.Task | None = None
+
+	def has_pending(self, message_id: uuid.UUID) -> bool:
+		return message_id in self._pending
+
+	def add(self, message_id: uuid.UUID, delta: str) -> None:
+		self._pending.setdefault(message_id, []).append(delta)
+		if self._task is None or self._task.done():
+			# 后台写入不继承当前请求的上下文，其查询不计入该请求的 SQL 统计
+			self._task = asyncio.create_task(self._run(), context=contextvars.Context())
+
+	def take(self, message_id: uuid.UUID) -> str:
+		"""取出某条消息尚未落库的增量，调用方需持有 lock"""
+		return "".join(self._pending.pop(message_id, ()))
+
+	async def _run(self) -> None:
+		while self._pending:
+			await asyncio.sleep(self.interval)
+			try:
+				await self.flush()
+			except Exception:
+				logger.exception("Failed to flush buffered content, retrying in {}s", self.interval)
+
+	async def flush(self) -> None:
+		async with self.lock:
+			pending, self._pending = self._pending, {}
+			try:
+				async with self.session_factory() as db:
+					while pending:
+						message_id = next(iter(pending))
+						try:
+							await _append_content(
+								db, message_id, "".join(pending[message_id]), expect_status=MessageStatus.processing
+							)
+						except BizException:
+							logger.warning(
+								"Dropped buffered content for deleted or finished message: id={}", message_id
+							)
+						del pending[message_id]
+			finally:
+				# 未写入的增量放回缓冲区，排在写入期间新到的增量之前
+				for message_id, deltas in pending.items():
+					self._pending[message_id] = deltas + self._pending.get(message_id, [])
+
+
+append_buffer = (
+	ContentAppendBuffer(settings.MESSAGE_APPEND_FLUSH_INTERVAL) if settings.MESSAGE_APPEND_FLUSH_INTERVAL > 0 else None
+)
+
+
+async def append_message_content(
+	db: AsyncSession, message_id: uuid.UUID, append_in: MessageContentAppend
+) -> Row | None:
+	"""追加消息内容；开启合并写入且不改状态时只入队并返回 None"""
+	if append_buffer is None:
+		return await _append_content(db, message_id, append_in.delta, append_in.status)
+	if append_in.status is None:
+		# 已有未落库增量的消息在入队时检查过，其余先确认消息存在再返回 202
+		if not append_buffer.has_pending(message_id) and not await MessageRepository.exists(db, message_id):
+			raise BizException(code=404, msg="Message not found")
+		append_buffer.add(message_id, append_in.delta)
+		return None
+	# 状态变化（通常是输出结束）连同尚未落库的增量立即写入
+	async with append_buffer.lock:
+		delta = append_buffer.take(message_id) + append_in.delta
+		return await _append_content(db, message_id, delta, append_in.status)
+
+
+@on_shutdown
+async def flush_pending() -> None:
+	if append_buffer is not None:
+		await append_buffer.flush()
 
 
 async def delete_message(db: AsyncSession, message_id: uuid.UUID):
-	message = await get_message(db, message_id)
-	await MessageRepository.delete(db, message)
+	if not await MessageRepository.delete_by_id(db, message_id):
+		raise BizException(code=404, msg="Message not found")
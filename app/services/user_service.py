@@ -1,8 +1,11 @@
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.database import rollback
 from app.core.exceptions import BizException
+from app.core.pagination import TotalMode, offset_page
 from app.repositories.user_repository import UserRepository
-from app.schemas.user import UserCreate, UserUpdate
+from app.schemas.user import UserBulkUpdate, UserCreate, UserUpdate
 
 
 async def create_user(db: AsyncSession, user_in: UserCreate):
@@ -19,18 +22,53 @@ async def get_user(db: AsyncSession, user_id: int):
 	return user
 
 
-async def get_users(db: AsyncSession, page: int = 1, page_size: int = 20):
+async def get_users(db: AsyncSession, page: int = 1, page_size: int = 20, total_mode: TotalMode = TotalMode.exact):
 	offset = (page - 1) * page_size
-	users = await UserRepository.get_list(db, offset, page_size)
-	total = await UserRepository.get_count(db)
-	return {"list": users, "total": total, "page": page, "page_size": page_size}
+	# 多取一条用于判断是否还有更多数据，has_more 不依赖 COUNT
+	users = await UserRepository.get_list(db, offset, page_size + 1)
+	total = await UserRepository.get_count(db, total_mode)
+	return {
+		**offset_page(users, offset, page_size),
+		"total": total,
+		"total_estimated": total_mode == TotalMode.estimate,
+		"page": page,
+		"page_size": page_size,
+	}
 
 
 async def update_user(db: AsyncSession, user_id: int, user_in: UserUpdate):
-	user = await get_user(db, user_id)
-	return await UserRepository.update(db, user, user_in)
+	user = await UserRepository.update_by_id(db, user_id, user_in)
+	if not user:
+		raise BizException(code=404, msg="User not found")
+	return user
 
 
 async def delete_user(db: AsyncSession, user_id: int):
-	user = await get_user(db, user_id)
-	await UserRepository.delete(db, user)
+	if not await UserRepository.delete_by_id(db, user_id):
+		raise BizException(code=404, msg="User not found")
+
+
+async def create_users(db: AsyncSession, users_in: list[UserCreate]):
+	usernames = [user_in.username for user_in in users_in]
+	if len(set(usernames)) != len(usernames) or await UserRepository.get_existing_usernames(db, set(usernames)):
+		raise BizException(code=400, msg="Username already exists")
+	emails = [user_in.email for user_in in users_in]
+	if len(set(emails)) != len(emails) or await UserRepository.get_existing_emails(db, set(emails)):
+		raise BizException(code=400, msg="Email already exists")
+	try:
+		return await UserRepository.bulk_create(db, users_in)
+	except IntegrityError:
+		# 并发写入时预检查之后仍可能冲突
+		await rollback(db)
+		raise BizException(code=400, msg="Username or email already exists") from None
+
+
+async def update_users(db: AsyncSession, users_in: list[UserBulkUpdate]):
+	ids = {user_in.id for user_in in users_in}
+	if ids - await UserRepository.get_existing_ids(db, ids):
+		raise BizException(code=404, msg="User not found")
+	return await UserRepository.bulk_update(db, users_in)
+
+
+async def delete_users(db: AsyncSession, ids: list[int]):
+	return await UserRepository.bulk_delete(db, ids)
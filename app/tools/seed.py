@@ -0,0 +1,315 @@
+"""生成用户、会话、消息并批量写入数据库：PostgreSQL 使用 COPY，SQLite 在单个事务内分批 executemany
+
+表结构取自 app.models：生成器没有提供的列按模型上的 Python 端默认值补齐，其余交给数据库默认值；
+值的转换（UUID、JSON、时间）使用列类型在当前方言下的绑定处理，与 ORM 写入的数据一致。
+
+用法：python -m app.tools.seed [--users 1000] [--conversations 10000] [--conversation-length exp:20]
+                               [--content-size lognormal:300:1] [--extra-data usage] [--reset] [--seed 42]
+
+分布的写法：N（固定值）、uniform:A:B、exp:MEAN、lognormal:MEDIAN:SIGMA，取值至少为 1。
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import time
+import uuid
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import Table, func, select, text
+from sqlalchemy.engine import Dialect
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.core.config import settings
+from app.core.database import Base, build_engine
+from app.models import Conversation, Message, User
+
+Distribution = Callable[[random.Random], int]
+
+EXTRA_DATA_SHAPES = ("none", "usage", "rich")
+
+_MODELS = ("gpt-4o", "gpt-4o-mini", "claude-sonnet", "llama-3-70b")
+_WORDS = (
+	"the a model token stream reply question answer context window prompt function call result user assistant "
+	"database index query latency cache page cursor message conversation history summary code python error "
+	"request response server client json field value list item example test data system"
+).split()
+
+
+def parse_distribution(spec: str) -> Distribution:
+	"""把分布的写法解析为采样函数，格式错误时抛出 ValueError"""
+	name, *params = spec.split(":")
+	try:
+		args = [float(param) for param in params] if params else [int(name)]
+	except ValueError:
+		raise ValueError(f"Invalid distribution: {spec}") from None
+	if not params:
+		return lambda rng: max(args[0], 1)
+	if name == "uniform" and len(args) == 2:
+		low, high = int(args[0]), int(args[1])
+		return lambda rng: max(rng.randint(low, high), 1)
+	if name == "exp" and len(args) == 1:
+		rate = 1 / args[0]
+		return lambda rng: max(round(rng.expovariate(rate)), 1)
+	if name == "lognormal" and len(args) == 2:
+		mu, sigma = math.log(args[0]), args[1]
+		return lambda rng: max(round(rng.lognormvariate(mu, sigma)), 1)
+	raise ValueError(f"Invalid distribution: {spec}")
+
+
+class _Rows:
+	"""把生成的行转换为驱动参数：补齐模型上的 Python 端默认值，按方言应用列类型的绑定处理"""
+
+	def __init__(self, table: Table, columns: Sequence[str], dialect: Dialect):
+		self.table = table
+		generated = [table.c[name] for name in columns]
+		# 生成器没提供、但模型定义了标量或无参函数默认值的列（如 Conversation.version）
+		defaulted = [
+			column
+			for column in table.columns
+			if column.name not in columns
+			and column.default is not None
+			and (column.default.is_scalar or column.default.is_callable)
+		]
+		self.columns = generated + defaulted
+		self._defaults = [column.default for column in defaulted]
+		processors = [column.type.dialect_impl(dialect).bind_processor(dialect) for column in self.columns]
+		# 只遍历需要转换的列
+		self._processors = [(i, processor) for i, processor in enumerate(processors) if processor is not None]
+
+	@property
+	def names(self) -> list[str]:
+		return [column.name for column in self.columns]
+
+	def convert(self, rows: Iterable[tuple]) -> list[tuple]:
+		converted = []
+		for row in rows:
+			row = list(row)
+			for default in self._defaults:
+				row.append(default.arg if default.is_scalar else default.arg(None))
+			for i, processor in self._processors:
+				if row[i] is not None:
+					row[i] = processor(row[i])
+			converted.append(tuple(row))
+		return converted
+
+
+async def _write(conn: AsyncConnection, rows: _Rows, values: list[tuple]) -> None:
+	if not values:
+		return
+	values = rows.convert(values)
+	if conn.dialect.name == "postgresql":
+		raw = (await conn.get_raw_connection()).driver_connection
+		await raw.copy_records_to_table(rows.table.name, records=values, columns=rows.names)
+	else:
+		# 编译 insert() 时列按表定义排序，这里按 rows.names 的顺序拼语句，与参数一一对应
+		quote = conn.dialect.identifier_preparer.quote
+		columns = ", ".join(quote(name) for name in rows.names)
+		placeholder = "?" if conn.dialect.paramstyle == "qmark" else "%s"
+		placeholders = ", ".join([placeholder] * len(rows.names))
+		statement = f"INSERT INTO {quote(rows.table.name)} ({columns}) VALUES ({placeholders})"
+		await conn.exec_driver_sql(statement, values)
+
+
+def _uuid(rng: random.Random) -> uuid.UUID:
+	return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+class _Generator:
+	"""按给定分布生成行，所有随机性来自同一个 rng，种子相同时数据相同"""
+
+	def __init__(self, rng: random.Random, length: Distribution, content_size: Distribution, extra_data: str):
+		self.rng = rng
+		self.length = length
+		self.content_size = content_size
+		self.extra_data = extra_data
+		# 预先生成一段文本，消息内容从中截取，避免逐词拼接
+		self._corpus = " ".join(rng.choice(_WORDS) for _ in range(200_000))
+
+	def content(self) -> str:
+		size = min(self.content_size(self.rng), len(self._corpus))
+		# rng.random() 比 randrange 快得多，生成千万级消息时差别明显
+		start = int(self.rng.random() * (len(self._corpus) - size))
+		return self._corpus[start : start + size]
+
+	def message_extra(self, role: str) -> dict | None:
+		rng = self.rng
+		if self.extra_data == "none":
+			return None
+		if role == "user":
+			if self.extra_data == "rich" and rng.random() < 0.1:
+				return {"attachments": [{"type": "image", "url": f"https://files.example.com/{_uuid(rng)}.png"}]}
+			return None
+		extra: dict[str, Any] = {
+			"usage": {"prompt_tokens": rng.randint(10, 8000), "completion_tokens": rng.randint(10, 2000)}
+		}
+		if self.extra_data == "rich":
+			extra["model"] = rng.choice(_MODELS)
+			extra["finish_reason"] = rng.choice(("stop", "stop", "stop", "length", "tool_calls"))
+			extra["tool_calls"] = [
+				{
+					"id": f"call_{rng.getrandbits(48):x}",
+					"name": rng.choice(_WORDS),
+					"arguments": {"query": self.content()},
+				}
+				for _ in range(rng.choice((0, 0, 0, 1, 2)))
+			]
+			extra["citations"] = [f"https://docs.example.com/{rng.choice(_WORDS)}" for _ in range(rng.randint(0, 3))]
+		return extra
+
+	def conversation(self, user_id: int, now: datetime) -> tuple[tuple, list[tuple]]:
+		"""返回会话行与其全部消息行；message_count / last_message_at 与消息一致"""
+		rng = self.rng
+		conversation_id = _uuid(rng)
+		created_at = now - timedelta(seconds=rng.randint(3600, 365 * 86400))
+		messages = []
+		at = created_at
+		for i in range(self.length(rng)):
+			role = "assistant" if i % 2 else "user"
+			messages.append(
+				(_uuid(rng), conversation_id, role, self.content(), "success", self.message_extra(role), at)
+			)
+			at += timedelta(seconds=5 + int(rng.random() * 295))
+		last_message_at = messages[-1][-1] if messages else None
+		conversation = (
+			conversation_id,
+			f"user_{user_id}",
+			self.content()[:80],
+			rng.choice(_MODELS),
+			None if self.extra_data == "none" else {"temperature": round(rng.uniform(0, 1), 1)},
+			len(messages),
+			last_message_at,
+			created_at,
+			last_message_at or created_at,
+		)
+		return conversation, messages
+
+
+_USER_COLUMNS = ("id", "username", "email")
+_CONVERSATION_COLUMNS = (
+	"id",
+	"user_id",
+	"title",
+	"model_name",
+	"extra_data",
+	"message_count",
+	"last_message_at",
+	"created_at",
+	"updated_at",
+)
+_MESSAGE_COLUMNS = ("id", "conversation_id", "role", "content", "status", "extra_data", "created_at")
+
+
+def _batched(rows: Iterable[tuple], size: int) -> Iterator[list[tuple]]:
+	batch = []
+	for row in rows:
+		batch.append(row)
+		if len(batch) >= size:
+			yield batch
+			batch = []
+	if batch:
+		yield batch
+
+
+async def seed(
+	engine: AsyncEngine,
+	*,
+	users: int,
+	conversations: int,
+	conversation_length: str = "exp:20",
+	content_size: str = "lognormal:300:1",
+	extra_data: str = "usage",
+	batch_size: int = 10_000,
+	seed: int | None = None,
+	reset: bool = False,
+) -> dict[str, int]:
+	"""在单个事务内写入数据，返回各表写入的行数；reset 为 True 时先删表重建，否则追加"""
+	rng = random.Random(seed)
+	generator = _Generator(rng, parse_distribution(conversation_length), parse_distribution(content_size), extra_data)
+	now = datetime.now().replace(microsecond=0)
+	counts = {"users": users, "conversations": conversations, "messages": 0}
+
+	async with engine.begin() as conn:
+		if reset:
+			await conn.run_sync(Base.metadata.drop_all)
+		await conn.run_sync(Base.metadata.create_all)
+		user_rows = _Rows(User.__table__, _USER_COLUMNS, conn.dialect)
+		conversation_rows = _Rows(Conversation.__table__, _CONVERSATION_COLUMNS, conn.dialect)
+		message_rows = _Rows(Message.__table__, _MESSAGE_COLUMNS, conn.dialect)
+
+		# 追加时用户 id 接在已有数据之后
+		first_user = (await conn.scalar(select(func.max(User.id))) or 0) + 1
+		user_ids = range(first_user, first_user + users)
+		for batch in _batched(((i, f"user_{i}", f"user_{i}@example.com") for i in user_ids), batch_size):
+			await _write(conn, user_rows, batch)
+		if conn.dialect.name == "postgresql":
+			# COPY 写入了显式 id，需要把自增序列推进到最大值之后
+			await conn.execute(
+				text(
+					f"SELECT setval(pg_get_serial_sequence('{User.__tablename__}', 'id'), max(id)) FROM {User.__tablename__}"
+				)
+			)
+
+		# 会话先于其消息写入，满足外键约束；每批会话的消息再按 batch_size 分批写入
+		chunk_size = max(batch_size // 100, 1)
+		for start in range(0, conversations, chunk_size):
+			chunk = [
+				generator.conversation(rng.choice(user_ids), now) for _ in range(min(chunk_size, conversations - start))
+			]
+			await _write(conn, conversation_rows, [conversation for conversation, _ in chunk])
+			messages = [message for _, conversation_messages in chunk for message in conversation_messages]
+			for batch in _batched(messages, batch_size):
+				await _write(conn, message_rows, batch)
+			counts["messages"] += len(messages)
+
+		await conn.exec_driver_sql("ANALYZE")
+	return counts
+
+
+async def main(args: argparse.Namespace) -> None:
+	url = args.url or settings.DATABASE_URL
+	engine = build_engine(url, sqlite_pragmas=settings.SQLITE_PRAGMAS if url.startswith("sqlite") else None)
+	start = time.perf_counter()
+	try:
+		counts = await seed(
+			engine,
+			users=args.users,
+			conversations=args.conversations,
+			conversation_length=args.conversation_length,
+			content_size=args.content_size,
+			extra_data=args.extra_data,
+			batch_size=args.batch_size,
+			seed=args.seed,
+			reset=args.reset,
+		)
+	finally:
+		await engine.dispose()
+	elapsed = time.perf_counter() - start
+	rows = sum(counts.values())
+	print(
+		f"Seeded {counts['users']} users, {counts['conversations']} conversations, {counts['messages']} messages "
+		f"in {elapsed:.1f}s ({rows / elapsed * 60:,.0f} rows/min)"
+	)
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--url", help="数据库连接地址，默认取 DB_* 配置")
+	parser.add_argument("--users", type=int, default=1000)
+	parser.add_argument("--conversations", type=int, default=10_000)
+	parser.add_argument("--conversation-length", type=str, default="exp:20", help="每个会话的消息数分布")
+	parser.add_argument("--content-size", type=str, default="lognormal:300:1", help="消息内容字符数分布")
+	parser.add_argument("--extra-data", choices=EXTRA_DATA_SHAPES, default="usage", help="extra_data 的形状")
+	parser.add_argument("--batch-size", type=int, default=10_000)
+	parser.add_argument("--seed", type=int, help="随机种子，指定后生成的数据可复现")
+	parser.add_argument("--reset", action="store_true", help="删表重建后再写入，默认追加")
+	args = parser.parse_args()
+	for spec in (args.conversation_length, args.content_size):
+		try:
+			parse_distribution(spec)
+		except ValueError as e:
+			parser.error(str(e))
+	asyncio.run(main(args))
@@ -0,0 +1,357 @@
+"""API 负载基准：写入接近生产规模的数据，并发请求主要接口，输出每个操作的 p50/p95/p99 延迟和吞吐
+
+两种驱动方式：asgi 在进程内通过 httpx ASGITransport 调用应用，不含网络和服务器开销；
+uvicorn 启动一个 uvicorn 子进程，通过 HTTP 并发请求。结果写入 JSON，compare 子命令对比两次结果。
+
+用法：
+python -m benchmarks.api run [--scale small] [--db sqlite|postgres] [--mode asgi,uvicorn] [--concurrency 10]
+                             [--requests 2000] [--operations get_user,...] [--output FILE]
+python -m benchmarks.api compare BASE.json HEAD.json [--threshold 10]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+DATA_DIR = Path("benchmarks/.data")
+# 各规模写入后的实际行数，{规模: [用户数, 会话数, 消息数]}；数据库中的行数与之一致时才复用已有数据
+SEEDED_FILE = "api_{db}.json"
+
+# (用户数, 会话数, 消息数)
+SCALES = {
+	"tiny": (100, 1_000, 10_000),
+	"small": (1_000, 10_000, 200_000),
+	"medium": (10_000, 100_000, 1_000_000),
+	"large": (10_000, 100_000, 10_000_000),
+}
+
+_WORDS = (
+	"the quick brown fox jumps over the lazy dog while a model streams tokens to the client "
+	"and the database keeps every message in order for the conversation history"
+).split()
+
+
+def _configure(db: str, scale: str) -> None:
+	"""在导入 app 之前设置环境变量：关闭 SQL echo 和文件日志，SQLite 使用按规模区分的数据文件"""
+	os.environ.update(DEBUG="False", LOG_LEVEL="WARNING", LOG_FILE_ENABLED="False", DB_ENGINE=db)
+	if db == "sqlite":
+		DATA_DIR.mkdir(parents=True, exist_ok=True)
+		os.environ["DB_NAME"] = str(DATA_DIR / f"api_{scale}")
+
+
+def _text(rng: random.Random, words: int) -> str:
+	start = rng.randrange(len(_WORDS))
+	return " ".join(_WORDS[(start + i) % len(_WORDS)] for i in range(words))
+
+
+async def _seed(engine, scale: str) -> None:
+	from app.tools.seed import seed
+
+	users, conversations, messages = SCALES[scale]
+	# 会话长度在平均值上下浮动，总消息数接近规模设定
+	average = max(messages // conversations, 1)
+	start = time.perf_counter()
+	await seed(
+		engine,
+		users=users,
+		conversations=conversations,
+		conversation_length=f"uniform:{max(average // 2, 1)}:{average + average // 2}",
+		seed=42,
+		reset=True,
+	)
+	print(f"Seeded {scale} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+async def _count_rows(engine) -> list[int] | None:
+	from sqlalchemy import func, select
+	from sqlalchemy.exc import DBAPIError
+
+	from app.models import Conversation, Message, User
+
+	try:
+		async with engine.connect() as conn:
+			return [
+				await conn.scalar(select(func.count()).select_from(model)) for model in (User, Conversation, Message)
+			]
+	except DBAPIError:
+		# 表还不存在
+		return None
+
+
+async def _prepare(db: str, scale: str, reseed: bool, writes: bool) -> dict[str, list]:
+	"""数据库中的行数与上次写入该规模后的行数一致时复用已有数据，返回各接口使用的样本 id
+
+	PostgreSQL 各规模共用一个数据库，只比较用户、会话数无法区分 medium 和 large，因此消息数也参与比较。
+	writes 为 True 时本次运行会写入数据，清除该规模的记录，下次运行重新写入，保证每次对比的数据相同。
+	"""
+	from sqlalchemy import select, text
+
+	from app.core.config import settings
+	from app.core.database import build_engine
+	from app.models import Conversation, Message
+
+	seeded_file = DATA_DIR / SEEDED_FILE.format(db=db)
+	seeded = json.loads(seeded_file.read_text()) if seeded_file.exists() else {}
+	engine = build_engine(settings.DATABASE_URL, sqlite_pragmas=settings.SQLITE_PRAGMAS)
+	try:
+		counts = await _count_rows(engine)
+		if reseed or counts is None or counts != seeded.get(scale):
+			await _seed(engine, scale)
+			counts = await _count_rows(engine)
+		if writes:
+			seeded.pop(scale, None)
+		else:
+			seeded[scale] = counts
+		DATA_DIR.mkdir(parents=True, exist_ok=True)
+		seeded_file.write_text(json.dumps(seeded))
+		async with engine.connect() as conn:
+			conversation_ids = list(await conn.scalars(select(Conversation.id).order_by(text("random()")).limit(1000)))
+			message_ids = list(
+				await conn.scalars(select(Message.id).where(Message.conversation_id.in_(conversation_ids[:100])))
+			)
+			user_ids = list(await conn.scalars(select(Conversation.user_id).distinct().limit(1000)))
+	finally:
+		await engine.dispose()
+	return {
+		"users": list(range(1, SCALES[scale][0] + 1)),
+		"user_ids": user_ids,
+		"conversations": [str(id) for id in conversation_ids],
+		"messages": [str(id) for id in message_ids],
+	}
+
+
+# 会写入数据的操作，运行后已有数据不再复用
+WRITE_OPERATIONS = {"create_message"}
+
+# 操作名（与路由名一致）-> 根据样本 id 构造 (method, url, json)
+Operation = Callable[[random.Random, dict], tuple[str, str, dict | None]]
+OPERATIONS: dict[str, Operation] = {
+	"get_user": lambda rng, ids: ("GET", f"/api/users/{rng.choice(ids['users'])}", None),
+	"get_users": lambda rng, ids: ("GET", f"/api/users/?page={rng.randint(1, 20)}&page_size=20", None),
+	"get_conversation": lambda rng, ids: ("GET", f"/api/conversations/{rng.choice(ids['conversations'])}", None),
+	"get_conversations": lambda rng, ids: (
+		"GET",
+		f"/api/conversations/?user_id={rng.choice(ids['user_ids'])}&page_size=20",
+		None,
+	),
+	"get_message": lambda rng, ids: ("GET", f"/api/messages/{rng.choice(ids['messages'])}", None),
+	"get_messages": lambda rng, ids: (
+		"GET",
+		f"/api/messages/conversation/{rng.choice(ids['conversations'])}?page_size=50",
+		None,
+	),
+	"create_message": lambda rng, ids: (
+		"POST",
+		"/api/messages/",
+		{"conversation_id": rng.choice(ids["conversations"]), "role": "user", "content": _text(rng, 30)},
+	),
+}
+
+
+async def _run_operation(
+	client: httpx.AsyncClient, operation: Operation, ids: dict, requests: int, concurrency: int
+) -> dict:
+	rng = random.Random(0)
+	# 预热：建立连接、填充缓存
+	for _ in range(min(requests // 10, 100)):
+		method, url, body = operation(rng, ids)
+		await client.request(method, url, json=body)
+
+	latencies: list[float] = []
+	errors = 0
+	pending = iter(range(requests))
+
+	async def worker():
+		nonlocal errors
+		for _ in pending:
+			method, url, body = operation(rng, ids)
+			start = time.perf_counter()
+			res = await client.request(method, url, json=body)
+			latencies.append(time.perf_counter() - start)
+			if res.status_code >= 400:
+				errors += 1
+
+	start = time.perf_counter()
+	await asyncio.gather(*(worker() for _ in range(concurrency)))
+	elapsed = time.perf_counter() - start
+	quantiles = statistics.quantiles(latencies, n=100)
+	return {
+		"requests": requests,
+		"errors": errors,
+		"rps": round(requests / elapsed, 1),
+		"mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+		"p50_ms": round(quantiles[49] * 1000, 3),
+		"p95_ms": round(quantiles[94] * 1000, 3),
+		"p99_ms": round(quantiles[98] * 1000, 3),
+	}
+
+
+async def _run_client(
+	client: httpx.AsyncClient, operations: list[str], ids: dict, requests: int, concurrency: int
+) -> dict[str, dict]:
+	results = {}
+	for name in operations:
+		results[name] = await _run_operation(client, OPERATIONS[name], ids, requests, concurrency)
+		_print_row(name, results[name])
+	return results
+
+
+async def _run_asgi(operations: list[str], ids: dict, requests: int, concurrency: int) -> dict[str, dict]:
+	from app.main import app
+
+	async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+		return await _run_client(client, operations, ids, requests, concurrency)
+
+
+async def _run_uvicorn(operations: list[str], ids: dict, requests: int, concurrency: int, port: int) -> dict[str, dict]:
+	server = subprocess.Popen(
+		[sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"]
+		+ ["--no-access-log"]
+	)
+	limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+	try:
+		async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+			for _ in range(300):
+				try:
+					await client.get("/api/metrics/pool")
+					break
+				except httpx.TransportError:
+					await asyncio.sleep(0.1)
+			else:
+				raise RuntimeError("uvicorn did not start")
+			return await _run_client(client, operations, ids, requests, concurrency)
+	finally:
+		server.terminate()
+		server.wait()
+
+
+def _print_row(name: str, result: dict) -> None:
+	print(
+		f"  {name:<20}{result['rps']:>10.1f}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+		f"{result['p99_ms']:>10.2f}{result['errors']:>8}",
+		file=sys.stderr,
+	)
+
+
+# 不在 git 仓库中或没有安装 git
+_GIT_ERRORS = (OSError, subprocess.CalledProcessError)
+
+
+def _git_commit() -> str | None:
+	try:
+		return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+	except _GIT_ERRORS:
+		return None
+
+
+async def run(args: argparse.Namespace) -> None:
+	operations = args.operations.split(",") if args.operations else list(OPERATIONS)
+	unknown = [name for name in operations if name not in OPERATIONS]
+	if unknown:
+		raise SystemExit(f"Unknown operations: {', '.join(unknown)}")
+	_configure(args.db, args.scale)
+	try:
+		ids = await _prepare(args.db, args.scale, args.reseed, writes=not WRITE_OPERATIONS.isdisjoint(operations))
+	except OSError as e:
+		raise SystemExit(f"Database not available: {e}")
+	commit = _git_commit()
+	report = {
+		"meta": {
+			"commit": commit,
+			"timestamp": datetime.now().isoformat(timespec="seconds"),
+			"python": platform.python_version(),
+			"db": args.db,
+			"scale": args.scale,
+			"rows": dict(zip(("users", "conversations", "messages"), SCALES[args.scale])),
+			"operations": operations,
+			"concurrency": args.concurrency,
+			"requests": args.requests,
+		},
+		"results": {},
+	}
+	for mode in args.mode.split(","):
+		print(
+			f"{mode}: {'operation':<20}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}",
+			file=sys.stderr,
+		)
+		if mode == "asgi":
+			report["results"][mode] = await _run_asgi(operations, ids, args.requests, args.concurrency)
+		elif mode == "uvicorn":
+			report["results"][mode] = await _run_uvicorn(operations, ids, args.requests, args.concurrency, args.port)
+		else:
+			raise SystemExit(f"Unknown mode: {mode}")
+
+	output = Path(args.output or DATA_DIR / f"api-{args.db}-{args.scale}-{commit or 'local'}.json")
+	output.parent.mkdir(parents=True, exist_ok=True)
+	output.write_text(json.dumps(report, indent=2))
+	print(f"Results written to {output}", file=sys.stderr)
+
+
+def compare(args: argparse.Namespace) -> None:
+	"""p99 升高或吞吐下降超过 threshold% 视为回归，存在回归时以状态码 1 退出"""
+	base, head = (json.loads(Path(path).read_text()) for path in (args.base, args.head))
+	print(f"{base['meta']['commit']} -> {head['meta']['commit']}")
+	print(f"{'mode':<10}{'operation':<20}{'req/s':>26}{'p50 ms':>26}{'p99 ms':>26}")
+	regressions = []
+
+	def change(old: float, new: float) -> float:
+		return (new - old) / old * 100 if old else 0.0
+
+	for mode, operations in head["results"].items():
+		for name, new in operations.items():
+			old = base["results"].get(mode, {}).get(name)
+			if old is None:
+				continue
+			rps, p50, p99 = (
+				change(old["rps"], new["rps"]),
+				change(old["p50_ms"], new["p50_ms"]),
+				change(old["p99_ms"], new["p99_ms"]),
+			)
+			regressed = rps < -args.threshold or p99 > args.threshold
+			if regressed:
+				regressions.append(f"{mode}/{name}")
+			print(
+				f"{mode:<10}{name:<20}"
+				f"{old['rps']:>9.1f} ->{new['rps']:>7.1f} {rps:+5.0f}%"
+				f"{old['p50_ms']:>9.2f} ->{new['p50_ms']:>7.2f} {p50:+5.0f}%"
+				f"{old['p99_ms']:>9.2f} ->{new['p99_ms']:>7.2f} {p99:+5.0f}%"
+				f"{'  REGRESSION' if regressed else ''}"
+			)
+	if regressions:
+		raise SystemExit(f"Regressions over {args.threshold}%: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	commands = parser.add_subparsers(dest="command", required=True)
+	run_parser = commands.add_parser("run", help="写入数据并运行基准")
+	run_parser.add_argument("--scale", choices=SCALES, default="small")
+	run_parser.add_argument("--db", choices=("sqlite", "postgres"), default="sqlite")
+	run_parser.add_argument("--mode", default="asgi,uvicorn", help="asgi、uvicorn，逗号分隔")
+	run_parser.add_argument("--concurrency", type=int, default=10)
+	run_parser.add_argument("--requests", type=int, default=2000, help="每个操作的请求数")
+	run_parser.add_argument("--operations", help="只运行指定的操作，逗号分隔，默认全部")
+	run_parser.add_argument("--port", type=int, default=8765)
+	run_parser.add_argument("--reseed", action="store_true", help="忽略已有数据重新写入")
+	run_parser.add_argument("--output", help="结果 JSON 路径，默认写入 benchmarks/.data/")
+	compare_parser = commands.add_parser("compare", help="对比两次结果")
+	compare_parser.add_argument("base")
+	compare_parser.add_argument("head")
+	compare_parser.add_argument("--threshold", type=float, default=10, help="回归判定的百分比")
+	args = parser.parse_args()
+	if args.command == "run":
+		asyncio.run(run(args))
+	else:
+		compare(args)
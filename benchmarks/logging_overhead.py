@@ -0,0 +1,69 @@
+"""日志开销基准：对比同步写入（LOG_QUEUE_SIZE=0）与后台线程写入时每个请求花在日志上的时间
+
+每个模拟请求写 1 条业务日志和若干条 SQLAlchemy echo 日志，文件按大小轮转并压缩，
+控制台输出重定向到 /dev/null。同步写入时轮转压缩在请求内完成，表现为 stalls（耗时 >= 10 ms 的请求数）。
+
+用法：python -m benchmarks.logging_overhead [--requests 20000] [--sql 5] [--rotation "2 MB"]
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from app.core import logging as app_logging
+from app.core.config import settings
+
+
+def _run(requests: int, sql: int) -> list[float]:
+	from loguru import logger
+
+	sql_logger = logging.getLogger("sqlalchemy.engine.Engine")
+	sql_logger.setLevel(logging.INFO)
+	timings = []
+	for i in range(requests):
+		start = time.perf_counter()
+		logger.info("GET /api/messages/{} 200", i)
+		for _ in range(sql):
+			sql_logger.info("SELECT messages.id, messages.content FROM messages WHERE messages.id = ?")
+		timings.append((time.perf_counter() - start) * 1e6)
+	return timings
+
+
+def main(requests: int, sql: int, rotation: str) -> None:
+	stdout = sys.stdout
+	print(f"{'mode':<16}{'mean (us)':>12}{'p50 (us)':>12}{'p99 (us)':>12}{'max (us)':>12}{'stalls':>8}")
+	for name, queue_size, log_format in [
+		("sync text", 0, "text"),
+		("queued text", 10000, "text"),
+		("sync json", 0, "json"),
+		("queued json", 10000, "json"),
+	]:
+		with tempfile.TemporaryDirectory() as log_dir, open(os.devnull, "w") as devnull:
+			settings.LOG_DIR, settings.LOG_FILE_ROTATION = log_dir, rotation
+			settings.LOG_QUEUE_SIZE, settings.LOG_FORMAT, settings.LOG_QUEUE_BLOCK = queue_size, log_format, True
+			sys.stdout = devnull
+			try:
+				app_logging.setup_logging()
+				timings = _run(requests, sql)
+				# 缓冲区中剩余的日志不计入请求耗时
+				app_logging.stop_logging()
+			finally:
+				sys.stdout = stdout
+			quantiles = statistics.quantiles(timings, n=100)
+			print(
+				f"{name:<16}{statistics.fmean(timings):>12.1f}{quantiles[49]:>12.1f}"
+				f"{quantiles[98]:>12.1f}{max(timings):>12.1f}{sum(t >= 10_000 for t in timings):>8}"
+			)
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--requests", type=int, default=20000)
+	parser.add_argument("--sql", type=int, default=5, help="每个请求的 SQL 日志条数")
+	parser.add_argument("--rotation", default="2 MB", help="文件轮转大小，越小压缩越频繁")
+	args = parser.parse_args()
+	main(args.requests, args.sql, args.rotation)
@@ -0,0 +1,144 @@
+"""响应序列化基准：逐个 GET 接口对比 response_model 校验路径与 ok_json / page_json 快速路径
+
+用法：python -m benchmarks.serialization [--rows 100] [--rounds 500]
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime
+
+from fastapi.routing import APIRoute, serialize_response
+
+from app.api import conversations, messages, users
+from app.models import Conversation, Message, User
+from app.schemas.conversation import ConversationOut
+from app.schemas.message import MessageOut
+from app.schemas.response import ApiResponse
+from app.schemas.user import UserOut
+
+
+def _users(n: int) -> list[User]:
+	return [User(id=i, username=f"user_{i}", email=f"user_{i}@example.com") for i in range(n)]
+
+
+def _conversations(n: int) -> list[Conversation]:
+	now = datetime.now()
+	return [
+		Conversation(
+			id=uuid.uuid4(),
+			user_id="user_1",
+			title=f"Conversation {i}",
+			model_name="gpt-4o",
+			extra_data={"temperature": 0.7, "top_p": 0.9},
+			message_count=42,
+			last_message_at=now,
+			version=3,
+			created_at=now,
+			updated_at=now,
+		)
+		for i in range(n)
+	]
+
+
+def _messages(n: int) -> list[Message]:
+	now = datetime.now()
+	conversation_id = uuid.uuid4()
+	return [
+		Message(
+			id=uuid.uuid4(),
+			conversation_id=conversation_id,
+			role="assistant" if i % 2 else "user",
+			content="Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 8,
+			status="success",
+			extra_data={"usage": {"prompt_tokens": 120, "completion_tokens": 480}},
+			created_at=now,
+		)
+		for i in range(n)
+	]
+
+
+def _page(items: list) -> dict:
+	return {"list": items, "total": 10_000, "page": 1, "page_size": len(items), "has_more": True}
+
+
+def _cases(rows: int) -> list[tuple[str, str, object, object]]:
+	"""(接口名, 路由名, 现有路径的返回值, 快速路径的构造函数)"""
+	users, conversations, messages = _users(rows), _conversations(rows), _messages(rows)
+	return [
+		(
+			"GET /api/users/",
+			"get_users",
+			ApiResponse.page(**_page(users)),
+			lambda: ApiResponse.page_json(UserOut, **_page(users)),
+		),
+		(
+			"GET /api/users/{id}",
+			"get_user",
+			ApiResponse.ok(data=users[0]),
+			lambda: ApiResponse.ok_json(users[0], UserOut),
+		),
+		(
+			"GET /api/conversations/",
+			"get_conversations",
+			ApiResponse.page(**_page(conversations)),
+			lambda: ApiResponse.page_json(ConversationOut, **_page(conversations)),
+		),
+		(
+			"GET /api/conversations/{id}",
+			"get_conversation",
+			ApiResponse.ok(data=conversations[0]),
+			lambda: ApiResponse.ok_json(conversations[0], ConversationOut),
+		),
+		(
+			"GET /api/messages/conversation/{id}",
+			"get_messages",
+			ApiResponse.page(**_page(messages)),
+			lambda: ApiResponse.page_json(MessageOut, **_page(messages)),
+		),
+		(
+			"GET /api/messages/{id}",
+			"get_message",
+			ApiResponse.ok(data=messages[0]),
+			lambda: ApiResponse.ok_json(messages[0], MessageOut),
+		),
+	]
+
+
+async def _timeit(func, rounds: int) -> float:
+	start = time.perf_counter()
+	for _ in range(rounds):
+		await func()
+	return (time.perf_counter() - start) / rounds * 1e6
+
+
+async def main(rows: int, rounds: int) -> None:
+	routes = {
+		route.name: route
+		for module in (users, conversations, messages)
+		for route in module.router.routes
+		if isinstance(route, APIRoute)
+	}
+	print(f"{'endpoint':<38}{'validated (us)':>16}{'fast (us)':>12}{'speedup':>10}")
+	for name, route_name, content, fast in _cases(rows):
+		field = routes[route_name].response_field
+
+		# 与 FastAPI 对 response_model 的处理一致：先校验，再 dump_json
+		async def validated():
+			return await serialize_response(field=field, response_content=content, dump_json=True)
+
+		async def fast_path():
+			return fast().body
+
+		assert await validated() == await fast_path(), f"{name}: fast path output differs"
+		slow_us, fast_us = await _timeit(validated, rounds), await _timeit(fast_path, rounds)
+		print(f"{name:<38}{slow_us:>16.1f}{fast_us:>12.1f}{slow_us / fast_us:>9.2f}x")
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--rows", type=int, default=100, help="列表接口每页条数")
+	parser.add_argument("--rounds", type=int, default=500, help="每个接口的重复次数")
+	args = parser.parse_args()
+	asyncio.run(main(args.rows, args.rounds))
@@ -1,15 +1,28 @@
+from contextlib import contextmanager
+
 import pytest
 from httpx import ASGITransport, AsyncClient
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker
 
-from app.core.database import Base, get_db
+from app.core.cache import MemoryBackend, cache
+from app.core.config import settings
+from app.core.database import Base, build_engine, get_db, get_read_db
 from app.main import app
+from app.repositories.base import clear_count_cache, track_count_cache
+
+# 测试中同一请求重复执行同一语句超过 2 次即抛出 NPlusOneError，防止 N+1 回归
+settings.DB_QUERY_STRICT = True
+settings.DB_N_PLUS_ONE_THRESHOLD = 2
+# 缓存默认关闭，测试在单进程内运行，开启进程内缓存以覆盖缓存路径
+cache.backend = MemoryBackend(settings.CACHE_MAX_SIZE)
 
 # 使用内存 SQLite 进行测试隔离
 TEST_DATABASE_URL = "sqlite+aiosqlite:///"
 
-test_engine = create_async_engine(TEST_DATABASE_URL)
+test_engine = build_engine(TEST_DATABASE_URL)
 TestSessionLocal = async_sessionmaker(test_engine, expire_on_commit=False)
+track_count_cache(test_engine)
 
 
 async def override_get_db():
@@ -21,6 +34,7 @@ async def override_get_db():
 
 
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
 
 
 @pytest.fixture(autouse=True)
@@ -31,6 +45,9 @@ async def setup_database():
 	yield
 	async with test_engine.begin() as conn:
 		await conn.run_sync(Base.metadata.drop_all)
+	# 每个测试的数据库都是新建的，缓存也需要清空
+	await cache.clear()
+	clear_count_cache()
 
 
 @pytest.fixture
@@ -39,3 +56,35 @@ async def client():
 	transport = ASGITransport(app=app)
 	async with AsyncClient(transport=transport, base_url="http://test") as ac:
 		yield ac
+
+
+@pytest.fixture
+def engine():
+	"""测试引擎，与接口共用同一个内存数据库"""
+	return test_engine
+
+
+@pytest.fixture
+def session_factory():
+	"""直接操作测试数据库的会话工厂"""
+	return TestSessionLocal
+
+
+@contextmanager
+def _capture_statements():
+	statements = []
+
+	def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+		statements.append(statement)
+
+	event.listen(test_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+	try:
+		yield statements
+	finally:
+		event.remove(test_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture
+def capture_statements():
+	"""上下文管理器：记录期间发往测试数据库的 SQL 语句"""
+	return _capture_statements
@@ -0,0 +1,131 @@
+import uuid
+
+import pytest
+
+from app.repositories.conversation_repository import ConversationRepository
+from app.repositories.message_repository import MessageRepository
+from app.repositories.user_repository import UserRepository
+from app.schemas.conversation import ConversationCreate, ConversationUpdate
+from app.schemas.message import MessageCreate, MessageUpdate
+from app.schemas.user import UserCreate, UserUpdate
+
+
+async def test_create_is_single_statement(session_factory, capture_statements):
+	async with session_factory() as db:
+		with capture_statements() as statements:
+			conversation = await ConversationRepository.create(db, ConversationCreate(user_id="user_1", title="Chat"))
+		# 服务端默认值通过 INSERT ... RETURNING 取回，无需额外的 SELECT
+		assert len(statements) == 1
+		assert statements[0].startswith("INSERT")
+		assert conversation.created_at is not None
+		assert conversation.updated_at is not None
+		assert conversation.message_count == 0
+
+
+async def test_update_is_single_statement(session_factory, capture_statements):
+	async with session_factory() as db:
+		conversation = await ConversationRepository.create(db, ConversationCreate(user_id="user_1", title="Chat"))
+		with capture_statements() as statements:
+			conversation = await ConversationRepository.update(db, conversation, ConversationUpdate(title="Renamed"))
+		assert len(statements) == 1
+		assert statements[0].startswith("UPDATE")
+		assert conversation.title == "Renamed"
+		assert conversation.updated_at is not None
+
+		user = await UserRepository.create(db, UserCreate(username="alice", email="alice@example.com"))
+		with capture_statements() as statements:
+			user = await UserRepository.update(db, user, UserUpdate(username="alice_updated"))
+		assert len(statements) == 1
+		assert user.username == "alice_updated"
+
+
+async def test_update_and_delete_by_id_are_single_statement(session_factory, capture_statements):
+	async with session_factory() as db:
+		conversation = await ConversationRepository.create(db, ConversationCreate(user_id="user_1", title="Chat"))
+
+	async with session_factory() as db:
+		with capture_statements() as statements:
+			updated = await ConversationRepository.update_by_id(
+				db, conversation.id, ConversationUpdate(title="Renamed")
+			)
+		assert len(statements) == 1
+		assert statements[0].startswith("UPDATE")
+		assert updated.title == "Renamed"
+		assert updated.user_id == "user_1"
+
+		with capture_statements() as statements:
+			assert await ConversationRepository.delete_by_id(db, conversation.id) is True
+		assert len(statements) == 1
+		assert statements[0].startswith("DELETE")
+
+		# 记录不存在时返回 None / False，由 service 层转换为 404
+		assert await ConversationRepository.update_by_id(db, conversation.id, ConversationUpdate(title="x")) is None
+		assert await ConversationRepository.delete_by_id(db, conversation.id) is False
+
+
+async def test_bulk_delete_requires_criteria(session_factory):
+	async with session_factory() as db:
+		await ConversationRepository.create(db, ConversationCreate(user_id="user_1", title="Chat"))
+		with pytest.raises(ValueError):
+			await ConversationRepository.bulk_delete(db)
+		with pytest.raises(ValueError):
+			await ConversationRepository.bulk_delete(db, where=[])
+		assert await ConversationRepository.get_count(db) == 1
+
+
+class _MessageBulkUpdate(MessageUpdate):
+	id: uuid.UUID
+
+
+async def test_message_bulk_ops_sync_conversation(session_factory):
+	"""消息的批量更新、删除同样维护会话的 version / message_count / last_message_at"""
+	async with session_factory() as db:
+		conversation = await ConversationRepository.create(db, ConversationCreate(user_id="user_1", title="Chat"))
+		messages = await MessageRepository.bulk_create(
+			db, [MessageCreate(conversation_id=conversation.id, role="user", content=f"m{i}") for i in range(3)]
+		)
+		await db.refresh(conversation)
+		version = conversation.version
+
+		updated = await MessageRepository.bulk_update(db, [_MessageBulkUpdate(id=messages[0].id, content="edited")])
+		assert updated[0].content == "edited"
+		await db.refresh(conversation)
+		assert conversation.version == version + 1
+
+		deleted = await MessageRepository.bulk_delete(db, [message.id for message in messages[:2]])
+		assert sorted(deleted) == sorted(message.id for message in messages[:2])
+		await db.refresh(conversation)
+		assert conversation.message_count == 1
+		assert conversation.last_message_at == messages[2].created_at
+
+
+async def test_message_bulk_sync_is_set_based(session_factory, capture_statements):
+	"""批量写入涉及多个会话时，会话统计只用一条 UPDATE 维护"""
+	async with session_factory() as db:
+		conversations = [
+			await ConversationRepository.create(db, ConversationCreate(user_id="user_1", title=f"Chat {i}"))
+			for i in range(3)
+		]
+		with capture_statements() as statements:
+			messages = await MessageRepository.bulk_create(
+				db,
+				[
+					MessageCreate(conversation_id=conversation.id, role="user", content=f"m{i}")
+					for conversation, count in zip(conversations, (1, 1, 2), strict=True)
+					for i in range(count)
+				],
+			)
+		assert sum(statement.startswith("UPDATE conversations") for statement in statements) == 1
+		for conversation in conversations:
+			await db.refresh(conversation)
+		assert [conversation.message_count for conversation in conversations] == [1, 1, 2]
+		assert conversations[2].last_message_at == messages[-1].created_at
+
+		with capture_statements() as statements:
+			await MessageRepository.bulk_delete(db, [message.id for message in messages[1:]])
+		assert sum(statement.startswith("UPDATE conversations") for statement in statements) == 1
+		for conversation in conversations:
+			await db.refresh(conversation)
+		assert [conversation.message_count for conversation in conversations] == [1, 0, 0]
+		assert conversations[1].last_message_at is None
+		assert conversations[0].last_message_at == messages[0].created_at
@@ -1,5 +1,13 @@
+import json
 import uuid
 
+from sqlalchemy import update
+
+from app.core.cache import cache
+from app.core.etag import build_etag
+from app.models import Conversation
+from app.schemas.conversation import CONVERSATION_BATCH_MAX_SIZE
+
 
 async def test_create_conversation(client):
 	response = await client.post(
@@ -126,3 +134,233 @@ async def test_get_conversation_not_found(client):
 	data = res.json()
 	assert res.status_code == 404
 	assert data["code"] == 404
+
+
+async def test_get_conversations_by_cursor(client):
+	for i in range(5):
+		await client.post(
+			"/api/conversations/",
+			json={"user_id": "user_1", "title": f"Chat {i}"},
+		)
+	await client.post(
+		"/api/conversations/",
+		json={"user_id": "user_2", "title": "Other chat"},
+	)
+
+	# 第一页使用偏移分页，之后沿 next_cursor 翻页
+	res = await client.get("/api/conversations/", params={"user_id": "user_1", "page_size": 2})
+	data = res.json()["data"]
+	seen = [item["id"] for item in data["list"]]
+	cursor = data["next_cursor"]
+	while cursor is not None:
+		res = await client.get("/api/conversations/", params={"user_id": "user_1", "page_size": 2, "after": cursor})
+		data = res.json()["data"]
+		assert res.status_code == 200
+		assert data["page"] is None
+		for item in data["list"]:
+			assert item["user_id"] == "user_1"
+		seen.extend(item["id"] for item in data["list"])
+		cursor = data["next_cursor"]
+	assert len(seen) == 5
+	assert len(set(seen)) == 5
+
+	# 向前翻页返回上一页，顺序保持一致
+	res = await client.get(
+		"/api/conversations/", params={"user_id": "user_1", "page_size": 2, "before": data["prev_cursor"]}
+	)
+	data = res.json()["data"]
+	assert [item["id"] for item in data["list"]] == seen[2:4]
+
+
+async def test_get_conversations_cursor_conflict(client):
+	res = await client.get("/api/conversations/", params={"before": "a", "after": "b"})
+	data = res.json()
+	assert res.status_code == 400
+	assert data["code"] == 400
+
+
+async def test_batch_conversations(client):
+	res = await client.post(
+		"/api/conversations/batch",
+		json=[
+			{"user_id": "user_1", "title": "Chat 1"},
+			{"user_id": "user_1", "title": "Chat 2"},
+			{"user_id": "user_2", "title": "Chat 3"},
+		],
+	)
+	data = res.json()
+	assert res.status_code == 200
+	assert [item["title"] for item in data["data"]] == ["Chat 1", "Chat 2", "Chat 3"]
+	ids = [item["id"] for item in data["data"]]
+
+	res = await client.put("/api/conversations/batch", json=[{"id": ids[0], "title": "Renamed"}])
+	data = res.json()
+	assert data["data"][0]["title"] == "Renamed"
+	assert data["data"][0]["user_id"] == "user_1"
+
+	# 按 user_id 删除，会话下的消息由数据库级联删除
+	res = await client.post(
+		"/api/messages/",
+		json={"conversation_id": ids[0], "role": "user", "content": "Hello"},
+	)
+	message_id = res.json()["data"]["id"]
+	res = await client.post("/api/conversations/batch/delete", json={"user_id": "user_1"})
+	assert sorted(res.json()["data"]) == sorted(ids[:2])
+	res = await client.get(f"/api/messages/{message_id}")
+	assert res.json()["code"] == 404
+	res = await client.get("/api/conversations/")
+	assert res.json()["data"]["total"] == 1
+
+	res = await client.post("/api/conversations/batch/delete", json={"ids": [ids[2]]})
+	assert res.json()["data"] == [ids[2]]
+
+	res = await client.post("/api/conversations/batch/delete", json={})
+	assert res.status_code == 400
+
+	# 单次请求超过上限直接返回 422
+	res = await client.post(
+		"/api/conversations/batch", json=[{"user_id": "user_1"}] * (CONVERSATION_BATCH_MAX_SIZE + 1)
+	)
+	assert res.status_code == 422
+	res = await client.put(
+		"/api/conversations/batch", json=[{"id": str(uuid.uuid4())}] * (CONVERSATION_BATCH_MAX_SIZE + 1)
+	)
+	assert res.status_code == 422
+
+
+async def test_export_conversation(client):
+	res = await client.post(
+		"/api/conversations/",
+		json={"user_id": "user_1", "title": "Export"},
+	)
+	conversation_id = res.json()["data"]["id"]
+	await client.post(
+		"/api/messages/batch",
+		json=[{"conversation_id": conversation_id, "role": "user", "content": f"Message {i}"} for i in range(3)],
+	)
+
+	# 默认按 NDJSON 逐行输出
+	res = await client.get(f"/api/conversations/{conversation_id}/export")
+	assert res.status_code == 200
+	assert res.headers["content-type"].startswith("application/x-ndjson")
+	lines = [json.loads(line) for line in res.text.splitlines()]
+	assert [line["content"] for line in lines] == ["Message 0", "Message 1", "Message 2"]
+
+	res = await client.get(f"/api/conversations/{conversation_id}/export", params={"format": "json"})
+	assert res.status_code == 200
+	assert [item["id"] for item in res.json()] == [line["id"] for line in lines]
+
+
+async def test_export_conversation_not_found(client):
+	res = await client.get(f"/api/conversations/{uuid.uuid4()}/export")
+	assert res.status_code == 404
+	assert res.json()["code"] == 404
+
+
+async def test_get_conversation_cache(client):
+	res = await client.post(
+		"/api/conversations/",
+		json={"user_id": "user_1", "title": "Cached"},
+	)
+	conversation_id = res.json()["data"]["id"]
+
+	# 第一次读取未命中，第二次命中缓存
+	await client.get(f"/api/conversations/{conversation_id}")
+	await client.get(f"/api/conversations/{conversation_id}")
+	stats = (await client.get("/api/metrics/cache")).json()["data"]
+	assert stats["hits"] == 1
+	assert stats["misses"] == 1
+
+	# 更新后缓存失效，读到的是新值
+	await client.put(f"/api/conversations/{conversation_id}", json={"title": "Renamed"})
+	res = await client.get(f"/api/conversations/{conversation_id}")
+	assert res.json()["data"]["title"] == "Renamed"
+
+	# 写消息会改变 message_count，会话缓存同样失效
+	res = await client.post(
+		"/api/messages/",
+		json={"conversation_id": conversation_id, "role": "user", "content": "Hello"},
+	)
+	message_id = res.json()["data"]["id"]
+	res = await client.get(f"/api/conversations/{conversation_id}")
+	assert res.json()["data"]["message_count"] == 1
+
+	# 删除会话后，依附于它的消息缓存一并失效
+	await client.get(f"/api/messages/{message_id}")
+	await client.delete(f"/api/conversations/{conversation_id}")
+	res = await client.get(f"/api/conversations/{conversation_id}")
+	assert res.status_code == 404
+	res = await client.get(f"/api/messages/{message_id}")
+	assert res.status_code == 404
+
+
+async def test_cache_skips_stale_fill():
+	"""读取数据库期间发生过失效，读到的旧值不写入缓存"""
+	since = cache.invalidations
+	await cache.delete("conversations:1")
+	await cache.set("conversations:1", {"title": "stale"}, since=since)
+	assert await cache.get("conversations:1") is None
+
+	await cache.set("conversations:1", {"title": "fresh"}, since=cache.invalidations)
+	assert await cache.get("conversations:1") == {"title": "fresh"}
+
+
+async def test_get_conversation_etag(client, session_factory):
+	res = await client.post(
+		"/api/conversations/",
+		json={"user_id": "user_1", "title": "Conditional"},
+	)
+	conversation_id = res.json()["data"]["id"]
+
+	res = await client.get(f"/api/conversations/{conversation_id}")
+	etag = res.headers["etag"]
+	assert res.json()["data"]["version"] == 1
+
+	# 未变化时返回 304 且没有响应体
+	res = await client.get(f"/api/conversations/{conversation_id}", headers={"If-None-Match": etag})
+	assert res.status_code == 304
+	assert res.content == b""
+	assert res.headers["etag"] == etag
+
+	# 更新后版本号推进，旧 ETag 不再匹配
+	await client.put(f"/api/conversations/{conversation_id}", json={"title": "Renamed"})
+	res = await client.get(f"/api/conversations/{conversation_id}", headers={"If-None-Match": etag})
+	assert res.status_code == 200
+	assert res.json()["data"]["version"] == 2
+	assert res.headers["etag"] != etag
+
+	# 其他进程写入后本进程的缓存仍是旧值，版本号从数据库读取，不会误返回 304
+	etag = res.headers["etag"]
+	async with session_factory() as db:
+		await db.execute(update(Conversation).where(Conversation.id == uuid.UUID(conversation_id)).values(title="x"))
+		await db.commit()
+	res = await client.get(f"/api/conversations/{conversation_id}", headers={"If-None-Match": etag})
+	assert res.status_code == 200
+
+	# 不带 If-None-Match 的请求同样按数据库中的版本号返回 ETag，响应体也不再取缓存中的旧值
+	async with session_factory() as db:
+		await db.execute(update(Conversation).where(Conversation.id == uuid.UUID(conversation_id)).values(title="y"))
+		await db.commit()
+	res = await client.get(f"/api/conversations/{conversation_id}")
+	assert res.json()["data"]["title"] == "y"
+	etag = res.headers["etag"]
+	assert etag == build_etag(uuid.UUID(conversation_id), res.json()["data"]["version"])
+	res = await client.get(f"/api/conversations/{conversation_id}", headers={"If-None-Match": etag})
+	assert res.status_code == 304
+
+	# 不存在的会话即使带了 If-None-Match: * 也返回 404
+	res = await client.get(f"/api/conversations/{uuid.uuid4()}", headers={"If-None-Match": "*"})
+	assert res.status_code == 404
+
+
+async def test_get_conversations_sparse_fields(client):
+	for i in range(3):
+		await client.post(
+			"/api/conversations/",
+			json={"user_id": "user_1", "title": f"Conversation {i}", "extra_data": {"temperature": 0.7}},
+		)
+
+	res = await client.get("/api/conversations/", params={"user_id": "user_1", "fields": "title,updated_at"})
+	data = res.json()["data"]
+	assert [set(item) for item in data["list"]] == [{"id", "title", "updated_at"}] * 3
+	assert data["total"] == 3
@@ -0,0 +1,264 @@
+import asyncio
+import time
+import uuid
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event, exc, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core import database
+from app.core.config import settings
+from app.core.database import (
+	Base,
+	MeteredQueuePool,
+	after_commit,
+	build_engine,
+	get_db,
+	get_read_db,
+	pool_stats,
+	session_scope,
+)
+from app.core.exceptions import BizException
+from app.main import app
+from app.repositories.conversation_repository import ConversationRepository
+from app.repositories.message_repository import MessageRepository
+from app.schemas.conversation import ConversationCreate
+from app.schemas.message import MessageCreate
+from app.services import message_service
+
+
+@pytest.fixture
+def database_url(tmp_path):
+	return f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}"
+
+
+async def test_pool_stats(database_url):
+	engine = build_engine(database_url, pool_size=1, max_overflow=0, pool_timeout=0.05)
+	assert isinstance(engine.sync_engine.pool, MeteredQueuePool)
+	try:
+		async with engine.connect() as conn:
+			await conn.execute(text("SELECT 1"))
+			stats = pool_stats(engine)
+			assert (stats["size"], stats["checked_out"], stats["checkouts"]) == (1, 1, 1)
+
+			# 唯一的连接被占用，再取连接会超时
+			with pytest.raises(exc.TimeoutError):
+				async with engine.connect():
+					pass
+		stats = pool_stats(engine)
+		assert (stats["checked_in"], stats["checked_out"], stats["timeouts"]) == (1, 0, 1)
+		assert stats["wait_max_ms"] >= 0
+		assert stats["connects"] == 1
+
+		# dispose 重建连接池后累计统计仍保留
+		await engine.dispose()
+		assert pool_stats(engine)["checkouts"] == 1
+	finally:
+		await engine.dispose()
+
+
+async def test_pool_wait_excludes_connect_time(database_url):
+	"""新建连接的耗时单独统计，不计入取连接的等待时间"""
+	engine = build_engine(database_url, pool_size=1)
+	event.listen(engine.sync_engine, "connect", lambda dbapi_connection, connection_record: time.sleep(0.05))
+	try:
+		async with engine.connect() as conn:
+			await conn.execute(text("SELECT 1"))
+		stats = pool_stats(engine)
+		assert stats["connects"] == 1
+		assert stats["connect_max_ms"] >= 50
+		assert stats["wait_max_ms"] < 50
+	finally:
+		await engine.dispose()
+
+
+async def test_ping_idle_connections(database_url, monkeypatch):
+	engine = build_engine(database_url, ping_idle_after=0.05, pool_size=1, pool_pre_ping=False)
+	pings = []
+	monkeypatch.setattr(engine.dialect, "do_ping", lambda dbapi_connection: pings.append(dbapi_connection))
+	try:
+		for _ in range(2):
+			async with engine.connect() as conn:
+				await conn.execute(text("SELECT 1"))
+		# 刚归还的连接直接复用，不 ping
+		assert pings == []
+
+		await asyncio.sleep(0.06)
+		async with engine.connect() as conn:
+			await conn.execute(text("SELECT 1"))
+		assert len(pings) == 1
+	finally:
+		await engine.dispose()
+
+
+async def test_ping_idle_skipped_with_pre_ping(database_url, monkeypatch):
+	"""开启 pool_pre_ping 时不再按空闲时长 ping，空闲的连接只 ping 一次"""
+	engine = build_engine(database_url, ping_idle_after=0.05, pool_size=1, pool_pre_ping=True)
+	pings = []
+	# pre-ping 按返回值判断连接是否可用
+	monkeypatch.setattr(engine.dialect, "do_ping", lambda dbapi_connection: pings.append(dbapi_connection) or True)
+	try:
+		async with engine.connect() as conn:
+			await conn.execute(text("SELECT 1"))
+		await asyncio.sleep(0.06)
+		pings.clear()
+		async with engine.connect() as conn:
+			await conn.execute(text("SELECT 1"))
+		assert len(pings) == 1
+	finally:
+		await engine.dispose()
+
+
+async def test_pool_metrics_endpoint(client, monkeypatch, database_url):
+	res = await client.get("/api/metrics/pool")
+	assert res.status_code == 200
+	primary = res.json()["data"][0]
+	assert (primary["name"], primary["pool"]) == ("primary", "MeteredQueuePool")
+
+	# 独立的只读引擎和副本同样列出
+	read_engine = build_engine(database_url, pool_size=1)
+	replica = build_engine(database_url, pool_size=1)
+	monkeypatch.setattr(database, "read_engine", read_engine)
+	monkeypatch.setattr(database.replicas, "engines", [replica])
+	try:
+		res = await client.get("/api/metrics/pool")
+		assert [item["name"] for item in res.json()["data"]] == ["primary", "read", "replica:0"]
+	finally:
+		await read_engine.dispose()
+		await replica.dispose()
+
+
+@contextmanager
+def count_engine_events(engine, *names):
+	"""统计引擎上的连接池/连接事件次数，如 checkout、commit"""
+	counts = dict.fromkeys(names, 0)
+	listeners = {name: lambda *args, name=name: counts.__setitem__(name, counts[name] + 1) for name in names}
+	for name, listener in listeners.items():
+		event.listen(engine.sync_engine, name, listener)
+	try:
+		yield counts
+	finally:
+		for name, listener in listeners.items():
+			event.remove(engine.sync_engine, name, listener)
+
+
+async def test_session_checks_out_connection_lazily(client, database_url):
+	"""请求注入了会话但没有访问数据库时，不从连接池取连接"""
+	pooled = build_engine(database_url, pool_size=1)
+	pooled_session_factory = async_sessionmaker(pooled, expire_on_commit=False)
+
+	async def override():
+		async with session_scope(pooled_session_factory) as session:
+			yield session
+
+	previous = app.dependency_overrides[get_read_db]
+	app.dependency_overrides[get_read_db] = override
+	try:
+		# 游标参数冲突，service 在查询之前就返回 400
+		res = await client.get("/api/conversations/", params={"before": "a", "after": "b"})
+		assert res.status_code == 400
+		stats = pool_stats(pooled)
+		assert (stats["checkouts"], stats["checked_out"]) == (0, 0)
+	finally:
+		app.dependency_overrides[get_read_db] = previous
+		await pooled.dispose()
+
+
+@pytest.fixture
+def unit_of_work(session_factory):
+	async def override():
+		async with session_scope(session_factory, unit_of_work=True) as session:
+			yield session
+
+	previous = app.dependency_overrides[get_db]
+	app.dependency_overrides[get_db] = override
+	yield
+	app.dependency_overrides[get_db] = previous
+
+
+async def test_unit_of_work_commits_once_per_request(client, engine, unit_of_work):
+	res = await client.post("/api/conversations/", json={"user_id": "user_1", "title": "UoW"})
+	conversation_id = res.json()["data"]["id"]
+
+	# 插入消息、维护会话统计在同一个事务中，请求结束时只提交一次
+	with count_engine_events(engine, "commit") as counts:
+		res = await client.post(
+			"/api/messages/",
+			json={"conversation_id": conversation_id, "role": "user", "content": "Hello"},
+		)
+	assert res.status_code == 200
+	assert counts["commit"] == 1
+	res = await client.get(f"/api/conversations/{conversation_id}")
+	assert res.json()["data"]["message_count"] == 1
+
+
+async def test_unit_of_work_rolls_back_on_error(session_factory):
+	callbacks = []
+
+	async def callback():
+		callbacks.append("called")
+
+	with pytest.raises(RuntimeError):
+		async with session_scope(session_factory, unit_of_work=True) as db:
+			conversation = await ConversationRepository.create(db, ConversationCreate(user_id="user_1"))
+			await after_commit(db, callback)
+			raise RuntimeError
+
+	# 整个请求回滚，提交后的动作不会执行
+	async with session_factory() as db:
+		assert not await ConversationRepository.exists(db, conversation.id)
+	assert callbacks == []
+
+
+async def test_unit_of_work_failed_write_discards_callbacks(session_factory):
+	"""工作单元中写入失败后，即使调用方吞掉了异常，之前登记的提交后动作也不会执行"""
+	callbacks = []
+
+	async def callback():
+		callbacks.append("called")
+
+	with pytest.raises(exc.PendingRollbackError):
+		async with session_scope(session_factory, unit_of_work=True) as db:
+			conversation = await ConversationRepository.create(db, ConversationCreate(user_id="user_1"))
+			await after_commit(db, callback)
+			with pytest.raises(BizException):
+				await message_service.create_message(
+					db, MessageCreate(conversation_id=uuid.uuid4(), role="user", content="Hello")
+				)
+
+	async with session_factory() as db:
+		assert not await ConversationRepository.exists(db, conversation.id)
+	assert callbacks == []
+
+
+async def test_sqlite_profile(database_url):
+	writer = build_engine(database_url, sqlite_pragmas=settings.SQLITE_PRAGMAS, sqlite_writer=True)
+	reader = build_engine(database_url, sqlite_pragmas=settings.SQLITE_PRAGMAS | {"query_only": "ON"}, pool_size=5)
+	try:
+		async with writer.begin() as conn:
+			await conn.run_sync(Base.metadata.create_all)
+			assert await conn.scalar(text("PRAGMA journal_mode")) == "wal"
+			assert await conn.scalar(text("PRAGMA busy_timeout")) == settings.SQLITE_BUSY_TIMEOUT
+		session_factory = async_sessionmaker(writer, expire_on_commit=False)
+		async with session_factory() as db:
+			conversation = await ConversationRepository.create(db, ConversationCreate(user_id="user_1"))
+
+		# 并发写入在唯一的写连接上排队执行，不会出现 database is locked
+		async def write(i):
+			async with session_factory() as db:
+				await MessageRepository.create(
+					db, MessageCreate(conversation_id=conversation.id, role="user", content=f"Message {i}")
+				)
+
+		await asyncio.gather(*(write(i) for i in range(50)))
+		assert pool_stats(writer)["size"] == 1
+
+		async with async_sessionmaker(reader)() as db:
+			assert await MessageRepository.get_count_by_conversation_id(db, conversation.id) == 50
+			# 读连接禁止写入
+			with pytest.raises(exc.OperationalError):
+				await db.execute(text("DELETE FROM messages"))
+	finally:
+		await writer.dispose()
+		await reader.dispose()
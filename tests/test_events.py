@@ -0,0 +1,115 @@
+import json
+import uuid
+
+from app.core.events import EventBroker, MemoryBackend, events
+from app.services import message_service
+
+
+async def _create_conversation(client):
+	res = await client.post("/api/conversations/", json={"user_id": "test_user", "title": "Events"})
+	return res.json()["data"]["id"]
+
+
+async def test_message_writes_publish_events(client):
+	conversation_id = await _create_conversation(client)
+	async with events.subscribe(f"conversation:{conversation_id}") as queue:
+		res = await client.post(
+			"/api/messages/",
+			json={"conversation_id": conversation_id, "role": "assistant", "content": "", "status": "processing"},
+		)
+		message_id = res.json()["data"]["id"]
+		await client.put(f"/api/messages/{message_id}", json={"content": "Done", "status": "success"})
+
+		event, data = queue.get_nowait()
+		assert event == "message.created"
+		assert json.loads(data)["status"] == "processing"
+		event, data = queue.get_nowait()
+		assert event == "message.updated"
+		payload = json.loads(data)
+		assert (payload["id"], payload["content"], payload["status"]) == (message_id, "Done", "success")
+		assert queue.empty()
+	assert events.subscriber_count() == 0
+
+
+async def test_stream_events(client, session_factory):
+	conversation_id = await _create_conversation(client)
+	async with session_factory() as db:
+		stream = await message_service.stream_events(db, uuid.UUID(conversation_id))
+	# 第一帧输出时已完成订阅
+	assert await anext(stream) == b": connected\n\n"
+	assert events.subscriber_count() == 1
+
+	await client.post(
+		"/api/messages/",
+		json={"conversation_id": conversation_id, "role": "user", "content": "Hello"},
+	)
+	frame = await anext(stream)
+	assert frame.startswith(b"event: message.created\ndata: {")
+	assert frame.endswith(b"\n\n")
+
+	# 客户端断开后取消订阅
+	await stream.aclose()
+	assert events.subscriber_count() == 0
+
+
+async def test_stream_events_heartbeat():
+	stream = message_service._iter_events(uuid.uuid4(), heartbeat=0.01)
+	assert await anext(stream) == b": connected\n\n"
+	assert await anext(stream) == b": ping\n\n"
+	await stream.aclose()
+
+
+async def test_stream_events_not_found(client):
+	res = await client.get(f"/api/conversations/{uuid.uuid4()}/events")
+	assert res.status_code == 404
+
+
+async def test_event_payload_limit():
+	class LimitedBackend(MemoryBackend):
+		payload_limit = 200
+
+	broker = EventBroker(LimitedBackend(), queue_size=1)
+	async with broker.subscribe("channel") as queue:
+		await broker.publish("channel", "message.created", {"id": "1", "content": "x" * 1000})
+		assert queue.get_nowait() == ("message.created", json.dumps({"id": "1", "truncated": ["content"]}))
+
+		# 队列满时丢弃最旧的事件
+		await broker.publish("channel", "message.updated", {"id": "1"})
+		await broker.publish("channel", "message.updated", {"id": "2"})
+		assert queue.get_nowait() == ("message.updated", json.dumps({"id": "2"}))
+
+
+async def test_append_publishes_delta(client):
+	conversation_id = await _create_conversation(client)
+	res = await client.post(
+		"/api/messages/",
+		json={"conversation_id": conversation_id, "role": "assistant", "content": "", "status": "processing"},
+	)
+	message_id = res.json()["data"]["id"]
+	async with events.subscribe(f"conversation:{conversation_id}") as queue:
+		await client.patch(f"/api/messages/{message_id}/content", json={"delta": "Hi"})
+		event, data = queue.get_nowait()
+		assert event == "message.delta"
+		assert json.loads(data) == {
+			"id": message_id,
+			"conversation_id": conversation_id,
+			"delta": "Hi",
+			"status": "processing",
+		}
+
+
+async def test_publish_failure_does_not_fail_write(client, monkeypatch):
+	"""推送在提交之后进行，失败时写请求照常成功"""
+
+	async def publish(channel, message):
+		raise ConnectionError("Event LISTEN connection is reconnecting")
+
+	monkeypatch.setattr(events.backend, "publish", publish)
+	conversation_id = await _create_conversation(client)
+	res = await client.post(
+		"/api/messages/",
+		json={"conversation_id": conversation_id, "role": "user", "content": "Hello"},
+	)
+	assert res.status_code == 200
+	res = await client.get(f"/api/conversations/{conversation_id}")
+	assert res.json()["data"]["message_count"] == 1
@@ -0,0 +1,67 @@
+import io
+import logging
+import time
+
+from loguru import logger
+
+from app.core.logging import LogWriter
+
+
+def test_log_writer_batches_and_drops():
+	"""写线程批量写出；缓冲区满时丢弃新日志，并补记一条警告"""
+	writer = LogWriter(maxsize=3, interval=60)
+	target = io.StringIO()
+	sink = writer.sink(target)
+	for i in range(5):
+		sink(f"line {i}\n")
+	assert target.getvalue() == ""
+	assert writer.dropped == 2
+
+	handler_id = logger.add(sink, format="{message}", level="WARNING")
+	try:
+		writer.close()
+	finally:
+		logger.remove(handler_id)
+	assert target.getvalue() == "line 0\nline 1\nline 2\nLog buffer full, dropped 2 messages\n"
+
+	# 关闭后直接同步写入
+	sink("line 5\n")
+	assert target.getvalue().endswith("line 5\n")
+
+
+def test_sqlalchemy_logs_go_through_loguru():
+	"""SQLAlchemy 的标准库日志转交给 loguru，不再由它自带的 handler 直接写 stdout"""
+	messages = []
+	handler_id = logger.add(messages.append, format="{level} {message}", level="INFO")
+	try:
+		logging.getLogger("sqlalchemy.engine.Engine").warning("SELECT 1")
+	finally:
+		logger.remove(handler_id)
+	assert "WARNING SELECT 1\n" in messages
+	assert not logging.getLogger("sqlalchemy.engine.Engine").handlers
+
+
+def test_log_writer_survives_write_errors(capsys):
+	"""某次写入失败只丢弃这一批，写线程继续运行"""
+
+	class FlakyTarget(io.StringIO):
+		fail = True
+
+		def write(self, s):
+			if self.fail:
+				self.fail = False
+				raise OSError("No space left on device")
+			return super().write(s)
+
+	writer = LogWriter(maxsize=10, interval=0.01)
+	target = FlakyTarget()
+	sink = writer.sink(target)
+	sink("lost\n")
+	deadline = time.monotonic() + 2
+	while not writer.failed and time.monotonic() < deadline:
+		time.sleep(0.01)
+	sink("kept\n")
+	writer.close()
+	assert writer.failed == 1
+	assert target.getvalue() == "kept\n"
+	assert "No space left on device" in capsys.readouterr().err
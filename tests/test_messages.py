@@ -1,5 +1,16 @@
+import asyncio
+import sqlite3
 import uuid
 
+import pytest
+from loguru import logger
+from sqlalchemy.exc import IntegrityError
+
+from app.core import querylog
+from app.repositories.message_repository import MessageRepository
+from app.schemas.message import MessageCreate
+from app.services import message_service
+
 
 async def _create_conversation(client):
 	"""辅助函数：创建对话并返回其 UUID"""
@@ -149,9 +160,377 @@ async def test_create_message_invalid_conversation(client):
 	assert "Conversation not found" in data["msg"]
 
 
+async def test_create_message_other_integrity_error(session_factory, monkeypatch):
+	"""只有会话外键失败才转换为 404，其余完整性错误原样抛出"""
+
+	async def create(db, message_in):
+		raise IntegrityError("INSERT INTO messages ...", None, sqlite3.IntegrityError("UNIQUE constraint failed"))
+
+	monkeypatch.setattr(MessageRepository, "create", create)
+	message_in = MessageCreate(conversation_id=uuid.uuid4(), role="user", content="Hello")
+	async with session_factory() as db:
+		with pytest.raises(IntegrityError):
+			await message_service.create_message(db, message_in)
+
+
 async def test_get_message_not_found(client):
 	fake_uuid = str(uuid.uuid4())
 	res = await client.get(f"/api/messages/{fake_uuid}")
 	data = res.json()
 	assert res.status_code == 404
 	assert data["code"] == 404
+
+
+async def test_get_messages_by_cursor(client):
+	conversation_id = await _create_conversation(client)
+	for i in range(5):
+		await client.post(
+			"/api/messages/",
+			json={"conversation_id": conversation_id, "role": "user", "content": f"Message {i}"},
+		)
+
+	# 第一页使用偏移分页，返回的 next_cursor 可切换到游标分页
+	res = await client.get(f"/api/messages/conversation/{conversation_id}", params={"page_size": 2})
+	data = res.json()["data"]
+	first_page = [item["id"] for item in data["list"]]
+	assert data["prev_cursor"] is None
+	assert data["next_cursor"] is not None
+
+	# 向后翻页直到没有更多数据
+	seen = list(first_page)
+	cursor = data["next_cursor"]
+	while cursor is not None:
+		res = await client.get(
+			f"/api/messages/conversation/{conversation_id}", params={"page_size": 2, "after": cursor}
+		)
+		data = res.json()["data"]
+		assert res.status_code == 200
+		assert data["page"] is None
+		assert data["total"] == 5
+		seen.extend(item["id"] for item in data["list"])
+		cursor = data["next_cursor"]
+	assert len(seen) == 5
+	assert len(set(seen)) == 5
+
+	# 从最后一页向前翻页，回到第一页
+	res = await client.get(
+		f"/api/messages/conversation/{conversation_id}", params={"page_size": 2, "before": data["prev_cursor"]}
+	)
+	data = res.json()["data"]
+	assert [item["id"] for item in data["list"]] == seen[2:4]
+	res = await client.get(
+		f"/api/messages/conversation/{conversation_id}", params={"page_size": 2, "before": data["prev_cursor"]}
+	)
+	data = res.json()["data"]
+	assert [item["id"] for item in data["list"]] == first_page
+	assert data["prev_cursor"] is None
+
+
+async def test_get_messages_same_second_order(client):
+	"""SQLite 的时间戳只精确到秒，同一进程内同一秒写入的消息仍按写入顺序返回"""
+	conversation_id = await _create_conversation(client)
+	contents = [f"m{i}" for i in range(8)]
+	for content in contents:
+		await client.post(
+			"/api/messages/",
+			json={"conversation_id": conversation_id, "role": "user", "content": content},
+		)
+
+	url = f"/api/messages/conversation/{conversation_id}"
+	res = await client.get(url)
+	assert [item["content"] for item in res.json()["data"]["list"]] == contents
+
+	# 游标分页逐页读取，顺序同样不变
+	seen = []
+	params = {"page_size": 3}
+	while True:
+		data = (await client.get(url, params=params)).json()["data"]
+		seen.extend(item["content"] for item in data["list"])
+		if data["next_cursor"] is None:
+			break
+		params = {"page_size": 3, "after": data["next_cursor"]}
+	assert seen == contents
+
+
+async def test_get_messages_invalid_cursor(client):
+	conversation_id = await _create_conversation(client)
+	res = await client.get(f"/api/messages/conversation/{conversation_id}", params={"after": "not-a-cursor"})
+	data = res.json()
+	assert res.status_code == 400
+	assert data["code"] == 400
+	assert "Invalid cursor" in data["msg"]
+
+
+async def test_conversation_message_stats(client):
+	conversation_id = await _create_conversation(client)
+	res = await client.get(f"/api/conversations/{conversation_id}")
+	data = res.json()["data"]
+	assert data["message_count"] == 0
+	assert data["last_message_at"] is None
+
+	message_ids = []
+	for i in range(2):
+		res = await client.post(
+			"/api/messages/",
+			json={"conversation_id": conversation_id, "role": "user", "content": f"Message {i}"},
+		)
+		message_ids.append(res.json()["data"]["id"])
+
+	res = await client.get(f"/api/conversations/{conversation_id}")
+	data = res.json()["data"]
+	assert data["message_count"] == 2
+	assert data["last_message_at"] is not None
+
+	# 删除消息后计数同步减少，删光后 last_message_at 清空
+	for message_id in message_ids:
+		await client.delete(f"/api/messages/{message_id}")
+	res = await client.get(f"/api/conversations/{conversation_id}")
+	data = res.json()["data"]
+	assert data["message_count"] == 0
+	assert data["last_message_at"] is None
+
+
+async def test_create_messages_batch(client):
+	conversation_id = await _create_conversation(client)
+	other_conversation_id = await _create_conversation(client)
+
+	res = await client.post(
+		"/api/messages/batch",
+		json=[
+			{"conversation_id": conversation_id, "role": "system", "content": "You are helpful"},
+			{"conversation_id": conversation_id, "role": "user", "content": "Hello"},
+			{"conversation_id": conversation_id, "role": "assistant", "content": "Hi", "status": "processing"},
+			{"conversation_id": other_conversation_id, "role": "user", "content": "Other"},
+		],
+	)
+	data = res.json()
+	assert res.status_code == 200
+	assert data["code"] == 200
+	assert [item["content"] for item in data["data"]] == ["You are helpful", "Hello", "Hi", "Other"]
+	assert data["data"][2]["status"] == "processing"
+	for item in data["data"]:
+		assert "id" in item
+		assert "created_at" in item
+
+	res = await client.get(f"/api/conversations/{conversation_id}")
+	assert res.json()["data"]["message_count"] == 3
+	res = await client.get(f"/api/conversations/{other_conversation_id}")
+	assert res.json()["data"]["message_count"] == 1
+
+
+async def test_create_messages_batch_order(client):
+	"""同一批消息的 created_at 相同，列表和导出仍按入参顺序返回"""
+	conversation_id = await _create_conversation(client)
+	contents = [f"m{i}" for i in range(10)]
+	await client.post(
+		"/api/messages/batch",
+		json=[{"conversation_id": conversation_id, "role": "user", "content": content} for content in contents],
+	)
+
+	res = await client.get(f"/api/messages/conversation/{conversation_id}")
+	assert [item["content"] for item in res.json()["data"]["list"]] == contents
+	res = await client.get(f"/api/conversations/{conversation_id}/export", params={"format": "json"})
+	assert [item["content"] for item in res.json()] == contents
+
+
+async def test_create_messages_batch_too_large(client):
+	conversation_id = await _create_conversation(client)
+	res = await client.post(
+		"/api/messages/batch",
+		json=[{"conversation_id": conversation_id, "role": "user", "content": "Hello"}] * 1001,
+	)
+	assert res.status_code == 422
+
+
+async def test_create_messages_batch_invalid_conversation(client):
+	conversation_id = await _create_conversation(client)
+	res = await client.post(
+		"/api/messages/batch",
+		json=[
+			{"conversation_id": conversation_id, "role": "user", "content": "Hello"},
+			{"conversation_id": str(uuid.uuid4()), "role": "user", "content": "Hello"},
+		],
+	)
+	data = res.json()
+	assert res.status_code == 404
+	assert "Conversation not found" in data["msg"]
+
+	# 整批失败，不会写入任何消息
+	res = await client.get(f"/api/messages/conversation/{conversation_id}")
+	assert res.json()["data"]["total"] == 0
+
+
+async def test_get_messages_invalid_conversation(client):
+	fake_conversation_id = str(uuid.uuid4())
+	res = await client.get(f"/api/messages/conversation/{fake_conversation_id}")
+	data = res.json()
+	assert res.status_code == 404
+	assert "Conversation not found" in data["msg"]
+
+	# 已存在但没有消息的会话返回空列表
+	conversation_id = await _create_conversation(client)
+	res = await client.get(f"/api/messages/conversation/{conversation_id}")
+	assert res.status_code == 200
+	assert res.json()["data"]["list"] == []
+
+
+async def test_get_messages_etag(client):
+	conversation_id = await _create_conversation(client)
+	res = await client.post(
+		"/api/messages/",
+		json={"conversation_id": conversation_id, "role": "user", "content": "Hello"},
+	)
+	message_id = res.json()["data"]["id"]
+
+	url = f"/api/messages/conversation/{conversation_id}"
+	res = await client.get(url)
+	etag = res.headers["etag"]
+	res = await client.get(url, headers={"If-None-Match": etag})
+	assert res.status_code == 304
+
+	# 不同的查询参数对应不同的 ETag
+	res = await client.get(url, params={"page_size": 1}, headers={"If-None-Match": etag})
+	assert res.status_code == 200
+
+	# 修改消息内容后旧 ETag 失效
+	await client.put(f"/api/messages/{message_id}", json={"content": "Edited"})
+	res = await client.get(url, headers={"If-None-Match": etag})
+	assert res.status_code == 200
+	assert res.json()["data"]["list"][0]["content"] == "Edited"
+	etag = res.headers["etag"]
+
+	# 新增消息后旧 ETag 同样失效
+	await client.post(
+		"/api/messages/",
+		json={"conversation_id": conversation_id, "role": "assistant", "content": "Hi"},
+	)
+	res = await client.get(url, headers={"If-None-Match": etag})
+	assert res.status_code == 200
+	assert res.json()["data"]["total"] == 2
+
+
+async def test_get_messages_sparse_fields(client, capture_statements):
+	conversation_id = await _create_conversation(client)
+	for i in range(3):
+		await client.post(
+			"/api/messages/",
+			json={"conversation_id": conversation_id, "role": "user", "content": f"Message {i}"},
+		)
+
+	url = f"/api/messages/conversation/{conversation_id}"
+	with capture_statements() as statements:
+		res = await client.get(url, params={"fields": "role,created_at", "page_size": 2})
+	data = res.json()["data"]
+	# 只返回请求的字段和 id，content 列不会被查询
+	assert [set(item) for item in data["list"]] == [{"id", "role", "created_at"}] * 2
+	assert not any("messages.content" in statement for statement in statements)
+
+	# 游标分页同样可用
+	res = await client.get(url, params={"fields": "content", "after": data["next_cursor"]})
+	rest = res.json()["data"]["list"]
+	assert [set(item) for item in rest] == [{"id", "content"}]
+	assert len({item["id"] for item in data["list"] + rest}) == 3
+
+	res = await client.get(url, params={"fields": "role,password"})
+	assert res.status_code == 400
+	assert res.json()["msg"] == "Unknown fields: password"
+
+
+async def _create_processing_message(client):
+	conversation_id = await _create_conversation(client)
+	res = await client.post(
+		"/api/messages/",
+		json={"conversation_id": conversation_id, "role": "assistant", "content": "Hel", "status": "processing"},
+	)
+	return res.json()["data"]["id"]
+
+
+async def test_append_message_content(client):
+	message_id = await _create_processing_message(client)
+
+	res = await client.patch(f"/api/messages/{message_id}/content", json={"delta": "lo"})
+	data = res.json()["data"]
+	assert res.status_code == 200
+	assert data["content_length"] == 5
+	assert data["status"] == "processing"
+
+	res = await client.patch(f"/api/messages/{message_id}/content", json={"delta": ", world", "status": "success"})
+	assert res.json()["data"]["status"] == "success"
+	res = await client.get(f"/api/messages/{message_id}")
+	assert res.json()["data"]["content"] == "Hello, world"
+
+	res = await client.patch(f"/api/messages/{uuid.uuid4()}/content", json={"delta": "x"})
+	assert res.status_code == 404
+
+
+async def test_append_message_content_buffered(client, monkeypatch, session_factory):
+	monkeypatch.setattr(message_service, "append_buffer", message_service.ContentAppendBuffer(0.01, session_factory))
+	message_id = await _create_processing_message(client)
+
+	# 增量先入队，到期后合并成一次写入
+	for delta in ("l", "o"):
+		res = await client.patch(f"/api/messages/{message_id}/content", json={"delta": delta})
+		assert res.status_code == 202
+	await asyncio.sleep(0.05)
+	res = await client.get(f"/api/messages/{message_id}")
+	assert res.json()["data"]["content"] == "Hello"
+
+	# 带状态的追加连同未落库的增量立即写入
+	await client.patch(f"/api/messages/{message_id}/content", json={"delta": ", "})
+	res = await client.patch(f"/api/messages/{message_id}/content", json={"delta": "world", "status": "success"})
+	assert res.status_code == 200
+	assert res.json()["data"]["content_length"] == 12
+	res = await client.get(f"/api/messages/{message_id}")
+	assert res.json()["data"]["content"] == "Hello, world"
+
+	# 不存在的消息不会入队
+	res = await client.patch(f"/api/messages/{uuid.uuid4()}/content", json={"delta": "x"})
+	assert res.status_code == 404
+	# 后台写入任务不继承请求的上下文，其查询不计入请求的 SQL 统计
+	assert querylog._current not in message_service.append_buffer._task.get_context()
+
+
+async def test_append_buffer_retries_failed_flush(client, monkeypatch, session_factory):
+	"""写入失败的增量放回缓冲区，与之后到达的增量按顺序在下次写入"""
+	buffer = message_service.ContentAppendBuffer(60, session_factory)
+	message_id = uuid.UUID(await _create_processing_message(client))
+	append_content = message_service._append_content
+
+	async def failing_append_content(*args, **kwargs):
+		raise RuntimeError("database is unavailable")
+
+	buffer.add(message_id, "l")
+	monkeypatch.setattr(message_service, "_append_content", failing_append_content)
+	with pytest.raises(RuntimeError):
+		await buffer.flush()
+	monkeypatch.setattr(message_service, "_append_content", append_content)
+
+	buffer.add(message_id, "lo")
+	await buffer.flush()
+	buffer._task.cancel()
+	res = await client.get(f"/api/messages/{message_id}")
+	assert res.json()["data"]["content"] == "Helllo"
+
+
+async def test_append_buffer_rejects_flush_after_final_status(client, monkeypatch, session_factory):
+	"""其他 worker 已写入最终状态后，本进程缓冲区中到期的增量不再追加"""
+	buffer = message_service.ContentAppendBuffer(60, session_factory)
+	message_id = uuid.UUID(await _create_processing_message(client))
+	buffer.add(message_id, "late")
+
+	# 另一个 worker（这里是未开启合并写入的直接写入路径）结束了这条消息
+	res = await client.patch(f"/api/messages/{message_id}/content", json={"delta": "lo", "status": "success"})
+	assert res.status_code == 200
+
+	messages = []
+	handler_id = logger.add(messages.append, format="{message}", level="WARNING")
+	try:
+		await buffer.flush()
+	finally:
+		logger.remove(handler_id)
+		buffer._task.cancel()
+	assert not buffer.has_pending(message_id)
+	assert any("finished message" in message for message in messages)
+	res = await client.get(f"/api/messages/{message_id}")
+	assert res.json()["data"]["content"] == "Hello"
+	assert res.json()["data"]["status"] == "success"
@@ -0,0 +1,47 @@
+from app.core.metrics import Histogram
+
+
+def _sample(text: str, name: str) -> float:
+	for line in text.splitlines():
+		if line.startswith(name + " "):
+			return float(line.rsplit(" ", 1)[1])
+	return 0
+
+
+async def test_prometheus_metrics(client):
+	"""按路由名统计请求次数、状态码和 SQL 条数"""
+	before = (await client.get("/metrics")).text
+	await client.post("/api/users/", json={"username": "alice", "email": "alice@example.com"})
+	await client.get("/api/users/")
+	await client.get("/api/users/999")
+	await client.get("/not-found")
+
+	res = await client.get("/metrics")
+	assert res.status_code == 200
+	assert res.headers["content-type"].startswith("text/plain; version=0.0.4")
+	after = res.text
+
+	def delta(name: str) -> float:
+		return _sample(after, name) - _sample(before, name)
+
+	assert delta('http_requests_total{route="get_users",method="GET",status="200"}') == 1
+	assert delta('http_requests_total{route="get_user",method="GET",status="404"}') == 1
+	assert delta('http_requests_total{route="unmatched",method="GET",status="404"}') == 1
+	assert delta('http_request_duration_seconds_count{route="get_users",method="GET"}') == 1
+	# 列表接口：一条 count、一条列表查询
+	assert delta('http_request_db_queries_sum{route="get_users",method="GET"}') == 2
+	assert delta('http_request_db_duration_seconds_sum{route="get_users",method="GET"}') > 0
+	assert "http_requests_in_flight 1" in after
+
+
+def test_histogram_render():
+	histogram = Histogram("latency_seconds", "耗时", ("route",), (0.1, 1))
+	for value in (0.05, 0.1, 0.5, 3):
+		histogram.observe(("get_users",), value)
+	assert histogram.render()[2:] == [
+		'latency_seconds_bucket{route="get_users",le="0.1"} 2',
+		'latency_seconds_bucket{route="get_users",le="1"} 3',
+		'latency_seconds_bucket{route="get_users",le="+Inf"} 4',
+		'latency_seconds_sum{route="get_users"} 3.65',
+		'latency_seconds_count{route="get_users"} 4',
+	]
@@ -0,0 +1,126 @@
+from types import SimpleNamespace
+
+import pytest
+from loguru import logger
+from sqlalchemy import select, text
+
+from app.core import querylog
+from app.core.config import settings
+from app.core.querylog import NPlusOneError, QueryLogMiddleware, redact_parameters, statement_shape
+from app.models import Conversation, Message, User
+from app.repositories.message_repository import MessageRepository
+
+
+def _app(session_factory, queries: int):
+	"""在一个请求内逐条查询 queries 次"""
+
+	async def app(scope, receive, send):
+		async with session_factory() as db:
+			for i in range(queries):
+				await db.scalar(select(User).where(User.id == i))
+		await send({"type": "http.response.start", "status": 200, "headers": []})
+		await send({"type": "http.response.body", "body": b""})
+
+	return QueryLogMiddleware(app)
+
+
+async def _request(app) -> dict:
+	scope = {"type": "http", "method": "GET", "path": "/"}
+
+	async def send(message):
+		pass
+
+	await app(scope, None, send)
+	return scope
+
+
+def test_statement_shape_and_redaction():
+	assert statement_shape("SELECT * FROM users\n WHERE id IN (?, ?, ?)") == "SELECT * FROM users WHERE id IN (?)"
+	assert statement_shape("INSERT INTO users (name) VALUES ($1), ($2)") == "INSERT INTO users (name) VALUES (?)"
+	assert redact_parameters((1, "secret", None, b"xx")) == [1, "<str:6>", None, "<bytes:2>"]
+	assert redact_parameters({"email": "a@b.c", "limit": 20}) == {"email": "<str:5>", "limit": 20}
+
+
+async def test_n_plus_one_strict(session_factory):
+	scope = await _request(_app(session_factory, settings.DB_N_PLUS_ONE_THRESHOLD))
+	assert scope["query_stats"].count == settings.DB_N_PLUS_ONE_THRESHOLD
+
+	with pytest.raises(NPlusOneError, match="executed more than 2 times"):
+		await _request(_app(session_factory, settings.DB_N_PLUS_ONE_THRESHOLD + 1))
+
+
+async def test_n_plus_one_warning_and_slow_query(monkeypatch, session_factory):
+	monkeypatch.setattr(settings, "DB_QUERY_STRICT", False)
+	monkeypatch.setattr(settings, "DB_SLOW_QUERY_MS", 1e-6)
+	messages = []
+	handler_id = logger.add(messages.append, format="{message}", level="WARNING")
+	try:
+		await _request(_app(session_factory, 5))
+	finally:
+		logger.remove(handler_id)
+
+	n_plus_one = [message for message in messages if message.startswith("Possible N+1")]
+	assert len(n_plus_one) == 1
+	slow = [message for message in messages if message.startswith("Slow query")]
+	assert len(slow) == 5
+	assert "FROM users WHERE users.id = ?" in slow[0]
+	assert "parameters=[0]" in slow[0]
+
+
+def _handler(session_factory, func):
+	"""在一个请求内执行 func(db)"""
+
+	async def app(scope, receive, send):
+		async with session_factory() as db:
+			await func(db)
+		await send({"type": "http.response.start", "status": 200, "headers": []})
+		await send({"type": "http.response.body", "body": b""})
+
+	return QueryLogMiddleware(app)
+
+
+async def test_bulk_chunks_are_not_n_plus_one(monkeypatch, session_factory):
+	"""批量删除按块执行的多条同形状语句不算 N+1，逐个会话维护统计仍会被检测到"""
+	monkeypatch.setattr(MessageRepository, "bulk_chunk_size", 1)
+	async with session_factory() as db:
+		conversation = Conversation(user_id="user_1", title="Chat")
+		db.add(conversation)
+		await db.flush()
+		messages = [Message(conversation_id=conversation.id, role="user", content="Hello") for _ in range(3)]
+		db.add_all(messages)
+		await db.commit()
+		ids = [m.id for m in messages]
+
+	async def bulk_delete(db):
+		assert sorted(await MessageRepository.bulk_delete(db, ids=ids)) == sorted(ids)
+
+	scope = await _request(_handler(session_factory, bulk_delete))
+	assert scope["query_stats"].count > settings.DB_N_PLUS_ONE_THRESHOLD
+
+	async def touch_each(db):
+		for _ in range(settings.DB_N_PLUS_ONE_THRESHOLD + 1):
+			await MessageRepository._touch_conversation(db, conversation.id)
+
+	with pytest.raises(NPlusOneError, match="UPDATE conversations"):
+		await _request(_handler(session_factory, touch_each))
+
+
+async def test_failed_statement_not_counted(monkeypatch, session_factory):
+	"""执行失败的语句不计入之后语句的耗时和 N+1 计数"""
+	# 每次读取时钟前进 1 秒：失败语句的开始时间若被沿用，下一条语句的耗时会变成 2 秒
+	clock = iter(range(1000))
+	monkeypatch.setattr(querylog, "time", SimpleNamespace(perf_counter=lambda: float(next(clock))))
+	statement = select(User).where(User.id == 1)
+
+	async def fail_then_query(db):
+		with pytest.raises(Exception, match="no such table"):
+			await db.execute(text("SELECT * FROM missing"))
+		await db.rollback()
+		await db.execute(statement)
+
+	scope = await _request(_handler(session_factory, fail_then_query))
+	stats = scope["query_stats"]
+	assert stats.count == 1
+	assert stats.duration == 1.0
+	assert list(stats.shapes.values()) == [1]
+	assert "FROM users" in next(iter(stats.shapes))
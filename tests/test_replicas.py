@@ -0,0 +1,85 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.cache import cache
+from app.core.database import Base, build_engine
+from app.core.replicas import PRIMARY_COOKIE, ReplicaSet, StickyPrimaryMiddleware
+from app.main import app
+from app.models import User
+from app.repositories.user_repository import UserRepository
+
+
+@pytest.fixture
+async def databases(tmp_path):
+	"""两个 SQLite 文件分别充当主库和副本，副本中没有主库新写入的数据，相当于复制延迟"""
+	primary = build_engine(f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}")
+	replica = build_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+	for engine in (primary, replica):
+		async with engine.begin() as conn:
+			await conn.run_sync(Base.metadata.create_all)
+	session_factory = async_sessionmaker(primary, expire_on_commit=False)
+	async with session_factory() as db:
+		db.add(User(id=1, username="alice", email="alice@example.com"))
+		await db.commit()
+	yield session_factory, primary, replica
+	await primary.dispose()
+	await replica.dispose()
+
+
+def _replica_set(*engines):
+	return ReplicaSet(list(engines), max_lag=5, check_interval=0, retry_after=60)
+
+
+async def test_reads_are_routed_to_replica(databases):
+	session_factory, primary, replica = databases
+	replicas = _replica_set(replica)
+
+	async with replicas.session(session_factory) as db:
+		assert db.get_bind() is replica.sync_engine
+		assert await UserRepository.get_by_id(db, 1) is None
+
+	# 刚写过的客户端走主库
+	async with replicas.session(session_factory, use_primary=True) as db:
+		assert db.get_bind() is primary.sync_engine
+		assert (await UserRepository.get_by_id(db, 1)).username == "alice"
+
+
+async def test_replica_reads_do_not_fill_cache(databases):
+	session_factory, primary, replica = databases
+	async with session_factory(bind=replica) as db:
+		db.add(User(id=2, username="bob", email="bob@example.com"))
+		await db.commit()
+
+	async with _replica_set(replica).session(session_factory) as db:
+		assert await UserRepository.get_by_id(db, 2) is not None
+	assert cache.backend.size() == 0
+
+
+async def test_falls_back_to_primary_when_replica_fails(databases, tmp_path):
+	session_factory, primary, _ = databases
+	broken = build_engine(f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'replica.db'}")
+	replicas = _replica_set(broken)
+
+	async with replicas.session(session_factory) as db:
+		assert db.get_bind() is primary.sync_engine
+		assert await UserRepository.get_by_id(db, 1) is not None
+	# 不可用的副本在 retry_after 内不再尝试
+	assert await replicas.choose() is None
+	await broken.dispose()
+
+
+async def test_sticky_primary_cookie():
+	transport = ASGITransport(app=StickyPrimaryMiddleware(app, max_age=5))
+	async with AsyncClient(transport=transport, base_url="http://test") as client:
+		res = await client.post("/api/users/", json={"username": "carol", "email": "carol@example.com"})
+		assert res.cookies.get(PRIMARY_COOKIE) == "1"
+		assert "Max-Age=5" in res.headers["set-cookie"]
+
+		res = await client.get("/api/users/")
+		assert "set-cookie" not in res.headers
+
+		# 失败的写请求不下发 cookie
+		res = await client.put("/api/users/999", json={"username": "nobody"})
+		assert res.status_code == 404
+		assert "set-cookie" not in res.headers
@@ -0,0 +1,37 @@
+import pytest
+from sqlalchemy import func, select
+
+from app.models import Conversation, Message, User
+from app.tools.seed import parse_distribution, seed
+
+
+async def test_seed(client, engine):
+	"""生成的数据能被接口正常读取，会话的消息数与实际消息一致"""
+	counts = await seed(engine, users=5, conversations=20, conversation_length="uniform:1:6", extra_data="rich", seed=1)
+	assert counts["users"] == 5
+	assert counts["conversations"] == 20
+
+	async with engine.connect() as conn:
+		assert await conn.scalar(select(func.count()).select_from(User)) == 5
+		assert await conn.scalar(select(func.count()).select_from(Message)) == counts["messages"]
+		assert await conn.scalar(select(func.sum(Conversation.message_count))) == counts["messages"]
+		conversation = (await conn.execute(select(Conversation).limit(1))).one()
+
+	assert conversation.version == 1
+	res = await client.get(f"/api/conversations/{conversation.id}")
+	assert res.status_code == 200
+	assert res.json()["data"]["message_count"] == conversation.message_count
+	res = await client.get(f"/api/messages/conversation/{conversation.id}")
+	assert res.json()["data"]["total"] == conversation.message_count
+
+	# 追加时用户 id 接在已有数据之后
+	await seed(engine, users=3, conversations=0, seed=1)
+	async with engine.connect() as conn:
+		assert await conn.scalar(select(func.max(User.id))) == 8
+
+
+def test_parse_distribution():
+	assert parse_distribution("3")(None) == 3
+	assert parse_distribution("0")(None) == 1
+	with pytest.raises(ValueError, match="Invalid distribution"):
+		parse_distribution("normal:1:2")
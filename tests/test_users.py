@@ -1,3 +1,12 @@
+from sqlalchemy import insert
+
+from app.core.database import Base, build_engine
+from app.core.querylog import BULK_CHUNK
+from app.models import User
+from app.repositories.user_repository import UserRepository
+from app.schemas.user import USER_BATCH_MAX_SIZE
+
+
 async def test_create_user(client):
 	response = await client.post(
 		"/api/users/",
@@ -109,3 +118,142 @@ async def test_get_user_not_found(client):
 	data = res.json()
 	assert res.status_code == 404
 	assert data["code"] == 404
+
+
+async def test_get_users_total_modes(client):
+	for i in range(3):
+		await client.post(
+			"/api/users/",
+			json={"username": f"user{i}", "email": f"user{i}@example.com"},
+		)
+
+	# total=none 不统计总数，依靠 has_more 翻页
+	res = await client.get("/api/users/", params={"page_size": 2, "total": "none"})
+	data = res.json()["data"]
+	assert res.status_code == 200
+	assert data["total"] is None
+	assert data["has_more"] is True
+	assert len(data["list"]) == 2
+
+	res = await client.get("/api/users/", params={"page": 2, "page_size": 2, "total": "none"})
+	data = res.json()["data"]
+	assert data["has_more"] is False
+	assert len(data["list"]) == 1
+
+	# total=estimate 在 SQLite 上返回缓存的计数，并标记为估算值
+	res = await client.get("/api/users/", params={"total": "estimate"})
+	data = res.json()["data"]
+	assert data["total"] == 3
+	assert data["total_estimated"] is True
+
+	# 逐行写入不影响估算值，缓存到期前仍返回旧的计数
+	await client.post("/api/users/", json={"username": "dave", "email": "dave@example.com"})
+	res = await client.get("/api/users/", params={"total": "estimate"})
+	assert res.json()["data"]["total"] == 3
+
+	# 批量写入后缓存的计数随之失效
+	await client.post("/api/users/batch", json=[{"username": "erin", "email": "erin@example.com"}])
+	res = await client.get("/api/users/", params={"total": "estimate"})
+	assert res.json()["data"]["total"] == 5
+
+	# 其他引擎（种子工具、基准脚本）上的批量写入不清除缓存
+	other = build_engine("sqlite+aiosqlite:///")
+	try:
+		async with other.begin() as conn:
+			await conn.run_sync(Base.metadata.create_all)
+			await conn.execute(
+				insert(User), [{"username": "x", "email": "x@example.com"}], execution_options=BULK_CHUNK
+			)
+	finally:
+		await other.dispose()
+	res = await client.get("/api/users/", params={"total": "estimate"})
+	assert res.json()["data"]["total"] == 5
+
+	# 默认仍为精确计数
+	res = await client.get("/api/users/")
+	data = res.json()["data"]
+	assert data["total"] == 5
+	assert data["total_estimated"] is False
+	assert data["has_more"] is False
+
+
+async def test_batch_users(client):
+	# 批量创建
+	res = await client.post(
+		"/api/users/batch",
+		json=[{"username": f"batch{i}", "email": f"batch{i}@example.com"} for i in range(3)],
+	)
+	data = res.json()
+	assert res.status_code == 200
+	assert [item["username"] for item in data["data"]] == ["batch0", "batch1", "batch2"]
+	ids = [item["id"] for item in data["data"]]
+
+	# 批量更新，只修改传入的字段
+	res = await client.put(
+		"/api/users/batch",
+		json=[{"id": ids[0], "username": "renamed0"}, {"id": ids[1], "email": "new1@example.com"}],
+	)
+	data = res.json()
+	assert res.status_code == 200
+	assert data["data"][0]["username"] == "renamed0"
+	assert data["data"][0]["email"] == "batch0@example.com"
+	assert data["data"][1]["username"] == "batch1"
+	assert data["data"][1]["email"] == "new1@example.com"
+
+	# 批量删除
+	res = await client.post("/api/users/batch/delete", json={"ids": ids[:2]})
+	assert sorted(res.json()["data"]) == sorted(ids[:2])
+	res = await client.get("/api/users/")
+	assert res.json()["data"]["total"] == 1
+
+
+async def test_batch_users_errors(client):
+	await client.post(
+		"/api/users/",
+		json={"username": "existing", "email": "existing@example.com"},
+	)
+	res = await client.post(
+		"/api/users/batch",
+		json=[{"username": "existing", "email": "other@example.com"}],
+	)
+	assert res.status_code == 400
+
+	res = await client.post(
+		"/api/users/batch",
+		json=[{"username": "new", "email": "existing@example.com"}],
+	)
+	assert res.status_code == 400
+	assert "Email already exists" in res.json()["msg"]
+
+	res = await client.put("/api/users/batch", json=[{"id": 9999, "username": "ghost"}])
+	assert res.status_code == 404
+
+	# 单次请求超过上限直接返回 422
+	res = await client.post(
+		"/api/users/batch",
+		json=[{"username": f"u{i}", "email": f"u{i}@example.com"} for i in range(USER_BATCH_MAX_SIZE + 1)],
+	)
+	assert res.status_code == 422
+	res = await client.put("/api/users/batch", json=[{"id": i} for i in range(USER_BATCH_MAX_SIZE + 1)])
+	assert res.status_code == 422
+
+
+async def test_batch_users_precheck_chunked(client, monkeypatch, capture_statements):
+	"""用户名、邮箱的预检查按 bulk_chunk_size 分块，IN 列表不会超出数据库的参数数量上限"""
+	monkeypatch.setattr(UserRepository, "bulk_chunk_size", 2)
+	await client.post("/api/users/", json={"username": "existing", "email": "existing@example.com"})
+	users = [{"username": f"u{i}", "email": f"u{i}@example.com"} for i in range(4)]
+	with capture_statements() as statements:
+		res = await client.post("/api/users/batch", json=[*users, {"username": "new", "email": "existing@example.com"}])
+	assert res.status_code == 400
+	assert "Email already exists" in res.json()["msg"]
+	prechecks = [statement for statement in statements if statement.startswith("SELECT users.email")]
+	assert len(prechecks) == 3
+	assert all(statement.count("?") <= 2 for statement in prechecks)
+
+
+async def test_update_delete_user_not_found(client):
+	res = await client.put("/api/users/9999", json={"username": "ghost"})
+	assert res.status_code == 404
+	res = await client.delete("/api/users/9999")
+	assert res.status_code == 404